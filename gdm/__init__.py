@@ -1,6 +1,7 @@
 """Package for GDM."""
 
 import sys
+import importlib
 
 __project__ = 'GDM'
 __version__ = '0.8.1-windows'
@@ -16,12 +17,37 @@ PYTHON_VERSION = 3, 4
 if sys.version_info < PYTHON_VERSION:  # pragma: no cover (manual test)
     exit("Python {}.{}+ is required.".format(*PYTHON_VERSION))
 
-try:
-    # pylint: disable=wrong-import-position
-    from .commands import install
-    from .commands import update
-    from .commands import display as list  # pylint: disable=redefined-builtin
-    from .commands import lock
-    from .commands import delete as uninstall
-except ImportError:  # pragma: no cover (manual test)
-    pass
+# Package API, imported on first use to keep the command-line startup fast
+_API = {
+    'install': ('commands', 'install'),
+    'update': ('commands', 'update'),
+    'list': ('commands', 'display'),
+    'lock': ('commands', 'lock'),
+    'uninstall': ('commands', 'delete'),
+    'prune': ('commands', 'prune'),
+    'gc': ('commands', 'gc'),
+    'bundle': ('commands', 'bundle'),
+    'snapshot': ('commands', 'snapshot'),
+    'restore': ('commands', 'restore'),
+    'maintain': ('commands', 'maintain'),
+    'stats': ('shell', 'stats'),
+}
+
+
+def __getattr__(name):
+    try:
+        module, attr = _API[name]
+    except KeyError:
+        msg = "module {!r} has no attribute {!r}".format(__name__, name)
+        raise AttributeError(msg) from None
+    value = getattr(importlib.import_module('.' + module, __name__), attr)
+    globals()[name] = value
+    return value
+
+
+if sys.version_info < (3, 7):  # pragma: no cover (manual test)
+    try:
+        for _name in _API:
+            __getattr__(_name)
+    except ImportError:
+        pass
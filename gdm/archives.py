@@ -0,0 +1,189 @@
+"""Utilities to save and restore installed dependencies as archives."""
+
+import os
+import shutil
+import hashlib
+import logging
+import tarfile
+import tempfile
+import subprocess
+
+from . import common
+from . import shell
+from . import git
+from . import exports
+from .config import load
+from .exceptions import ShellError
+
+VERSION = 2  # included in keys so archives are invalidated by format changes
+EXTENSIONS = ('.tar.zst', '.tar.gz')
+
+log = logging.getLogger(__name__)
+
+
+def get_key(config):
+    """Get an archive key from a configuration's locked sources."""
+    if not config.sources_locked:
+        return None
+
+    digest = hashlib.sha256("gdm-{}\n{}\n".format(
+        VERSION, config.location).encode())
+    for source in sorted(config.sources_locked, key=lambda s: s.dir):
+        for name in ('dir', 'repo', 'rev', 'link'):
+            value = getattr(source, name) or ''
+            digest.update("{}={}\n".format(name, value).encode())
+    return digest.hexdigest()[:32]
+
+
+def find(directory, key):
+    """Get the path of a saved archive, if one exists."""
+    for extension in EXTENSIONS:
+        path = os.path.join(directory, key + extension)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def save(config, directory):
+    """Archive the installed dependencies, returning the archive's path.
+
+    Repositories cloned with objects borrowed from the cached mirrors are
+    repacked first, so the archive can be restored without the cache.
+
+    """
+    key = get_key(config)
+    if not key or not os.path.isdir(config.location_path):
+        return None
+
+    mismatches = list(_verify(config, config.location_path))
+    if mismatches:
+        log.warning("Dependencies do not match locked versions: %s",
+                    ', '.join(mismatches))
+        return None
+
+    for path in _get_paths(config, config.location_path):
+        if git.dissociate(path):
+            log.info("Copied objects from the cache into: %s", path)
+
+    os.makedirs(directory, exist_ok=True)
+    zstd = shutil.which('zstd')
+    path = os.path.join(directory, key + EXTENSIONS[0 if zstd else 1])
+    temp = "{}.{}.tmp".format(path, os.getpid())
+    common.show(shell.CMD_PREFIX + "tar -cf {} {}".format(
+        path, config.location_path))
+
+    try:
+        if zstd:
+            with open(temp, 'wb') as output:
+                shell.stats.record(zstd)
+                process = subprocess.Popen([zstd, '-q', '-T0', '-c'],
+                                           stdin=subprocess.PIPE,
+                                           stdout=output)
+                with tarfile.open(fileobj=process.stdin, mode='w|') as archive:
+                    _add(archive, config.location_path)
+                process.stdin.close()
+                if process.wait():
+                    raise ShellError("Unable to compress: {}".format(path))
+        else:
+            with tarfile.open(temp, 'w:gz') as archive:
+                _add(archive, config.location_path)
+        os.replace(temp, path)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+    return path
+
+
+def restore(config, directory):
+    """Extract and verify saved dependencies, returning the archive's path.
+
+    The archive is extracted next to the location and only moved into place
+    once every dependency's checked out revision matches its lock.
+
+    """
+    key = get_key(config)
+    path = key and find(directory, key)
+    if not path:
+        log.info("No archive for key: %s", key)
+        return None
+
+    parent = os.path.dirname(config.location_path)
+    os.makedirs(parent, exist_ok=True)
+    temp = tempfile.mkdtemp(prefix=shell.TRASH_PREFIX, dir=parent)
+    common.show(shell.CMD_PREFIX + "tar -xf {} -C {}".format(path, temp))
+
+    try:
+        if path.endswith('.zst'):
+            zstd = shutil.which('zstd')
+            if not zstd:
+                raise ShellError("Unable to decompress: {}".format(path))
+            shell.stats.record(zstd)
+            process = subprocess.Popen([zstd, '-q', '-d', '-c', path],
+                                       stdout=subprocess.PIPE)
+            with tarfile.open(fileobj=process.stdout, mode='r|') as archive:
+                _extract(archive, temp)
+            if process.wait():
+                raise ShellError("Unable to decompress: {}".format(path))
+        else:
+            with tarfile.open(path) as archive:
+                _extract(archive, temp)
+
+        mismatches = list(_verify(config, temp))
+        if mismatches:
+            log.warning("Archive does not match locked versions: %s",
+                        ', '.join(mismatches))
+            return None
+
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temp, 0o777 & ~umask)
+        shell.trash(config.location_path, into=parent)
+        os.rename(temp, config.location_path)
+    finally:
+        if os.path.isdir(temp):
+            shutil.rmtree(temp)
+
+    return path
+
+
+def _add(archive, location):
+    for name in sorted(os.listdir(location)):
+        archive.add(os.path.join(location, name), arcname=name)
+
+
+def _extract(archive, directory):
+    if hasattr(tarfile, 'tar_filter'):
+        archive.extractall(directory, filter='tar')
+    else:  # pragma: no cover (older Python versions)
+        archive.extractall(directory)
+
+
+def _verify(config, location):
+    """Yield the path of each dependency not intact at its locked revision."""
+    for source in config.sources_locked or ():
+        path = os.path.join(location, source.dir)
+        info = exports.read(path)
+        if info:
+            intact = info['sha'] == source.rev
+        else:
+            intact = git.read_head(path) == source.rev and git.has_tree(path)
+        if not intact:
+            yield path
+            continue
+
+        nested = load(path, writable=False)
+        if nested and nested.sources_locked:
+            yield from _verify(nested, nested.location_path)
+
+
+def _get_paths(config, location):
+    """Yield the path of each locked dependency with a repository."""
+    for source in config.sources_locked or ():
+        path = os.path.join(location, source.dir)
+        if not exports.read(path):
+            yield path
+
+        nested = load(path, writable=False)
+        if nested and nested.sources_locked:
+            yield from _get_paths(nested, nested.location_path)
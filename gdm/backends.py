@@ -0,0 +1,190 @@
+"""Implementations of repository operations (Git's CLI by default)."""
+
+import logging
+import functools
+import threading
+from contextlib import contextmanager
+
+from . import settings
+
+OPERATIONS = {}  # name -> implementation in `gdm.git` using Git's CLI
+
+log = logging.getLogger(__name__)
+
+_backend = None
+_lock = threading.Lock()
+
+
+class Backend:
+    """Performs repository operations without spawning Git.
+
+    Backends define methods for any of the `OPERATIONS` with the same
+    signatures as in `gdm.git`. Operations a backend does not define, or
+    for which it returns `NotImplemented`, are run with Git's CLI.
+
+    """
+
+    name = None
+
+    def __repr__(self):
+        return "<backend {}>".format(self.name)
+
+
+class Subprocess(Backend):
+    """Runs Git's CLI for every operation."""
+
+    name = 'subprocess'
+
+
+def _defer_errors(method):
+    """Run an operation with Git's CLI (to report the error) if it fails."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except (KeyError, ValueError, self.errors.NotGitRepository):
+            return NotImplemented
+
+    return wrapper
+
+
+class Dulwich(Backend):
+    """Answers queries in-process with the optional `dulwich` package.
+
+    Clones, fetches, and updates still run Git's CLI.
+
+    """
+
+    name = 'dulwich'
+
+    def __init__(self):
+        try:
+            from dulwich import (errors, objectspec, object_store, porcelain,
+                                 repo)
+        except ImportError:
+            msg = "The 'dulwich' backend requires: pip install dulwich"
+            raise ImportError(msg) from None
+        self.errors = errors
+        self._objectspec = objectspec
+        self._object_store = object_store
+        self._porcelain = porcelain
+        self._repo = repo
+
+    def _open(self, _cwd):
+        return self._repo.Repo.discover(_cwd or '.')
+
+    @_defer_errors
+    def changes(self, include_untracked=False, display_status=True,
+                _show=False, _cwd=None):
+        with self._open(_cwd) as repo:
+            status = self._porcelain.status(
+                repo, untracked_files='all' if include_untracked else 'no')
+        changed = any(status.staged.values()) or bool(status.unstaged) or \
+            bool(include_untracked and status.untracked)
+        if changed and display_status:
+            return NotImplemented  # Git's CLI displays the status
+        return changed
+
+    @_defer_errors
+    def get_url(self, _cwd=None):
+        with self._open(_cwd) as repo:
+            url = repo.get_config().get((b'remote', b'origin'), b'url')
+        return url.decode()
+
+    @_defer_errors
+    def get_hash(self, _show=False, _cwd=None):
+        with self._open(_cwd) as repo:
+            return repo.head().decode()
+
+    @_defer_errors
+    def get_tag(self, _cwd=None):
+        with self._open(_cwd) as repo:
+            head = repo.head()
+            tags = sorted(name.decode()
+                          for name in repo.refs.keys(base=b'refs/tags/')
+                          if repo.get_peeled(b'refs/tags/' + name) == head)
+        if len(tags) > 1:
+            return NotImplemented  # Git's CLI picks the most recent
+        return tags[0] if tags else None
+
+    @_defer_errors
+    def get_branch(self, _cwd=None):
+        with self._open(_cwd) as repo:
+            head = repo.refs.read_ref(b'HEAD')
+        if head.startswith(b'ref: refs/heads/'):
+            return head[len(b'ref: refs/heads/'):].decode()
+        return 'HEAD'
+
+    @_defer_errors
+    def get_commit(self, rev, *, _cwd=None):
+        if '@{' in rev:
+            return NotImplemented
+        with self._open(_cwd) as repo:
+            return self._objectspec.parse_commit(repo, rev).id.decode()
+
+    @_defer_errors
+    def show_file(self, rev, path, *, _cwd=None):
+        with self._open(_cwd) as repo:
+            commit = self._objectspec.parse_commit(repo, rev)
+            _, sha = self._object_store.tree_lookup_path(
+                repo.__getitem__, commit.tree, path.encode())
+            return repo[sha].data.decode().strip()
+
+
+BACKENDS = {backend.name: backend for backend in (Subprocess, Dulwich)}
+
+
+def operation(function):
+    """Let the selected backend perform an operation instead of Git's CLI."""
+    name = function.__name__
+    OPERATIONS[name] = function
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        method = getattr(get(), name, None)
+        if method is not None:
+            result = method(*args, **kwargs)
+            if result is not NotImplemented:
+                return result
+        return function(*args, **kwargs)
+
+    return wrapper
+
+
+def get():
+    """Get the selected backend (`settings.BACKEND` unless changed)."""
+    if _backend is None:
+        try:
+            select(settings.BACKEND)
+        except ImportError as exc:
+            log.warning("%s (using Git's CLI)", exc)
+            select(Subprocess.name)
+    return _backend
+
+
+def select(backend):
+    """Select a backend by name (or instance) for the rest of the run."""
+    global _backend  # pylint: disable=global-statement
+    if isinstance(backend, str):
+        try:
+            backend = BACKENDS[backend]()
+        except KeyError:
+            msg = "Unknown backend: {}".format(backend)
+            raise ValueError(msg) from None
+    with _lock:
+        _backend = backend
+    log.debug("Selected backend: %s", backend.name)
+    return backend
+
+
+@contextmanager
+def use(backend):
+    """Select a backend temporarily."""
+    global _backend  # pylint: disable=global-statement
+    previous = _backend
+    try:
+        yield select(backend)
+    finally:
+        with _lock:
+            _backend = previous
@@ -0,0 +1,106 @@
+"""Utilities to carry repositories between machines as Git bundles."""
+
+import os
+import shutil
+import tarfile
+import logging
+import tempfile
+
+import yaml
+
+from . import common
+from . import git
+from . import mirrors
+from .exceptions import InvalidConfig
+
+MANIFEST = "gdm-bundle.yml"
+ARCHIVES = {
+    '.tar': 'w',
+    '.tar.gz': 'w:gz',
+    '.tgz': 'w:gz',
+    '.tar.bz2': 'w:bz2',
+    '.tar.xz': 'w:xz',
+}
+
+log = logging.getLogger(__name__)
+
+
+def export(repos, path, cache=None):
+    """Write a bundle of each repository to a directory or archive."""
+    mode = _get_archive_mode(path)
+    directory = tempfile.mkdtemp() if mode else path
+    os.makedirs(directory, exist_ok=True)
+
+    try:
+        manifest = []
+        for repo in repos:
+            reference = git.mirror(repo, cache=cache, update=True)
+            name = os.path.basename(reference).rsplit('.', 1)[0] + ".bundle"
+            git.bundle(os.path.join(directory, name), _cwd=reference)
+            manifest.append({'repo': repo, 'bundle': name})
+
+        text = yaml.safe_dump({'repositories': manifest},
+                              default_flow_style=False)
+        common.write_atomic(os.path.join(directory, MANIFEST), text)
+
+        if mode:
+            log.info("Archiving bundles: %s", path)
+            with tarfile.open(path, mode) as archive:
+                for name in sorted(os.listdir(directory)):
+                    archive.add(os.path.join(directory, name), arcname=name)
+    finally:
+        if mode:
+            shutil.rmtree(directory)
+
+    return len(manifest)
+
+
+def load(path, cache=None):
+    """Seed the mirrors from a directory or archive of bundles.
+
+    Returns the URL of each repository that is now available offline.
+
+    """
+    if os.path.isfile(path):
+        directory = tempfile.mkdtemp()
+        try:
+            log.info("Extracting bundles: %s", path)
+            with tarfile.open(path) as archive:
+                _extract(archive, directory)
+            return load(directory, cache=cache)
+        finally:
+            shutil.rmtree(directory)
+
+    try:
+        with open(os.path.join(path, MANIFEST)) as stream:
+            data = yaml.safe_load(stream) or {}
+    except OSError as exc:
+        raise InvalidConfig("Not a bundle: {}".format(path)) from exc
+
+    os.makedirs(mirrors.get_cache(cache), exist_ok=True)
+    repos = []
+    for entry in data.get('repositories') or []:
+        repo = entry['repo']
+        git.unbundle(os.path.join(path, entry['bundle']), repo,
+                     mirrors.get_mirror(repo, cache))
+        repos.append(repo)
+    return repos
+
+
+def _get_archive_mode(path):
+    for extension, mode in ARCHIVES.items():
+        if path.endswith(extension):
+            return mode
+    return None
+
+
+def _extract(archive, directory):
+    if hasattr(tarfile, 'data_filter'):
+        archive.extractall(directory, filter='data')
+    else:  # pragma: no cover (older Python versions)
+        for member in archive.getmembers():
+            parts = member.name.split('/')
+            if not (member.isfile() or member.isdir()) or \
+                    os.path.isabs(member.name) or '..' in parts:
+                raise InvalidConfig("Unsafe bundle member: " + member.name)
+        archive.extractall(directory)
@@ -2,13 +2,16 @@
 
 """Command-line interface."""
 
+import os
 import sys
 import argparse
 import logging
 
 from . import CLI, VERSION, DESCRIPTION
 from . import common
-from . import commands
+from . import settings
+
+commands = None  # imported on first use to keep `--help` and `--version` fast
 
 log = logging.getLogger(__name__)
 
@@ -24,6 +27,11 @@ def main(args=None, function=None):
                        help="enable verbose logging")
     group.add_argument('-q', '--quiet', action='store_const', const=-1,
                        dest='verbose', help="only display errors and prompts")
+    debug.add_argument('--backend', choices=settings.BACKENDS,
+                       default=argparse.SUPPRESS,
+                       help="implementation of repository queries "
+                       "(default: ${} or {})".format(settings.BACKEND_ENV,
+                                                     settings.BACKENDS[0]))
     project = argparse.ArgumentParser(add_help=False)
     project.add_argument('-r', '--root', metavar='PATH',
                          help="root directory of the project")
@@ -34,8 +42,18 @@ def main(args=None, function=None):
     options = argparse.ArgumentParser(add_help=False)
     options.add_argument('-f', '--force', action='store_true',
                          help="overwrite uncommitted changes in dependencies")
-    options.add_argument('-c', '--clean', action='store_true',
-                         help="keep ignored files in dependencies")
+    options.add_argument('-c', '--clean', action='store_const', const=True,
+                         help="delete untracked and ignored files in "
+                         "dependencies")
+    options.add_argument('--clean-policy', dest='clean', metavar='POLICY',
+                         type=common.clean_policy,
+                         help="none, untracked, full, or files to keep")
+    options.add_argument('-x', '--export', action='store_const',
+                         const='export', dest='mode',
+                         help="install only the files (without `.git`)")
+    options.add_argument('--staged', action='store_true',
+                         help="check out changed dependencies next to the "
+                         "existing files and swap them in when ready")
     shared = {'formatter_class': common.WideHelpFormatter}
 
     # Main parser
@@ -53,6 +71,19 @@ def main(args=None, function=None):
                      help="list of dependencies (`dir` values) to install")
     sub.add_argument('-e', '--fetch', action='store_true',
                      help="always fetch the latest branches")
+    sub.add_argument('-p', '--prune', action='store_true',
+                     help="delete dependencies no longer in the config")
+    sub.add_argument('-b', '--from-bundle', metavar='PATH', dest='bundle',
+                     help="install from exported bundles without network")
+    group = sub.add_mutually_exclusive_group()
+    group.add_argument('-w', '--watch', action='store_true',
+                       help="keep installing changes to the config files")
+    group.add_argument('--roots', nargs='+', metavar='PATH',
+                       help="install several projects sharing fetches")
+    sub.add_argument('--plan', action='store_true',
+                     help="only print the operations and their estimated costs")
+    sub.add_argument('-j', '--jobs', type=common.positive_int, metavar='NUM',
+                     help="number of operations to run concurrently")
 
     # Update parser
     info = "update dependencies to the latest versions"
@@ -78,6 +109,11 @@ def main(args=None, function=None):
     sub.add_argument('-D', '--no-dirty', action='store_false',
                      dest='allow_dirty',
                      help="fail if a source has uncommitted changes")
+    sub.add_argument('--format', choices=settings.RECORD_FORMATS,
+                     help="print one record per dependency as identified")
+    sub.add_argument('-j', '--jobs', type=common.positive_int, metavar='NUM',
+                     help="number of dependencies to identify concurrently "
+                     "(requires --format)")
 
     # Lock parser
     info = "lock the current version of each dependency"
@@ -93,12 +129,89 @@ def main(args=None, function=None):
     sub.add_argument('-f', '--force', action='store_true',
                      help="delete uncommitted changes in dependencies")
 
+    # Prune parser
+    info = "delete dependencies no longer in the config"
+    sub = subs.add_parser('prune', description=info.capitalize() + '.',
+                          help=info, parents=[debug, project], **shared)
+    sub.add_argument('-f', '--force', action='store_true',
+                     help="delete uncommitted changes in dependencies")
+
+    # Bundle parser
+    info = "carry repositories between machines as Git bundles"
+    sub = subs.add_parser('bundle', description=info.capitalize() + '.',
+                          help=info, parents=[debug], **shared)
+    bundle = sub.add_subparsers(help="", dest='bundle_command',
+                                metavar="<command>")
+    info = "write bundles of every repository needed by the project"
+    sub = bundle.add_parser('export', description=info.capitalize() + '.',
+                            help=info, parents=[debug, project], **shared)
+    sub.add_argument('path', metavar='PATH',
+                     help="directory or archive (.tar, .tar.gz, etc.) to write")
+
+    # Snapshot parser
+    info = "save or restore installed dependencies by their locks"
+    sub = subs.add_parser('snapshot', description=info.capitalize() + '.',
+                          help=info, parents=[debug], **shared)
+    snapshot = sub.add_subparsers(help="", dest='snapshot_command',
+                                  metavar="<command>")
+    archives = argparse.ArgumentParser(add_help=False)
+    archives.add_argument('-s', '--dir', metavar='PATH', dest='directory',
+                          help="directory of archives (default: in the cache)")
+    info = "archive the installed dependencies"
+    snapshot.add_parser('save', description=info.capitalize() + '.',
+                        help=info, parents=[debug, project, archives],
+                        **shared)
+    info = "extract and verify archived dependencies"
+    sub = snapshot.add_parser('restore', description=info.capitalize() + '.',
+                              help=info, parents=[debug, project, archives],
+                              **shared)
+    sub.add_argument('-f', '--force', action='store_true',
+                     help="overwrite uncommitted changes in dependencies")
+
+    # Cache parser
+    info = "manage files kept between commands"
+    sub = subs.add_parser('cache', description=info.capitalize() + '.',
+                          help=info, parents=[debug], **shared)
+    cache = sub.add_subparsers(help="", dest='cache_command',
+                               metavar="<command>")
+    info = "finish deleting dependencies from interrupted uninstalls"
+    cache.add_parser('gc', description=info.capitalize() + '.',
+                     help=info, parents=[debug, project], **shared)
+    info = "repack and index the cached repository mirrors"
+    sub = cache.add_parser('maintain', description=info.capitalize() + '.',
+                           help=info, parents=[debug], **shared)
+    sub.add_argument('-b', '--budget', type=common.positive_int,
+                     metavar='SECONDS',
+                     help="stop starting new work after this many seconds")
+    sub.add_argument('-j', '--jobs', type=common.positive_int, metavar='NUM',
+                     help="number of mirrors to maintain concurrently")
+
+    # Daemon parser
+    info = "answer commands from warm caches over a Unix socket"
+    sub = subs.add_parser('daemon', description=info.capitalize() + '.',
+                          help=info, parents=[debug], **shared)
+    sub.add_argument('-s', '--socket', metavar='PATH',
+                     help="path of the socket (default: ${} or {})".format(
+                         settings.DAEMON_SOCKET_ENV, settings.DAEMON_SOCKET))
+
     # Parse arguments
     namespace = parser.parse_args(args=args)
 
+    if namespace.command == 'list' and namespace.jobs and \
+            not namespace.format:
+        parser.error("--jobs requires --format")
+
     # Configure logging
     common.configure_logging(namespace.verbose)
 
+    # Select how repositories are accessed
+    if getattr(namespace, 'backend', None):
+        from . import backends
+        try:
+            backends.select(namespace.backend)
+        except ImportError as exc:
+            parser.error(str(exc))
+
     # Run the program
     function, args, kwargs, exit_msg = _get_command(function, namespace)
     if function is None:
@@ -108,37 +221,98 @@ def main(args=None, function=None):
 
 
 def _get_command(function, namespace):
+    global commands
     args = []
     kwargs = dict(root=namespace.root)
     exit_msg = ""
 
+    api = _get_client(namespace)
+    if api is None and namespace.command and commands is None:
+        from . import commands
+    api = api or commands
+
     if namespace.command in ('install', 'update'):
-        function = getattr(commands, namespace.command)
+        function = getattr(api, namespace.command)
         args = namespace.name
         kwargs.update(depth=namespace.depth,
                       force=namespace.force,
-                      clean=namespace.clean)
+                      clean=namespace.clean,
+                      mode=namespace.mode,
+                      staged=namespace.staged)
         if namespace.command == 'install':
-            kwargs.update(fetch=namespace.fetch)
+            kwargs.update(fetch=namespace.fetch,
+                          prune=namespace.prune,
+                          bundle=namespace.bundle,
+                          watch=namespace.watch,
+                          plan=namespace.plan,
+                          jobs=namespace.jobs,
+                          roots=namespace.roots)
         if namespace.command == 'update':
             kwargs.update(recurse=namespace.recurse,
                           lock=namespace.lock)
         exit_msg = "\n" + "Run again with '--force' to overwrite"
     elif namespace.command == 'list':
-        function = commands.display
+        function = api.display
         kwargs.update(dict(depth=namespace.depth,
-                           allow_dirty=namespace.allow_dirty))
+                           allow_dirty=namespace.allow_dirty,
+                           format=namespace.format,
+                           jobs=namespace.jobs))
     elif namespace.command == 'lock':
-        function = getattr(commands, namespace.command)
+        function = getattr(api, namespace.command)
         args = namespace.name
     elif namespace.command == 'uninstall':
         function = commands.delete
         kwargs.update(force=namespace.force)
         exit_msg = "\n" + "Run again with '--force' to ignore"
+    elif namespace.command == 'prune':
+        function = commands.prune
+        kwargs.update(force=namespace.force)
+        exit_msg = "\n" + "Run again with '--force' to ignore"
+    elif namespace.command == 'bundle':
+        if namespace.bundle_command == 'export':
+            function = commands.bundle
+            args = [namespace.path]
+    elif namespace.command == 'snapshot':
+        if namespace.snapshot_command == 'save':
+            function = commands.snapshot
+            kwargs.update(directory=namespace.directory)
+        elif namespace.snapshot_command == 'restore':
+            function = commands.restore
+            kwargs.update(directory=namespace.directory,
+                          force=namespace.force)
+            exit_msg = "\n" + "Run again with '--force' to overwrite"
+    elif namespace.command == 'cache':
+        if namespace.cache_command == 'gc':
+            function = commands.gc
+        elif namespace.cache_command == 'maintain':
+            function = commands.maintain
+            kwargs = dict(budget=namespace.budget, jobs=namespace.jobs)
+    elif namespace.command == 'daemon':
+        from . import daemon
+        function = daemon.serve
+        kwargs = dict(path=namespace.socket)
 
     return function, args, kwargs, exit_msg
 
 
+def _get_client(namespace):
+    """Get a client for the daemon if commands should be sent to it.
+
+    Watching for changes runs in this process, since the daemon would never
+    finish answering the request. So does printing a plan, which changes
+    nothing and would be printed by the daemon.
+
+    """
+    if getattr(namespace, 'watch', False) or \
+            getattr(namespace, 'plan', False):
+        return None
+    if namespace.command in ('install', 'update', 'list', 'lock') and \
+            os.getenv(settings.DAEMON_SOCKET_ENV):
+        from . import daemon
+        return daemon.Client()
+    return None
+
+
 def _run_command(function, args, kwargs, exit_msg):
     success = False
     try:
@@ -5,7 +5,17 @@ import functools
 import logging
 
 from . import common
+from . import shell
+from . import settings
+from . import mirrors
+from . import bundles
+from . import archives
+from . import watcher
 from .config import load
+from .journal import Journal
+from .links import Links
+from .plans import Plan, SerialExecutor, PooledExecutor
+from .timings import Timings
 
 log = logging.getLogger(__name__)
 
@@ -20,9 +30,22 @@ def restore_cwd(func):
     return wrapped
 
 
+def count_processes(func):
+    @functools.wraps(func)
+    def wrapped(*args, **kwargs):
+        with shell.stats.scope(command=func.__name__):
+            result = func(*args, **kwargs)
+        log.debug("Spawned %s processes", shell.stats.commands[func.__name__])
+        return result
+    return wrapped
+
+
 @restore_cwd
+@count_processes
 def install(*names, root=None, depth=None,
-            force=False, fetch=False, clean=True):
+            force=False, fetch=False, clean=None, mode=None, staged=False,
+            prune=False, bundle=None, watch=False, plan=False, jobs=None,
+            roots=None):  # pylint: disable=redefined-outer-name
     """Install dependencies for a project.
 
     Optional arguments:
@@ -32,7 +55,15 @@ def install(*names, root=None, depth=None,
     - `depth`: number of levels of dependencies to traverse
     - `force`: indicates uncommitted changes can be overwritten
     - `fetch`: indicates the latest branches should always be fetched
-    - `clean`: indicates untracked files should be deleted from dependencies
+    - `clean`: overrides each dependency's policy for deleting untracked files
+    - `mode`: overrides how each dependency is installed ('clone' or 'export')
+    - `staged`: replaces changed dependencies only once their files are ready
+    - `prune`: indicates unconfigured dependencies should be deleted
+    - `bundle`: path to bundles from `bundle()` to install without network
+    - `watch`: keeps reinstalling what changes in configuration files
+    - `plan`: prints the planned operations and their costs without running them
+    - `jobs`: number of operations to run concurrently (serially by default)
+    - `roots`: paths of several projects to install together (replaces `root`)
 
     """
     log.info("%sInstalling dependencies: %s",
@@ -40,21 +71,64 @@ def install(*names, root=None, depth=None,
              ', '.join(names) if names else '<all>')
     count = None
 
-    root = _find_root(root)
-    config = load(root)
+    roots = _find_roots(roots) if roots else [_find_root(root)]
+    if watch and len(roots) > 1:
+        raise ValueError("Only one root can be watched")
+    configs = [config for config in (load(path, writable=False)
+                                     for path in roots) if config]
 
-    if config:
-        common.show("Installing dependencies...", log=False)
-        common.show()
-        count = config.install_deps(*names, update=False, depth=depth,
-                                    force=force, fetch=fetch, clean=clean)
+    if configs:
+        repos = []
+        if bundle:
+            common.show("Loading repositories from bundles...", log=False)
+            common.show()
+            repos = bundles.load(os.path.abspath(bundle))
+        with mirrors.redirect(repos):
+            links = Links()
+            if len(configs) == 1:  # links are recorded for one project
+                links = Links(configs[0].location_path,
+                              prune=not names and depth is None)
+            operations = Plan(force=force, timings=Timings(), links=links)
+            for config in configs:
+                config.plan_deps(
+                    *names, depth=depth, force=force, fetch=fetch,
+                    clean=clean, mode=mode, staged=staged, preview=plan,
+                    plan=operations,
+                    refresh=fetch and len(configs) > 1 and not bundle,
+                    journal=Journal(config.location_path))
+            if plan:
+                operations.show()
+                return not operations.missing
+            common.show("Installing dependencies...", log=False)
+            common.show()
+            executor = PooledExecutor(jobs) if jobs else SerialExecutor()
+            count = operations.execute(executor)
+            if operations.missing:
+                count = 0
+        if prune:
+            common.dedent(level=0)
+            common.show("Deleting unconfigured dependencies...", log=False)
+            common.show()
+            for config in configs:
+                config.prune_deps(force=force)
+            common.show()
+
+    if count:
+        mirrors.maintain_if_due()
+
+    if configs and watch:
+        common.dedent(level=0)
+        watcher.run(roots[0], force=force, fetch=fetch, clean=clean, mode=mode,
+                    staged=staged)
 
     return _display_result("install", "Installed", count)
 
 
 @restore_cwd
+@count_processes
 def update(*names, root=None, depth=None,
-           recurse=False, force=False, clean=True, lock=None):  # pylint: disable=redefined-outer-name
+           recurse=False, force=False, clean=None, mode=None, staged=False,
+           lock=None):  # pylint: disable=redefined-outer-name
     """Update dependencies for a project.
 
     Optional arguments:
@@ -64,7 +138,9 @@ def update(*names, root=None, depth=None,
     - `depth`: number of levels of dependencies to traverse
     - `recurse`: indicates nested dependencies should also be updated
     - `force`: indicates uncommitted changes can be overwritten
-    - `clean`: indicates untracked files should be deleted from dependencies
+    - `clean`: overrides each dependency's policy for deleting untracked files
+    - `mode`: overrides how each dependency is installed ('clone' or 'export')
+    - `staged`: replaces changed dependencies only once their files are ready
     - `lock`: indicates actual dependency versions should be recorded
 
     """
@@ -82,18 +158,23 @@ def update(*names, root=None, depth=None,
         common.show()
         count = config.install_deps(
             *names, update=True, depth=depth,
-            recurse=recurse, force=force, fetch=True, clean=clean)
+            recurse=recurse, force=force, fetch=True, clean=clean,
+            mode=mode, staged=staged)
         common.dedent(level=0)
         if count and lock is not False:
             common.show("Recording installed versions...", log=False)
             common.show()
             config.lock_deps(*names, obey_existing=lock is None)
 
+    if count:
+        mirrors.maintain_if_due()
+
     return _display_result("update", "Updated", count)
 
 
 @restore_cwd
-def display(root=None, depth=None, allow_dirty=True):
+@count_processes
+def display(root=None, depth=None, allow_dirty=True, format=None, jobs=None):  # pylint: disable=redefined-builtin
     """Display installed dependencies for a project.
 
     Optional arguments:
@@ -101,15 +182,31 @@ def display(root=None, depth=None, allow_dirty=True):
     - `root`: specifies the path to the root working tree
     - `depth`: number of levels of dependencies to traverse
     - `allow_dirty`: causes uncommitted changes to be ignored
+    - `format`: 'json' or 'tsv' to print one record per line as each
+      dependency is identified, or 'records' to return a generator of them
+    - `jobs`: number of dependencies to identify concurrently (only with a
+      `format`, since the text output is shown in order)
 
     """
     log.info("Displaying dependencies...")
     count = None
 
+    if jobs and not format:
+        raise ValueError("Dependencies are only identified concurrently "
+                         "with a format")
+
     root = _find_root(root)
-    config = load(root)
+    config = load(root, writable=False)
 
-    if config:
+    if format == 'records':
+        return _get_records(config, depth, allow_dirty, jobs)
+
+    if config and format:
+        count = 0
+        for record in _get_records(config, depth, allow_dirty, jobs):
+            print(common.format_record(record, format), flush=True)
+            count += 1
+    elif config:
         common.show("Displaying current dependency versions...", log=False)
         common.show()
         count = len(list(config.get_deps(depth=depth, allow_dirty=allow_dirty)))
@@ -118,6 +215,7 @@ def display(root=None, depth=None, allow_dirty=True):
 
 
 @restore_cwd
+@count_processes
 def lock(*names, root=None):
     """Lock current dependency versions for a project.
 
@@ -143,6 +241,7 @@ def lock(*names, root=None):
 
 
 @restore_cwd
+@count_processes
 def delete(root=None, force=False):
     """Delete dependencies for a project.
 
@@ -156,12 +255,12 @@ def delete(root=None, force=False):
     count = None
 
     root = _find_root(root)
-    config = load(root)
+    config = load(root, writable=False)
 
     if config:
         common.show("Checking for uncommitted changes...", log=False)
         common.show()
-        count = len(list(config.get_deps(allow_dirty=force)))
+        count = config.check_deps(allow_dirty=force)
         common.dedent(level=0)
         common.show("Deleting all dependencies...", log=False)
         common.show()
@@ -170,6 +269,212 @@ def delete(root=None, force=False):
     return _display_result("delete", "Deleted", count, allow_zero=True)
 
 
+@restore_cwd
+@count_processes
+def prune(root=None, force=False):
+    """Delete unconfigured dependencies for a project.
+
+    Optional arguments:
+
+    - `root`: specifies the path to the root working tree
+    - `force`: indicates uncommitted changes can be overwritten
+
+    """
+    log.info("Pruning dependencies...")
+    count = None
+
+    root = _find_root(root)
+    config = load(root, writable=False)
+
+    if config:
+        common.show("Deleting unconfigured dependencies...", log=False)
+        common.show()
+        count = config.prune_deps(force=force)
+        common.show()
+
+    return _display_result("prune", "Pruned", count, allow_zero=True)
+
+
+@restore_cwd
+@count_processes
+def bundle(path, root=None):
+    """Export the repositories needed by a project as Git bundles.
+
+    Required arguments:
+
+    - `path`: directory or archive (`.tar`, `.tar.gz`, etc.) to create
+
+    Optional arguments:
+
+    - `root`: specifies the path to the root working tree
+
+    """
+    log.info("Exporting repositories...")
+    count = None
+
+    path = os.path.abspath(path)
+    root = _find_root(root)
+    config = load(root, writable=False)
+
+    if config:
+        common.show("Exporting repositories...", log=False)
+        common.show()
+        count = bundles.export(list(config.get_repos()), path)
+        common.show()
+
+    return _display_result("bundle", "Bundled", count)
+
+
+@restore_cwd
+@count_processes
+def snapshot(root=None, directory=None):
+    """Save installed dependencies to an archive keyed by their locks.
+
+    Optional arguments:
+
+    - `root`: specifies the path to the root working tree
+    - `directory`: location of archives (default: `~/.gitcache/snapshots`)
+
+    """
+    log.info("Saving dependencies...")
+    count = None
+
+    directory = _get_archives(directory)
+    root = _find_root(root)
+    config = load(root, writable=False)
+
+    if config:
+        common.show("Saving installed dependencies...", log=False)
+        common.show()
+        path = archives.save(config, directory)
+        count = 1 if path else 0
+        if path:
+            common.show("Saved: " + path, log=False)
+        else:
+            log.error("No locked dependencies installed to save")
+        common.show()
+
+    return _display_result("save", "Saved", count)
+
+
+@restore_cwd
+@count_processes
+def restore(root=None, directory=None, force=False):
+    """Restore dependencies from an archive matching their locks.
+
+    Optional arguments:
+
+    - `root`: specifies the path to the root working tree
+    - `directory`: location of archives (default: `~/.gitcache/snapshots`)
+    - `force`: indicates uncommitted changes can be overwritten
+
+    """
+    log.info("Restoring dependencies...")
+    count = None
+
+    directory = _get_archives(directory)
+    root = _find_root(root)
+    config = load(root, writable=False)
+
+    if config:
+        common.show("Checking for uncommitted changes...", log=False)
+        common.show()
+        config.check_deps(allow_dirty=force)
+        common.show("Restoring installed dependencies...", log=False)
+        common.show()
+        path = archives.restore(config, directory)
+        count = 1 if path else 0
+        if path:
+            config.link_deps(force=force)
+            common.show("Restored: " + path, log=False)
+        else:
+            log.error("No matching archive to restore")
+        common.show()
+
+    return _display_result("restore", "Restored", count)
+
+
+@restore_cwd
+@count_processes
+def maintain(budget=None, jobs=None):
+    """Repack and index the cached repository mirrors.
+
+    Optional arguments:
+
+    - `budget`: number of seconds after which no new work is started
+    - `jobs`: number of mirrors to maintain concurrently
+
+    """
+    log.info("Maintaining cached repositories...")
+
+    common.show("Maintaining cached repositories...", log=False)
+    common.show()
+    count = mirrors.maintain(budget=budget, jobs=jobs)
+    common.show()
+
+    return _display_result("maintain", "Maintained", count, allow_zero=True)
+
+
+@restore_cwd
+@count_processes
+def gc(root=None):  # pylint: disable=invalid-name
+    """Finish deleting dependencies from interrupted uninstalls.
+
+    Directories left next to the location, inside it, in each installed
+    dependency (and its own location), and in the cache are deleted.
+
+    Optional arguments:
+
+    - `root`: specifies the path to the root working tree
+
+    """
+    log.info("Collecting garbage...")
+    count = None
+
+    root = _find_root(root)
+    config = load(root, writable=False)
+
+    if config:
+        common.show("Deleting uninstalled dependencies...", log=False)
+        common.show()
+        count = 0
+        for dirpath in _get_trash_dirs(config):
+            count += shell.empty_trash(dirpath)
+        common.show()
+
+    return _display_result("collect", "Collected", count, allow_zero=True)
+
+
+def _get_trash_dirs(config):
+    """Get each directory where deleted dependencies could be left."""
+    dirs = [os.path.dirname(config.location_path), config.location_path,
+            mirrors.get_cache()]
+    for path in config.get_paths():
+        dirs.append(path)
+        nested = load(path, writable=False)
+        if nested:
+            dirs.append(nested.location_path)
+    return [path for index, path in enumerate(dirs)
+            if os.path.isdir(path) and path not in dirs[:index]]
+
+
+def _get_archives(directory):
+    if directory:
+        return os.path.abspath(directory)
+    return os.path.join(mirrors.get_cache(), settings.ARCHIVES)
+
+
+def _find_roots(roots, cwd=None):
+    """Get the full path of each project, ignoring duplicates."""
+    paths = []
+    for root in roots:
+        path = os.path.abspath(os.path.join(cwd or os.getcwd(), root))
+        if path not in paths:
+            paths.append(path)
+    log.info("Specified roots: %s", ', '.join(paths))
+    return paths
+
+
 def _find_root(root, cwd=None):
     if cwd is None:
         cwd = os.getcwd()
@@ -200,6 +505,14 @@ def _find_root(root, cwd=None):
     return root
 
 
+def _get_records(config, depth, allow_dirty, jobs):
+    """Yield dependency records, counting processes while iterating."""
+    if config:
+        with shell.stats.scope(command='display'):
+            yield from config.get_records(depth=depth,
+                                          allow_dirty=allow_dirty, jobs=jobs)
+
+
 def _display_result(present, past, count, allow_zero=False):
     """Convert a command's dependency count to a return status.
 
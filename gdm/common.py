@@ -1,8 +1,12 @@
 """Common exceptions, classes, and functions."""
 
+import os
 import sys
+import json
+import stat
 import argparse
 import logging
+import tempfile
 
 from . import settings
 
@@ -40,6 +44,51 @@ def positive_int(value):
     return value
 
 
+def clean_policy(value):
+    """Convert a clean option to a policy name or patterns of files to keep.
+
+    >>> clean_policy(True)
+    'full'
+
+    >>> clean_policy("Untracked")
+    'untracked'
+
+    >>> clean_policy("build/, *.so")
+    ['build/', '*.so']
+
+    """
+    if value is True:
+        return 'full'
+    if value is False or not value:
+        return 'none'
+    if isinstance(value, str):
+        if value.lower() in settings.CLEAN_POLICIES:
+            return value.lower()
+        value = value.replace(',', ' ').split()
+    return list(value)
+
+
+def write_atomic(path, text):
+    """Replace a file's contents so readers never see a partial write."""
+    dirname, basename = os.path.split(os.path.abspath(path))
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+
+    handle, temp = tempfile.mkstemp(prefix='.' + basename + '.', dir=dirname)
+    try:
+        with os.fdopen(handle, 'w') as stream:
+            stream.write(text)
+        os.chmod(temp, mode)
+        os.replace(temp, path)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+
 class _Config:
     """Share configuration options."""
 
@@ -49,6 +98,28 @@ class _Config:
     indent_level = 0
 
 
+def format_record(record, format):  # pylint: disable=redefined-builtin
+    r"""Convert a dependency record to a line of JSON or TSV output.
+
+    >>> format_record(dict(path='a', url=None, sha='1', dirty=False,
+    ...                    depth=1, seconds=0.5), 'tsv')
+    'a\t\t1\tfalse\t1\t0.5'
+
+    """
+    if format == 'json':
+        return json.dumps({name: record[name]
+                           for name in settings.RECORD_FIELDS})
+    values = []
+    for name in settings.RECORD_FIELDS:
+        value = record[name]
+        if value is None:
+            value = ''
+        elif isinstance(value, bool):
+            value = json.dumps(value)
+        values.append(str(value))
+    return '\t'.join(values)
+
+
 def configure_logging(count=0):
     """Configure logging using the provided verbosity count."""
     assert _Config.MAX_VERBOSITY == 4
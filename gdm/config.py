@@ -1,38 +1,133 @@
 """Wrappers for the dependency configuration files."""
 
 import os
+import time
 import logging
+import functools
+import itertools
+from collections import namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
+import yaml
 import yorm
 
 from . import common
 from . import shell
+from . import git
+from . import exports
+from . import mirrors
+from . import settings
+from .links import Links
+from .plans import Plan, get_size
 from .source import Source
+from .exceptions import InvalidConfig, UncommittedChanges
+
+String = yorm.converters.String
 
 log = logging.getLogger(__name__)
 
 
-@yorm.attr(all=Source)
-class Sources(yorm.converters.SortedList):
-    """A list of source dependencies."""
+def _invalidates(name):
+    """Wrap a list method that can move sources to discard the index."""
+    method = getattr(yorm.converters.SortedList, name)
 
+    def wrapped(self, *args, **kwargs):
+        self.__dict__.pop('_positions', None)
+        return method(self, *args, **kwargs)
+
+    wrapped.__name__ = name
+    return wrapped
 
-@yorm.attr(location=yorm.converters.String)
-@yorm.attr(sources=Sources)
-@yorm.attr(sources_locked=Sources)
-@yorm.sync("{self.root}/{self.filename}")
-class Config:
-    """A dictionary of dependency configuration options."""
+
+@yorm.attr(all=Source)
+class Sources(yorm.converters.SortedList):
+    """A list of source dependencies indexed by directory name."""
+
+    @classmethod
+    def to_data(cls, value):
+        """Sort and convert sources without yorm's per-item conversion."""
+        if not all(isinstance(source, Source) for source in value or ()):
+            return super().to_data(value)
+        data = []
+        for source in sorted(value, key=lambda source: dict.get(source, 'dir')):
+            item = {name: String.to_data(dict.get(source, name))
+                    for name in Source.ATTRIBUTES}
+            for name in Source.OPTIONAL:
+                if not item[name]:
+                    del item[name]
+            data.append(item)
+        return data
+
+    def index(self, value, *args):
+        """Get the position of the first source with the same directory."""
+        if args or not isinstance(value, Source):
+            return super().index(value, *args)
+        try:
+            return self._get_positions()[dict.get(value, 'dir')]
+        except KeyError:
+            raise ValueError("{!r} is not in list".format(value)) from None
+
+    def __contains__(self, value):
+        if not isinstance(value, Source):
+            return super().__contains__(value)
+        return dict.get(value, 'dir') in self._get_positions()
+
+    def __setitem__(self, key, value):
+        positions = self.__dict__.get('_positions')
+        if positions is not None:
+            same = isinstance(key, int) and isinstance(value, Source) and \
+                dict.get(list.__getitem__(self, key), 'dir') == \
+                dict.get(value, 'dir')
+            if not same:
+                del self.__dict__['_positions']
+        super().__setitem__(key, value)
+
+    def append(self, value):
+        super().append(value)
+        positions = self.__dict__.get('_positions')
+        if positions is not None:
+            positions.setdefault(dict.get(value, 'dir'), len(self) - 1)
+
+    __delitem__ = _invalidates('__delitem__')
+    __iadd__ = _invalidates('__iadd__')
+    __imul__ = _invalidates('__imul__')
+    clear = _invalidates('clear')
+    extend = _invalidates('extend')
+    insert = _invalidates('insert')
+    pop = _invalidates('pop')
+    remove = _invalidates('remove')
+    reverse = _invalidates('reverse')
+    sort = _invalidates('sort')
+
+    def _get_positions(self):
+        """Map each directory name to its first position.
+
+        Items are read with `list` and `dict` methods to bypass yorm's
+        fetch-on-access, which would reload the file for every source.
+
+        """
+        positions = self.__dict__.get('_positions')
+        if positions is None:
+            positions = {}
+            for position, source in enumerate(list.__iter__(self)):
+                positions.setdefault(dict.get(source, 'dir'), position)
+            self.__dict__['_positions'] = positions
+        return positions
+
+
+class _Base:
+    """Behavior shared by writable and read-only configurations."""
 
     FILENAMES = ('gdm.yml', 'gdm.yaml', '.gdm.yml', '.gdm.yaml')
+    LOCATION = 'gdm_sources'
 
-    def __init__(self, root, filename=FILENAMES[0], location='gdm_sources'):
-        super().__init__()
-        self.root = root
-        self.filename = filename
-        self.location = location
-        self.sources = []
-        self.sources_locked = []
+    # provided by each configuration
+    root = None  # directory containing the file
+    filename = None  # name of the file in `root`
+    location = None  # directory for sources relative to `root`
+    sources = ()
+    sources_locked = ()
 
     @property
     def path(self):
@@ -46,36 +141,46 @@ class Config:
 
     def install_deps(self, *names, depth=None,
                      update=True, recurse=False,
-                     force=False, fetch=False, clean=True):
+                     force=False, fetch=False, clean=None, mode=None,
+                     staged=False, links=None):
         """Get all sources."""
         if depth == 0:
             log.info("Skipped directory: %s", self.location_path)
             return 0
 
+        top = links is None
+        if top:
+            links = Links(self.location_path,
+                          prune=not names and depth is None)
+
         if not os.path.isdir(self.location_path):
             shell.mkdir(self.location_path)
         shell.cd(self.location_path)
 
         sources = self._get_sources(use_locked=False if update else None)
-        dirs = list(names) if names else [source.dir for source in sources]
+        pending = set(names) if names else None
         common.show()
         common.indent()
 
         count = 0
         for source in sources:
-            if source.dir in dirs:
-                dirs.remove(source.dir)
+            if pending is None:
+                pass
+            elif source.dir in pending:
+                pending.remove(source.dir)
             else:
                 log.info("Skipped dependency: %s", source.dir)
                 continue
 
-            source.update_files(force=force, fetch=fetch, clean=clean)
-            source.create_link(self.root, force=force)
+            with shell.stats.scope(source=self._get_path(source)):
+                source.update_files(force=force, fetch=fetch, clean=clean,
+                                    mode=mode, staged=staged)
+                source.create_link(self.root, force=force, links=links)
             count += 1
 
             common.show()
 
-            config = load()
+            config = load(writable=False)
             if config:
                 common.indent()
                 count += config.install_deps(
@@ -85,55 +190,299 @@ class Config:
                     force=force,
                     fetch=fetch,
                     clean=clean,
+                    mode=mode,
+                    staged=staged,
+                    links=links,
                 )
                 common.dedent()
 
             shell.cd(self.location_path, _show=False)
 
         common.dedent()
-        if dirs:
+        if top:
+            links.apply(force=force)
+
+        if pending:
+            dirs = [name for name in names if name in pending]
             log.error("No such dependency: %s", ' '.join(dirs))
             return 0
 
         return count
 
-    def lock_deps(self, *names, obey_existing=True):
-        """Lock down the immediate dependency versions."""
-        shell.cd(self.location_path)
-        common.show()
-        common.indent()
+    def plan_deps(self, *names, depth=None,
+                  force=False, fetch=False, clean=None, mode=None,
+                  staged=False, plan=None, after=(), preview=False,
+                  refresh=False, journal=None):
+        """Plan the operations to install sources without running them.
 
-        sources = self._get_sources(use_locked=obey_existing).copy()
-        dirs = list(names) if names else [source.dir for source in sources]
+        Nested configurations are planned by `load` operations once their
+        dependency is checked out, or immediately from the current checkout
+        when `preview` is set.
+
+        With `refresh`, each repository's mirror is fetched once and
+        dependencies fetch from it instead of the network, so plans for
+        several projects share the fetches.
+
+        With a `journal` left by an interrupted install, dependencies it
+        completed are skipped if still at the recorded revision, and
+        directories it was creating are deleted and created again.
+
+        """
+        plan = Plan(force=force) if plan is None else plan
+        if depth == 0:
+            log.info("Skipped directory: %s", self.location_path)
+            return plan
+
+        sources = self._get_sources(use_locked=None)
+        pending = set(names) if names else None
+        options = dict(force=force, fetch=fetch, clean=clean, mode=mode,
+                       staged=staged)
 
-        count = 0
         for source in sources:
-            if source.dir not in dirs:
+            if pending is None:
+                pass
+            elif source.dir in pending:
+                pending.remove(source.dir)
+            else:
                 log.info("Skipped dependency: %s", source.dir)
                 continue
 
-            try:
-                index = self.sources_locked.index(source)
-            except ValueError:
-                self.sources_locked.append(source.lock())
+            path = self._get_path(source)
+            export = (mode or source.mode) == 'export'
+            reference = mirrors.get_mirror(source.repo)
+            partial = journal and journal.is_partial('mirror', source.repo)
+            cached = os.path.isdir(reference) and not partial
+            incomplete = journal and journal.is_partial('checkout', path)
+            exists = os.path.exists(path) and not incomplete
+            requires = list(after)
+
+            if refresh or export or not exists:
+                detail = None if cached else "create"
+                if refresh and cached:
+                    detail = "refresh"
+                requires.append(plan.add(
+                    'mirror', source.repo, functools.partial(
+                        _mirror, source.repo, update=refresh,
+                        partial=partial),
+                    detail=detail, network=None if refresh else
+                    0 if cached else None, disk=0 if cached else None,
+                    journal=journal, path=reference))
+
+            info = dict(repo=source.repo, rev=source.rev,
+                        mode=mode or source.mode or None)
+            if journal and journal.is_done('checkout', path, path, **info):
+                log.info("Completed before interruption: %s", path)
+                checkout = plan.add('checkout', path, after=requires,
+                                    detail="completed before interruption")
             else:
-                self.sources_locked[index] = source.lock()
-            count += 1
+                steps, network, disk = self._estimate(
+                    source, reference, export=export, exists=exists,
+                    force=force, fetch=fetch, clean=clean, staged=staged)
+                if refresh and network is None:
+                    steps[0] = "fetch from mirror"
+                    network = 0
+                if incomplete:
+                    steps.insert(0, "delete partial")
+                checkout = plan.add(
+                    'checkout', path, functools.partial(
+                        self._checkout, source, redirect=refresh,
+                        partial=incomplete, **options),
+                    after=requires, detail=', '.join(steps),
+                    network=network, disk=disk, exclusive=True,
+                    journal=journal, path=path, info=info)
+
+            if source.link:
+                target = os.path.join(self.root, source.link)
+                plan.add('link', "{} -> {}".format(target, path),
+                         functools.partial(plan.links.add, target, path),
+                         after=[checkout])
+
+            nested = dict(options, refresh=refresh, journal=journal,
+                          depth=None if depth is None else max(0, depth - 1))
+            if preview:
+                plan.add('load', path, after=[checkout])
+                config = load(path, writable=False) \
+                    if os.path.isdir(path) else None
+                if config:
+                    config.plan_deps(plan=plan, after=[checkout],
+                                     preview=True, **nested)
+            else:
+                plan.add('load', path, functools.partial(
+                    _plan_nested, path, plan, [checkout], **nested),
+                    after=[checkout])
 
-            common.show()
+        if pending:
+            dirs = [name for name in names if name in pending]
+            log.error("No such dependency: %s", ' '.join(dirs))
+            plan.missing.extend(dirs)
 
-            shell.cd(self.location_path, _show=False)
+        return plan
 
-        if count:
-            yorm.update_file(self)
-        return count
+    def _checkout(self, source, redirect=False, partial=False, **options):
+        path = self._get_path(source)
+        if partial:
+            log.info("Deleting partial dependency: %s", path)
+            shell.trash(path)
+
+        env = {}
+        if redirect:  # the mirror was just refreshed
+            if (options['mode'] or source.mode) == 'export':
+                options['fetch'] = False
+            else:
+                env = mirrors.get_redirects([source.repo])
+
+        if not os.path.isdir(self.location_path):
+            shell.mkdir(self.location_path)
+        shell.cd(self.location_path)
+        with shell.stats.scope(source=path), \
+                shell.environment(env):
+            source.update_files(**options)
+        common.show()
+
+    @staticmethod
+    def _estimate(source, reference, *, export, exists, force, fetch, clean,
+                  staged):
+        """Describe a checkout's steps with its network and disk costs."""
+        steps = []
+        network = 0
+        disk = 0
+        if not exists:
+            steps.append("export" if export else "clone")
+            disk = get_size(reference) if os.path.isdir(reference) else None
+        elif fetch:
+            steps.append("fetch")
+            network = None
+        if exists and staged and not export:
+            steps.append("stage if changed")
+        steps.append("@ " + source.rev)
+        if not export:
+            policy = common.clean_policy(source.clean if clean is None
+                                         else clean)
+            if isinstance(policy, list):
+                steps.append("clean except " + ' '.join(policy))
+            elif policy != 'none':
+                steps.append("clean " + policy)
+        if force:
+            steps.append("force")
+        return steps, network, disk
 
     def uninstall_deps(self):
-        """Remove the sources location."""
+        """Move the sources location aside to be deleted in the background."""
         shell.cd(os.path.dirname(self.location_path))
-        shell.rm(self.location_path)
+        shell.trash(self.location_path)
         common.show()
 
+    def check_deps(self, allow_dirty=False, jobs=None):
+        """Count the installed dependencies, checking them concurrently."""
+        paths = list(self.get_paths())
+        if not allow_dirty:
+            _check_changes(paths, _changes, jobs)
+        return len(paths)
+
+    def prune_deps(self, force=False, jobs=None):
+        """Remove directories and links no configured source owns."""
+        orphans = list(self.get_orphans())
+        links = [path for path in orphans if os.path.islink(path)]
+        dirs = [path for path in orphans if not os.path.islink(path)]
+        if not force:
+            _check_changes(dirs, _orphan_changes, jobs)
+
+        for path in links:
+            common.show(shell.CMD_PREFIX + "rm " + path)
+            os.remove(path)
+        shell.trash(*dirs, into=os.path.dirname(self.location_path))
+
+        return len(orphans)
+
+    def remove_deps(self, *names, force=False):
+        """Remove installed dependencies by directory name."""
+        paths = [os.path.join(self.location_path, name) for name in names]
+        links = [path for path in paths if os.path.islink(path)]
+        dirs = [path for path in paths
+                if os.path.isdir(path) and not os.path.islink(path)]
+        if not force:
+            _check_changes(dirs, _orphan_changes)
+
+        for path in links:
+            common.show(shell.CMD_PREFIX + "rm " + path)
+            os.remove(path)
+        shell.trash(*dirs, into=os.path.dirname(self.location_path))
+
+        return len(links) + len(dirs)
+
+    def link_deps(self, links=None, force=False):
+        """Create the links for installed dependencies, recursively."""
+        top = links is None
+        if top:
+            links = Links(self.location_path, prune=True)
+
+        for source in self._get_sources():
+            path = self._get_path(source)
+            if source.link:
+                links.add(os.path.join(self.root, source.link), path)
+            if os.path.isdir(path):
+                config = load(path, writable=False)
+                if config:
+                    config.link_deps(links)
+
+        if top:
+            links.apply(force=force)
+        return links
+
+    def get_paths(self):
+        """Yield the path of each installed dependency, recursively."""
+        for source in self.sources:
+            path = self._get_path(source)
+            if os.path.isdir(path):
+                yield path
+                config = load(path, writable=False)
+                if config:
+                    yield from config.get_paths()
+
+    def get_repos(self):
+        """Yield each configured or locked repository URL, recursively."""
+        seen = set()
+        for source in itertools.chain(self.sources, self.sources_locked or ()):
+            if source.repo not in seen:
+                seen.add(source.repo)
+                yield source.repo
+
+        for source in self.sources:
+            path = self._get_path(source)
+            if os.path.isdir(path):
+                config = load(path, writable=False)
+                if config:
+                    for repo in config.get_repos():
+                        if repo not in seen:
+                            seen.add(repo)
+                            yield repo
+
+    def get_orphans(self):
+        """Yield the path of each unowned directory or link, recursively."""
+        if not os.path.isdir(self.location_path):
+            return
+        if not os.path.relpath(self.root, self.location_path).startswith('..'):
+            log.warning("Not pruning a location containing the project: %s",
+                        self.location_path)
+            return
+
+        owned = set()
+        for source in itertools.chain(self.sources, self.sources_locked or ()):
+            owned.add(source.dir.replace('\\', '/').split('/')[0])
+
+        for name in sorted(os.listdir(self.location_path)):
+            path = os.path.join(self.location_path, name)
+            if name.startswith(shell.TRASH_PREFIX):
+                continue
+            if name not in owned:
+                if os.path.islink(path) or os.path.isdir(path):
+                    log.info("Orphaned dependency: %s", path)
+                    yield path
+            elif os.path.isdir(path) and not os.path.islink(path):
+                config = load(path, writable=False)
+                if config:
+                    yield from config.get_orphans()
+
     def get_deps(self, depth=None, allow_dirty=True):
         """Yield the path, repository URL, and hash of each dependency."""
         if os.path.exists(self.location_path):
@@ -149,10 +498,12 @@ class Config:
                 log.info("Skipped dependency: %s", source.dir)
                 continue
 
-            yield source.identify(allow_dirty=allow_dirty)
+            with shell.stats.scope(source=self._get_path(source)):
+                identity = source.identify(allow_dirty=allow_dirty)
+            yield identity
             common.show()
 
-            config = load()
+            config = load(writable=False)
             if config:
                 common.indent()
                 yield from config.get_deps(
@@ -165,6 +516,50 @@ class Config:
 
         common.dedent()
 
+    def get_records(self, depth=None, allow_dirty=True, jobs=None,
+                    identify=None):
+        """Yield a record of each dependency as soon as it is identified.
+
+        Dependencies are identified concurrently without changing the
+        current directory, so records are yielded in completion order. Each
+        is a dictionary with `path`, `url`, `sha`, `dirty`, `depth` (the
+        dependency's level, starting at 1), and `seconds` to identify it.
+
+        `identify` replaces `identify_path`, e.g. to reuse records that are
+        still current.
+
+        """
+        identify = identify or identify_path
+        with ThreadPoolExecutor(jobs or settings.DEFAULT_JOBS) as pool:
+            pending = set()
+
+            def submit(config, level):
+                if depth is None or level <= depth:
+                    for source in config.sources:
+                        path = os.path.join(config.location_path,
+                                            source.dir)
+                        pending.add(pool.submit(identify, path, level))
+                else:
+                    log.info("Skipped directory: %s", config.location_path)
+
+            submit(self, 1)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record = future.result()
+                    if record['dirty'] and not allow_dirty:
+                        msg = "Uncommitted changes: {}".format(record['path'])
+                        raise UncommittedChanges(msg)
+                    yield record
+
+                    if record['url']:
+                        config = load(record['path'], writable=False)
+                        if config:
+                            submit(config, record['depth'] + 1)
+
+    def _get_path(self, source):
+        return os.path.join(self.location_path, source.dir)
+
     def _get_sources(self, *, use_locked=None):
         if use_locked is True:
             if self.sources_locked:
@@ -183,16 +578,303 @@ class Config:
                 return self.sources
 
 
-def load(root=None):
-    """Load the configuration for the current project."""
+@yorm.attr(location=String)
+@yorm.attr(sources=Sources)
+@yorm.attr(sources_locked=Sources)
+@yorm.sync("{self.root}/{self.filename}")
+class Config(_Base):
+    """A dictionary of dependency configuration options."""
+
+    def __init__(self, root, filename=_Base.FILENAMES[0],
+                 location=_Base.LOCATION):
+        super().__init__()
+        self.root = root
+        self.filename = filename
+        self.location = location
+        self.sources = []
+        self.sources_locked = []
+
+    def lock_deps(self, *names, obey_existing=True):
+        """Lock down the immediate dependency versions."""
+        shell.cd(self.location_path)
+        common.show()
+        common.indent()
+
+        count = 0
+        with self.transaction():
+            sources = self._get_sources(use_locked=obey_existing).copy()
+            dirs = set(names)
+
+            for source in sources:
+                if dirs and source.dir not in dirs:
+                    log.info("Skipped dependency: %s", source.dir)
+                    continue
+
+                with shell.stats.scope(source=self._get_path(source)):
+                    locked_source = source.lock()
+                try:
+                    index = self.sources_locked.index(source)
+                except ValueError:
+                    self.sources_locked.append(locked_source)
+                else:
+                    self.sources_locked[index] = locked_source
+                count += 1
+
+                common.show()
+
+                shell.cd(self.location_path, _show=False)
+
+        return count
+
+    @contextmanager
+    def transaction(self):
+        """Batch changes in memory and save the file once at the end.
+
+        The file is replaced atomically and only if its contents change.
+        Nothing is written if an exception is raised.
+
+        """
+        mapper = self.__mapper__  # pylint: disable=no-member
+        if not mapper.auto:
+            yield self  # already in a transaction
+            return
+
+        mapper.auto = False
+        try:
+            yield self
+            self._save(mapper)
+        finally:
+            mapper.auto = True
+
+    def _save(self, mapper):
+        data = {}
+        for name, converter in mapper.attrs.items():
+            data[name] = converter.to_data(getattr(self, name))
+        text = yaml.dump(data, Dumper=_Dumper,
+                         default_flow_style=False, allow_unicode=True)
+
+        if yorm.settings.fake:
+            if text != mapper.text:
+                mapper.text = text
+        elif os.path.isfile(self.path) and text == mapper.text:
+            log.debug("Unchanged config: %s", self.path)
+        else:
+            common.write_atomic(self.path, text)
+            log.debug("Saved config: %s", self.path)
+        mapper.modified = False
+
+
+class Snapshot(namedtuple('Snapshot', ['root', 'filename', 'location',
+                                       'sources', 'sources_locked']), _Base):
+    """A read-only view of a configuration file."""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_text(cls, root, filename, text):
+        """Parse the contents of a configuration file."""
+        path = os.path.join(root, filename)
+        try:
+            data = yaml.load(text, Loader=_Loader) or {}
+        except yaml.YAMLError as exc:
+            raise InvalidConfig("Invalid YAML in: {}".format(path)) from exc
+        if not isinstance(data, dict):
+            raise InvalidConfig("Expected a mapping in: {}".format(path))
+        return cls(root, filename,
+                   data.get('location') or cls.LOCATION,
+                   cls._parse_sources(data.get('sources'), path),
+                   cls._parse_sources(data.get('sources_locked'), path))
+
+    @staticmethod
+    def _parse_sources(data, path):
+        if not isinstance(data or [], list):
+            msg = "Expected a list of sources in: {}".format(path)
+            raise InvalidConfig(msg)
+        sources = []
+        for item in data or []:
+            if not isinstance(item, dict):
+                msg = "Expected a mapping for each source in: {}".format(path)
+                raise InvalidConfig(msg)
+            source = Source(_string(item.get('repo')),
+                            _string(item.get('dir')),
+                            _string(item.get('rev')) or 'master',
+                            _string(item.get('link')),
+                            _string(item.get('clean')),
+                            _string(item.get('large')),
+                            _string(item.get('mode')))
+            sources.append(_FrozenSource(source))
+        return tuple(sources)
+
+
+class _FrozenSource(Source):
+    """A copy of a source that cannot be changed, to be shared by snapshots."""
+
+    def __init__(self, source):
+        # pylint: disable=super-init-not-called,non-parent-init-called
+        dict.__init__(self, source)
+        object.__setattr__(self, '__dict__', self)
+
+    def _frozen(self, *args, **kwargs):
+        raise TypeError("Read-only source: {!r}".format(self))
+
+    __setattr__ = __delattr__ = __setitem__ = __delitem__ = _frozen
+    clear = pop = popitem = setdefault = update = _frozen
+
+
+_Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+_Dumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+_snapshots = {}
+
+
+def _check_changes(paths, changes, jobs=None):
+    """Fail if any of the working trees have changes, checked concurrently."""
+    with ThreadPoolExecutor(jobs or settings.DEFAULT_JOBS) as pool:
+        dirty = [path for path, changed in zip(paths, pool.map(changes, paths))
+                 if changed]
+
+    for path in dirty:
+        common.show(shell.CMD_PREFIX + "cd " + path)
+        if exports.read(path):
+            common.show("Modified export: {}".format(path))
+        elif not _is_repository(path):
+            common.show("Not a repository: {}".format(path))
+        else:
+            git.changes(_cwd=path)
+        common.show()
+    if dirty:
+        msg = "Uncommitted changes: {}".format(", ".join(dirty))
+        raise UncommittedChanges(msg)
+
+
+def _changes(path):
+    """Determine if a dependency has changes without entering it."""
+    with shell.stats.scope(source=path):
+        info = exports.read(path)
+        if info:
+            return not exports.verify(path, info)
+        return git.changes(display_status=False, _cwd=path)
+
+
+def _mirror(repo, update=False, partial=False):
+    """Create or refresh a mirror, replacing one left partially created."""
+    if partial:
+        reference = mirrors.get_mirror(repo)
+        log.info("Deleting partial mirror: %s", reference)
+        shell.trash(reference)
+    with shell.stats.scope(source=repo):
+        git.mirror(repo, update=update)
+
+
+def _plan_nested(path, plan, after, **options):
+    """Plan a dependency's nested configuration once it is checked out."""
+    config = load(path, writable=False) if os.path.isdir(path) else None
+    if config:
+        config.plan_deps(plan=plan, after=after, **options)
+
+
+def identify_path(path, depth=1):
+    """Get a record of a dependency's identity without entering it."""
+    start = time.monotonic()
+    record = dict(path=path, url=None, sha=None, dirty=False, depth=depth)
+    with shell.stats.scope(source=path):
+        info = exports.read(path)
+        if info:
+            record.update(url=info['repo'], sha=info['sha'])
+        elif os.path.isdir(path):
+            record.update(url=git.get_url(_cwd=path),
+                          sha=git.get_hash(_cwd=path))
+        record['dirty'] = is_dirty(path)
+    record['seconds'] = round(time.monotonic() - start, 3)
+    return record
+
+
+def is_dirty(path):
+    """Determine if a dependency has changes without using the network."""
+    with shell.stats.scope(source=path):
+        info = exports.read(path)
+        if info:
+            return exports.verify(path, info, offline=True) is False
+        if os.path.isdir(path):
+            return git.changes(display_status=False, _cwd=path)
+    return False
+
+
+def _orphan_changes(path):
+    """Determine if an unowned directory could contain unsaved work."""
+    if not _is_repository(path) and not exports.read(path):
+        return bool(os.listdir(path))
+    return _changes(path)
+
+
+def _is_repository(path):
+    return os.path.exists(os.path.join(path, '.git'))
+
+
+def _string(value):
+    return '' if value is None else str(value)
+
+
+def load(root=None, *, writable=True):
+    """Load the configuration for the current project.
+
+    A read-only `Snapshot` is returned unless `writable` is set, in which
+    case the file is mapped to a `Config` for changes to be saved.
+
+    """
     if root is None:
         root = os.getcwd()
 
-    for filename in os.listdir(root):
-        if filename.lower() in Config.FILENAMES:
-            config = Config(root, filename)
-            log.debug("Loaded config: %s", config.path)
-            return config
+    if writable:
+        filename = _find_filename(root)
+        config = Config(root, filename) if filename else None
+    else:
+        config = _load_snapshot(root)
+
+    if config is None:
+        log.debug("No config found in: %s", root)
+    else:
+        log.debug("Loaded config: %s", config.path)
+    return config
+
 
-    log.debug("No config found in: %s", root)
+def _find_filename(root):
+    for filename in os.listdir(root):
+        if filename.lower() in _Base.FILENAMES:
+            return filename
     return None
+
+
+def _load_snapshot(root):
+    """Find and parse a configuration file once per modification.
+
+    The file found is checked with a single `stat` on later loads and only
+    looked for again once it is replaced or removed.
+
+    """
+    try:
+        path, stamp, snapshot = _snapshots[root]
+    except KeyError:
+        pass
+    else:
+        if _get_stamp(path) == stamp:
+            return snapshot
+
+    filename = _find_filename(root)
+    if filename is None:
+        _snapshots.pop(root, None)
+        return None
+
+    path = os.path.join(root, filename)
+    stamp = _get_stamp(path)
+    with open(path) as stream:
+        snapshot = Snapshot.from_text(root, filename, stream.read())
+    _snapshots[root] = path, stamp, snapshot
+    return snapshot
+
+
+def _get_stamp(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
@@ -0,0 +1,239 @@
+"""Long-running server that answers commands from warm caches.
+
+The client half of this module only uses the standard library, so the
+command-line program can forward requests without importing the rest of
+the package.
+
+"""
+
+import os
+import json
+import time
+import signal
+import socket
+import logging
+import functools
+import threading
+import socketserver
+
+from . import common
+from . import settings
+
+COMMANDS = ('install', 'update', 'display', 'lock')  # served by the daemon
+
+log = logging.getLogger(__name__)
+
+
+def get_socket(path=None):
+    """Get the path of the daemon's socket."""
+    path = path or os.getenv(settings.DAEMON_SOCKET_ENV)
+    return os.path.expanduser(path or settings.DAEMON_SOCKET)
+
+
+class Client:
+    """Calls commands on a running daemon instead of in this process."""
+
+    def __init__(self, path=None):
+        self.path = get_socket(path)
+
+    def __getattr__(self, name):
+        if name not in COMMANDS:
+            raise AttributeError(name)
+        call = functools.partial(self.call, name)
+        call.__name__ = name
+        return call
+
+    def call(self, command, *args, **kwargs):
+        """Run a command in the daemon, printing any records it returns."""
+        request = dict(command=command, args=args, kwargs=kwargs,
+                       cwd=os.getcwd())
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            try:
+                client.connect(self.path)
+            except OSError as exc:
+                msg = "No daemon listening on: {}".format(self.path)
+                raise RuntimeError(msg) from exc
+            client.sendall(json.dumps(request).encode() + b'\n')
+            with client.makefile('r') as stream:
+                for line in stream:
+                    response = json.loads(line)
+                    if 'record' in response:
+                        print(_format_record(response['record'],
+                                             kwargs.get('format')))
+                    elif 'error' in response:
+                        raise RuntimeError(response['error'])
+                    elif 'result' in response:
+                        return response['result']
+        raise RuntimeError("No response from daemon: {}".format(self.path))
+
+
+def serve(path=None):
+    """Answer requests on a Unix socket until interrupted."""
+    signal.signal(signal.SIGTERM, _interrupt)
+    with Server(get_socket(path)) as server:
+        log.info("Serving on %s...", server.server_address)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            log.info("Daemon stopped")
+    return True
+
+
+class Handler(socketserver.StreamRequestHandler):
+    """Answers one request per connection with lines of JSON."""
+
+    def handle(self):
+        from . import commands
+
+        line = self.rfile.readline()
+        if not line:
+            return  # only checking the daemon is running
+
+        try:
+            request = json.loads(line.decode())
+            command = request['command']
+            if command not in COMMANDS:
+                raise ValueError("Unknown command: {}".format(command))
+            kwargs = dict(request.get('kwargs') or {})
+            for name in ('watch', 'plan'):
+                if kwargs.get(name):
+                    msg = "Run '--{}' outside the daemon".format(name)
+                    raise ValueError(msg)
+            cwd = request.get('cwd') or os.getcwd()
+            kwargs['root'] = commands._find_root(  # pylint: disable=protected-access
+                kwargs.get('root'), cwd=cwd)
+            if kwargs.get('roots'):
+                kwargs['roots'] = commands._find_roots(  # pylint: disable=protected-access
+                    kwargs['roots'], cwd=cwd)
+            if kwargs.get('bundle'):
+                kwargs['bundle'] = os.path.join(cwd, kwargs['bundle'])
+
+            if command == 'display':
+                result = self.display(**kwargs)
+            else:
+                with self.server.lock:
+                    result = getattr(commands, command)(
+                        *request.get('args') or (), **kwargs)
+        except Exception as exc:  # pylint: disable=broad-except
+            log.error("Request failed: %s", exc)
+            self.send(error=str(exc))
+        else:
+            self.send(result=result)
+
+    def display(self, root, depth=None, allow_dirty=True, jobs=None, **_):
+        from .config import load
+
+        config = load(root, writable=False)
+        if not config:
+            return False
+        count = 0
+        records = self.server.records
+        for record in config.get_records(
+                depth=depth, allow_dirty=allow_dirty, jobs=jobs,
+                identify=records.identify if allow_dirty else None):
+            self.send(record=record)
+            count += 1
+        return bool(count)
+
+    def send(self, **response):
+        self.wfile.write(json.dumps(response).encode() + b'\n')
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves requests concurrently, sharing caches between them."""
+
+    daemon_threads = True
+
+    def __init__(self, path):
+        from .config import identify_path, is_dirty
+
+        if _is_running(path):
+            raise RuntimeError("Daemon already running: {}".format(path))
+        if os.path.exists(path):
+            os.remove(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        super().__init__(path, Handler)
+        self.records = Records(identify_path, is_dirty)
+        self.lock = threading.Lock()  # commands change the current directory
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+class Records:
+    """Dependency records reused until their repository changes.
+
+    A record is identified again when the dependency's `HEAD`, current
+    branch, index, or export metadata is modified. Whether a dependency
+    has changes is always checked again, since editing a tracked file does
+    not modify any of these.
+
+    """
+
+    def __init__(self, identify, is_dirty):
+        self._identify = identify
+        self._is_dirty = is_dirty
+        self._cache = {}
+
+    def identify(self, path, depth):
+        """Get a cached record of a dependency or identify it."""
+        stamp = get_stamp(path)
+        cached = self._cache.get(path)
+        if cached and cached[0] == stamp:
+            start = time.monotonic()
+            dirty = self._is_dirty(path)
+            return dict(cached[1], depth=depth, dirty=dirty,
+                        seconds=round(time.monotonic() - start, 3))
+        record = self._identify(path, depth)
+        self._cache[path] = stamp, record
+        return record
+
+
+def get_stamp(path):
+    """Get the modification stamps of the files that identify a dependency."""
+    from .exports import METADATA
+
+    gitdir = os.path.join(path, '.git')
+    names = [os.path.join(gitdir, 'HEAD'), os.path.join(gitdir, 'index'),
+             os.path.join(gitdir, 'packed-refs'), os.path.join(path, METADATA)]
+    try:
+        with open(names[0]) as stream:
+            head = stream.read().strip()
+    except OSError:
+        pass
+    else:
+        if head.startswith('ref: '):
+            names.append(os.path.join(gitdir, head[5:]))
+
+    stamps = []
+    for name in names:
+        try:
+            stat = os.stat(name)
+        except OSError:
+            stamps.append(None)
+        else:
+            stamps.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+    return tuple(stamps)
+
+
+def _interrupt(*_):
+    raise KeyboardInterrupt
+
+
+def _is_running(path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+def _format_record(record, format):  # pylint: disable=redefined-builtin
+    if format:
+        return common.format_record(record, format)
+    return "{}: {}{}".format(record['path'], record['sha'] or '<unknown>',
+                             " <dirty>" if record['dirty'] else "")
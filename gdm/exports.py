@@ -0,0 +1,161 @@
+"""Utilities to install sources as plain files without a repository."""
+
+import os
+import shutil
+import hashlib
+import logging
+import tempfile
+
+import yaml
+
+from . import common
+from . import shell
+from . import git
+from . import mirrors
+from .exceptions import InvalidRepository, ShellError, UncommittedChanges
+
+METADATA = ".gdm-export.yml"  # written inside each exported directory
+
+log = logging.getLogger(__name__)
+
+_trees = {}  # path -> stamps of the metadata and files, tree hash
+
+
+def read(path):
+    """Get an exported directory's metadata, if it is one."""
+    try:
+        with open(os.path.join(path, METADATA)) as stream:
+            data = yaml.safe_load(stream)
+    except (OSError, yaml.YAMLError):
+        return None
+    return data if isinstance(data, dict) and data.get('sha') else None
+
+
+def update(repo, rev, path, *, force=False, fetch=False, cache=None):
+    """Replace a directory with the files at a revision from the mirror.
+
+    The files are extracted next to `path` and only moved into place once
+    complete. Existing files are only replaced if they match what was last
+    installed (compared by tree hash) unless `force` is set.
+
+    """
+    reference = git.mirror(repo, cache=cache, update=fetch)
+    sha = _get_commit(rev, reference)
+    if not sha and not fetch:
+        log.info("Fetching missing revision: %s", rev)
+        git.mirror(repo, cache=cache, update=True)
+        sha = _get_commit(rev, reference)
+    if not sha:
+        raise InvalidRepository("No such revision: {}".format(rev))
+    tree = git.get_tree(sha, _cwd=reference)
+
+    info = read(path)
+    modified = os.path.exists(path) and (info or not force) and \
+        _modified(path, info, reference)
+    if info and info['sha'] == sha and not modified:
+        log.info("Files already match: %s", sha)
+        return info
+    if modified and not force:
+        common.show()
+        msg = "Uncommitted changes: {}".format(os.path.abspath(path))
+        raise UncommittedChanges(msg)
+
+    parent = os.path.dirname(os.path.abspath(path))
+    temp = tempfile.mkdtemp(prefix=shell.TRASH_PREFIX, dir=parent)
+    try:
+        git.checkout_tree(sha, temp, _cwd=reference)
+        info = {'repo': repo, 'rev': rev, 'sha': sha, 'tree': tree}
+        common.write_atomic(os.path.join(temp, METADATA),
+                            yaml.safe_dump(info, default_flow_style=False))
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temp, 0o777 & ~umask)
+        shell.swap(temp, path)
+        shell.trash(temp)
+    finally:
+        if os.path.isdir(temp):
+            shutil.rmtree(temp)
+
+    return info
+
+
+def verify(path, info=None, cache=None, *, offline=False):
+    """Determine if an exported directory's files match its tree hash.
+
+    With `offline` set, only an existing mirror is used and None is returned
+    if there is no mirror to compare against.
+
+    """
+    info = info or read(path)
+    if not info:
+        return False
+    if offline:
+        reference = mirrors.get_mirror(info['repo'], cache)
+        if not os.path.isdir(reference):
+            log.info("No mirror to verify files: %s", path)
+            return None
+    else:
+        reference = git.mirror(info['repo'], cache=cache)
+    return _verify(path, info, reference)
+
+
+def _get_commit(rev, reference):
+    try:
+        return git.get_commit(rev, _cwd=reference)
+    except ShellError:
+        return None
+
+
+def _verify(path, info, reference):
+    tree = _hash_tree(path, info, reference)
+    if tree != info['tree']:
+        log.info("Tree %s does not match %s: %s", tree, info['tree'], path)
+        return False
+    return True
+
+
+def _hash_tree(path, info, reference):
+    """Get a directory's tree hash, reused until its files are changed."""
+    path = os.path.abspath(path)
+    stamps = _get_stamps(path)
+    try:
+        cached, tree = _trees[path]
+    except KeyError:
+        pass
+    else:
+        if cached == stamps:
+            return tree
+
+    try:
+        tree = git.hash_tree(path, info['tree'], exclude=[METADATA],
+                             _cwd=reference)
+    except ShellError:
+        return None
+    _trees[path] = stamps, tree
+    return tree
+
+
+def _get_stamps(path):
+    """Summarize the modification times and sizes of a directory's files."""
+    digest = hashlib.sha1()
+    for root, dirnames, filenames in os.walk(path):
+        dirnames.sort()
+        for name in sorted(filenames):
+            filename = os.path.join(root, name)
+            try:
+                stat = os.lstat(filename)
+            except FileNotFoundError:
+                continue
+            digest.update("{}\0{}\0{}\0{}\n".format(
+                os.path.relpath(filename, path), stat.st_mtime_ns,
+                stat.st_size, stat.st_ino).encode())
+    return digest.hexdigest()
+
+
+def _modified(path, info, reference):
+    """Determine if replacing a directory could lose work."""
+    if info:
+        return not _verify(path, info, reference)
+    if os.path.exists(os.path.join(path, '.git')):
+        return git.changes(include_untracked=True, _cwd=path)
+    return os.path.isdir(path) and bool(os.listdir(path))
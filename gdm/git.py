@@ -1,38 +1,333 @@
 """Utilities to call Git commands."""
 
 import os
+import re
+import time
+import random
 import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
 
 from . import common
+from . import settings
+from . import mirrors
+from .backends import operation
 from .shell import call
 from .exceptions import ShellError
 
 
 log = logging.getLogger(__name__)
 
+# errors that will not go away by retrying (checked first)
+PERMANENT_ERRORS = re.compile('|'.join([
+    r"repository .*not found",
+    r"authentication failed",
+    r"permission denied",
+    r"could not read (username|password)",
+    r"does not appear to be a git repository",
+    r"couldn't find remote ref",
+    r"not our ref",
+    r"returned error: 40[134]",
+]), re.IGNORECASE)
+# errors from dropped connections, overloaded servers, and stalled transfers
+TRANSIENT_ERRORS = re.compile('|'.join([
+    r"could not resolve host",
+    r"temporary failure in name resolution",
+    r"timed out",
+    r"connection (reset|refused|closed)",
+    r"broken pipe",
+    r"the remote end hung up unexpectedly",
+    r"early eof",
+    r"unexpected disconnect",
+    r"rpc failed",
+    r"returned error: (408|429|5\d\d)",
+    r"too many requests",
+    r"rate limit",
+    r"(gnutls|ssl|tls).*(error|failed)",
+    r"kex_exchange_identification",
+    r"ssh_exchange_identification",
+]), re.IGNORECASE)
+
+_hosts = {}  # host -> semaphore limiting concurrent network calls
+_hosts_lock = threading.Lock()
+
 
 def git(*args, **kwargs):
     return call('git', *args, **kwargs)
 
 
-def clone(repo, path, *, cache=None):
-    """Clone a new Git repository."""
-    cache = cache or os.path.expanduser("~/.gitcache")
+def transfer(repo, *args, **kwargs):
+    """Call Git to transfer from a repository, retrying transient errors.
+
+    Errors that look temporary (dropped connections, overloaded servers,
+    or a transfer stalled for `settings.NETWORK_STALL_SECONDS`) are retried
+    after an exponentially increasing, randomized delay. At most
+    `settings.NETWORK_HOST_JOBS` calls run concurrently per host.
+
+    """
+    if settings.NETWORK_STALL_SECONDS:
+        kwargs['_env'] = dict(
+            kwargs.get('_env') or {},
+            GIT_HTTP_LOW_SPEED_LIMIT=str(settings.NETWORK_STALL_BYTES),
+            GIT_HTTP_LOW_SPEED_TIME=str(settings.NETWORK_STALL_SECONDS))
+    attempts = max(1, settings.NETWORK_ATTEMPTS)
+    for attempt in range(1, attempts + 1):
+        try:
+            with _limit(get_host(repo)):
+                return git(*args, **kwargs)
+        except ShellError as exc:
+            if attempt == attempts or not is_transient(exc):
+                raise
+            delay = _get_delay(attempt)
+            log.warning("Retrying in %.1f seconds (attempt %s of %s): %s",
+                        delay, attempt + 1, attempts, _get_reason(exc))
+            time.sleep(delay)
+
+
+def is_transient(error):
+    """Determine if a failed call to Git might succeed if retried."""
+    message = str(error)
+    if PERMANENT_ERRORS.search(message):
+        return False
+    return bool(TRANSIENT_ERRORS.search(message))
+
+
+def get_host(repo):
+    """Get the host of a repository URL (None for local repositories).
+
+    >>> get_host('https://github.com/jacebrowning/gdm-demo')
+    'github.com'
+    >>> get_host('git@github.com:jacebrowning/gdm-demo.git')
+    'github.com'
+    >>> get_host('file:///tmp/repo.git') is None
+    True
+
+    """
+    if '://' in repo:
+        return urlsplit(repo).hostname or None
+    match = re.match(r"(?:[^@/]+@)?([^:/]{2,}):", repo)  # e.g. user@host:path
+    return match.group(1) if match else None
+
+
+@contextmanager
+def _limit(host):
+    """Wait for a slot to call a host if it has too many calls running."""
+    if host is None:
+        yield
+        return
+    with _hosts_lock:
+        if host not in _hosts:
+            _hosts[host] = threading.BoundedSemaphore(
+                max(1, settings.NETWORK_HOST_JOBS))
+        semaphore = _hosts[host]
+    with semaphore:
+        yield
+
+
+def _get_delay(attempt):
+    """Get a randomized delay that doubles after each attempt."""
+    delay = min(settings.NETWORK_RETRY_MAX_DELAY,
+                settings.NETWORK_RETRY_DELAY * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _get_reason(error):
+    """Get the last line Git printed before failing."""
+    lines = [line.strip() for line in str(error).splitlines() if line.strip()]
+    return lines[-1] if lines else "unknown error"
+
+
+@operation
+def clone(repo, path, *, cache=None, config=()):
+    """Clone a new Git repository (with optional configuration)."""
+    cache = mirrors.get_cache(cache)
+    reference = mirror(repo, cache=cache)
+
+    options = []
+    for key, value in config:
+        options.extend(['-c', key + '=' + value])
+    transfer(repo, 'clone', *options, '--reference', reference, repo, path)
+    mirrors.record_fetch(cache)
+
+
+def mirror(repo, *, cache=None, update=False):  # pylint: disable=redefined-outer-name
+    """Get the path to a repository's mirror, creating it if needed."""
+    cache = mirrors.get_cache(cache)
 
     if not os.path.isdir(cache):
         os.makedirs(cache)
 
-    name = repo.split('/')[-1]
-    if name.endswith(".git"):
-        name = name[:-4]
-
-    reference = os.path.join(cache, name + ".reference")
+    reference = mirrors.get_mirror(repo, cache)
     if not os.path.isdir(reference):
-        git('clone', '--mirror', repo, reference)
+        transfer(repo, 'clone', '--mirror', repo, reference)
+    elif update:
+        transfer(repo, 'fetch', '--prune', 'origin', _cwd=reference)
+    return reference
+
+
+def bundle(path, *, _cwd=None):
+    """Write every reference in a repository to a bundle file."""
+    git('bundle', 'create', path, '--all', _cwd=_cwd)
+
+
+def unbundle(path, repo, reference):
+    """Create or update a mirror from a bundle file."""
+    if os.path.isdir(reference):
+        git('fetch', '--prune', path, '+refs/*:refs/*', _cwd=reference)
+    else:
+        git('clone', '--mirror', path, reference)
+        git('remote', 'set-url', 'origin', repo, _cwd=reference)
+
+
+@operation
+def get_commit(rev, *, _cwd=None):
+    """Get the hash of a revision without checking it out."""
+    if '@{' in rev:
+        branch, date = rev.split('@', 1)
+        before = '--before={!r}'.format(date.strip("{}"))
+        return git('rev-list', '-n', '1', before, branch,
+                   _show=False, _capture=True, _cwd=_cwd) or None
+    return git('rev-parse', '--verify', '--quiet', rev + '^{commit}',
+               _show=False, _capture=True, _cwd=_cwd)
+
+
+@operation
+def show_file(rev, path, *, _cwd=None):
+    """Get the contents of a file at a revision without checking it out."""
+    return git('cat-file', '-p', '{}:{}'.format(rev, path),
+               _show=False, _capture=True, _cwd=_cwd)
+
+
+def get_tree(rev, *, _cwd=None):
+    """Get the hash of a revision's tree."""
+    return git('rev-parse', '--verify', rev + '^{tree}',
+               _show=False, _capture=True, _cwd=_cwd)
+
+
+def checkout_tree(rev, path, *, _cwd=None):
+    """Write a revision's files to a directory without a repository.
+
+    A temporary index is used, so `_cwd` can be a bare repository.
+
+    """
+    with tempfile.TemporaryDirectory() as temp:
+        env = {'GIT_INDEX_FILE': os.path.join(temp, 'index')}
+        git('read-tree', rev, _show=False, _cwd=_cwd, _env=env)
+        git('--work-tree=' + os.path.abspath(path), 'checkout-index',
+            '--all', '--force', _cwd=_cwd, _env=env)
+
+
+def hash_tree(path, base, *, exclude=(), _cwd=None):
+    """Get the tree hash a directory's files would have if committed.
+
+    Files tracked in `base` stay tracked even if they are ignored. Objects
+    are written to a temporary directory, so `_cwd` (a bare repository
+    containing `base`) is not modified.
+
+    """
+    path = os.path.abspath(path)
+    gitdir = os.path.abspath(_cwd or '.')
+    with tempfile.TemporaryDirectory() as temp:
+        objects = os.path.join(temp, 'objects')
+        os.mkdir(objects)
+        env = {
+            'GIT_DIR': gitdir,
+            'GIT_WORK_TREE': path,
+            'GIT_INDEX_FILE': os.path.join(temp, 'index'),
+            'GIT_OBJECT_DIRECTORY': objects,
+            'GIT_ALTERNATE_OBJECT_DIRECTORIES': os.path.join(gitdir,
+                                                             'objects'),
+        }
+        hide = {'_show': False, '_cwd': path, '_env': env}
+        git('read-tree', base, **hide)
+        git('add', '--all', '--', '.',
+            *(':(exclude)' + name for name in exclude), **hide)
+        return git('write-tree', _capture=True, **hide)
+
+
+def configure(config):
+    """Set options in the current repository's configuration."""
+    for key, value in config:
+        git('config', key, value, _show=False)
+
+
+def get_large_config():
+    """Get the large working tree options set in the current repository."""
+    keys = settings.LARGE_TREE_CONFIG + settings.LARGE_TREE_FSMONITOR_CONFIG
+    pattern = '^({})$'.format('|'.join(key.lower().replace('.', r'\.')
+                                       for key, _ in keys))
+    output = git('--no-pager', 'config', '--get-regexp', pattern,
+                 _show=False, _ignore=True, _capture=True)
+    return [tuple(line.split(' ', 1)) for line in (output or '').splitlines()]
+
+
+def read_head(path):
+    """Get a working tree's checked out hash without spawning Git."""
+    gitdir = os.path.join(path, '.git')
+    try:
+        with open(os.path.join(gitdir, 'HEAD')) as stream:
+            head = stream.read().strip()
+    except OSError:
+        return None
 
-    git('clone', '--reference', reference, repo, path)
+    if not head.startswith('ref: '):
+        return head
 
+    ref = head[5:]
+    try:
+        with open(os.path.join(gitdir, ref)) as stream:
+            return stream.read().strip()
+    except OSError:
+        pass
+    try:
+        with open(os.path.join(gitdir, 'packed-refs')) as stream:
+            for line in stream:
+                if line.rstrip('\n').endswith(' ' + ref):
+                    return line.split(' ', 1)[0]
+    except OSError:
+        pass
+    return None
+
+
+def dissociate(path):
+    """Copy objects borrowed from a mirror into a working tree's repository.
 
+    Returns True if the repository had borrowed objects.
+
+    """
+    alternates = os.path.join(path, '.git', 'objects', 'info', 'alternates')
+    if not os.path.exists(alternates):
+        return False
+    git('repack', '-a', '-d', '--quiet', _cwd=path)
+    os.remove(alternates)
+    return True
+
+
+def has_tree(path):
+    """Determine if a working tree's checked out tree can be read."""
+    try:
+        git('cat-file', '-e', 'HEAD^{tree}', _show=False, _cwd=path)
+    except ShellError:
+        return False
+    return True
+
+
+def get_index_size():
+    """Get the size of the current working tree's index in bytes."""
+    try:
+        return os.path.getsize(os.path.join('.git', 'index'))
+    except OSError:
+        return 0
+
+
+def write_commit_graph():
+    """Write a commit-graph file to speed up history traversal."""
+    git('commit-graph', 'write', '--reachable', _show=False, _ignore=True)
+
+
+@operation
 def fetch(repo, rev=None):
     """Fetch the latest changes from the remote repository."""
     git('remote', 'rm', 'origin', _show=False, _ignore=True)
@@ -45,23 +340,26 @@ def fetch(repo, rev=None):
             pass  # fetch doesn't work with rev-parse
         else:
             args.append(rev)
-    git(*args)
+    transfer(repo, *args)
+    mirrors.record_fetch()
 
 
-def changes(include_untracked=False, display_status=True, _show=False):
+@operation
+def changes(include_untracked=False, display_status=True, _show=False,
+            _cwd=None):
     """Determine if there are changes in the working tree."""
     status = False
 
     try:
         # refresh changes
-        git('update-index', '-q', '--refresh', _show=False)
+        git('update-index', '-q', '--refresh', _show=False, _cwd=_cwd)
 
         # check for uncommitted changes
-        git('diff-index', '--quiet', 'HEAD', _show=_show)
+        git('diff-index', '--quiet', 'HEAD', _show=_show, _cwd=_cwd)
 
         # check for untracked files
         output = git('ls-files', '--others', '--exclude-standard',
-                     _show=_show, _capture=True)
+                     _show=_show, _capture=True, _cwd=_cwd)
 
     except ShellError:
         status = True
@@ -70,19 +368,33 @@ def changes(include_untracked=False, display_status=True, _show=False):
         status = bool(output.splitlines()) and include_untracked
 
     if status and display_status:
-        for line in git('status', _show=True, _capture=True).splitlines():
+        for line in git('status', _show=True, _capture=True,
+                        _cwd=_cwd).splitlines():
             common.show(line)
 
     return status
 
 
+@operation
 def update(rev, *, clean=True, fetch=False):  # pylint: disable=redefined-outer-name
-    """Update the working tree to the specified revision."""
+    """Update the working tree to the specified revision.
+
+    `clean` is a policy from `common.clean_policy`: 'none' leaves all
+    untracked files, 'untracked' keeps ignored files, 'full' deletes both,
+    and a list of patterns deletes everything except matching files.
+
+    """
     hide = {'_show': False, '_ignore': True}
+    clean = common.clean_policy(clean)
 
     git('stash', **hide)
-    if clean:
-        git('clean', '--force', '-d', '-x', _show=False)
+    if clean != 'none':
+        args = ['clean', '--force', '-d']
+        if clean != 'untracked':
+            args.append('-x')
+        for pattern in clean if isinstance(clean, list) else ():
+            args.extend(['--exclude', pattern])
+        git(*args, _show=False)
 
     rev = _get_sha_from_rev(rev)
     git('checkout', '--force', rev)
@@ -93,27 +405,58 @@ def update(rev, *, clean=True, fetch=False):  # pylint: disable=redefined-outer-
         git('pull', '--ff-only', '--no-rebase', **hide)
 
 
-def get_url():
+def get_untracked(clean='none', _cwd=None):
+    """Get the untracked and ignored paths `update` keeps with a policy.
+
+    Directories with nothing tracked are listed once, with a trailing slash.
+
+    """
+    clean = common.clean_policy(clean)
+    hide = {'_show': False, '_capture': True, '_cwd': _cwd}
+    if clean == 'full':
+        return []
+    if isinstance(clean, list):
+        args = ['ls-files', '-z', '--others', '--ignored']
+        for pattern in clean:
+            args.extend(['--exclude', pattern])
+        return [path for path in git(*args, **hide).split('\0') if path]
+
+    codes = ('??', '!!') if clean == 'none' else ('!!',)
+    output = git('status', '--porcelain', '-z', '--ignored', **hide)
+    paths = []
+    for path in sorted(entry[3:] for entry in output.split('\0')
+                       if entry[:2] in codes):
+        directory = paths[-1] if paths and paths[-1].endswith('/') else None
+        if not (directory and path.startswith(directory)):
+            paths.append(path)
+    return paths
+
+
+@operation
+def get_url(_cwd=None):
     """Get the current repository's URL."""
     return git('config', '--get', 'remote.origin.url',
-               _show=False, _capture=True)
+               _show=False, _capture=True, _cwd=_cwd)
 
 
-def get_hash(_show=False):
+@operation
+def get_hash(_show=False, _cwd=None):
     """Get the current working tree's hash."""
-    return git('rev-parse', 'HEAD', _show=_show, _capture=True)
+    return git('rev-parse', 'HEAD', _show=_show, _capture=True, _cwd=_cwd)
 
 
-def get_tag():
+@operation
+def get_tag(_cwd=None):
     """Get the current working tree's tag (if on a tag)."""
     return git('describe', '--tags', '--exact-match',
-               _show=False, _ignore=True, _capture=True)
+               _show=False, _ignore=True, _capture=True, _cwd=_cwd)
 
 
-def get_branch():
+@operation
+def get_branch(_cwd=None):
     """Get the current working tree's branch."""
     return git('rev-parse', '--abbrev-ref', 'HEAD',
-               _show=False, _capture=True)
+               _show=False, _capture=True, _cwd=_cwd)
 
 
 def _get_sha_from_rev(rev):
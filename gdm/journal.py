@@ -0,0 +1,109 @@
+"""Records of install operations so that interrupted runs can resume."""
+
+import os
+import json
+import logging
+import threading
+
+from . import git
+from . import exports
+
+FILENAME = ".gdm-journal"  # in the sources location until an install completes
+
+log = logging.getLogger(__name__)
+
+
+class Journal:
+    """Operations started and completed in a location.
+
+    Entries are appended as operations run, so an interrupted install
+    leaves behind which directories were being created and which were
+    completed (with the revision they were left at).
+
+    """
+
+    def __init__(self, location):
+        self.path = os.path.join(location, FILENAME)
+        self.entries = _read(self.path)  # "kind target" -> latest entry
+        self._lock = threading.Lock()
+        if self.entries:
+            log.info("Resuming from journal: %s", self.path)
+
+    def get(self, kind, target):
+        """Get the latest entry of an operation or None."""
+        return self.entries.get(_get_key(kind, target))
+
+    def is_done(self, kind, target, path, **info):
+        """Determine if an operation completed and its result is intact.
+
+        The entry must match `info` (e.g. the source's revision) and the
+        directory must still be at the revision that was recorded.
+
+        """
+        entry = self.get(kind, target)
+        if not entry or entry['state'] != 'done':
+            return False
+        if any(entry.get(name) != value for name, value in info.items()):
+            return False
+        return bool(entry.get('sha')) and entry['sha'] == get_sha(path)
+
+    def is_partial(self, kind, target):
+        """Determine if an interrupted operation left a new directory."""
+        entry = self.get(kind, target) or {}
+        return entry.get('state') == 'started' and bool(entry.get('created'))
+
+    def start(self, operation):
+        """Record that an operation is about to change its directory."""
+        self._append(operation, state='started',
+                     created=not os.path.exists(operation.path))
+
+    def finish(self, operation):
+        """Record that an operation completed."""
+        self._append(operation, state='done', sha=get_sha(operation.path),
+                     **operation.info)
+
+    def clear(self):
+        """Delete the journal once every operation is complete."""
+        self.entries.clear()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+            log.debug("Deleted journal: %s", self.path)
+
+    def _append(self, operation, **entry):
+        key = _get_key(operation.kind, operation.target)
+        entry['key'] = key
+        line = json.dumps(entry, sort_keys=True) + '\n'
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a') as stream:
+                stream.write(line)
+                stream.flush()
+                os.fsync(stream.fileno())
+            self.entries[key] = entry
+
+
+def get_sha(path):
+    """Get the revision a dependency is at without spawning Git."""
+    info = exports.read(path)
+    if info:
+        return info['sha']
+    return git.read_head(path)
+
+
+def _get_key(kind, target):
+    return "{} {}".format(kind, target)
+
+
+def _read(path):
+    entries = {}
+    try:
+        with open(path) as stream:
+            for line in stream:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # partially written when interrupted
+                entries[entry['key']] = entry
+    except FileNotFoundError:
+        pass
+    return entries
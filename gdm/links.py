@@ -0,0 +1,129 @@
+"""Utilities to reconcile symbolic links to dependencies."""
+
+import os
+import json
+import shutil
+import logging
+from collections import OrderedDict
+
+from . import common
+from . import shell
+from .exceptions import UncommittedChanges
+
+FILENAME = ".gdm-links"  # in the sources location, the links gdm created
+
+log = logging.getLogger(__name__)
+
+
+class Links:
+    """The desired symbolic links for a tree of dependencies.
+
+    Links are relative to the directory containing them, so a project can
+    be moved with its dependencies.
+
+    With a `location`, the links applied are recorded in it. Recorded links
+    that are no longer desired are removed when `prune` is set, which
+    requires every link in the tree to have been added.
+
+    """
+
+    def __init__(self, location=None, prune=False):
+        self.desired = OrderedDict()  # target path -> link text
+        self.record = location and os.path.join(location, FILENAME)
+        self.prune = prune
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.removed = 0
+
+    def __len__(self):
+        return len(self.desired)
+
+    def add(self, target, source):
+        """Record that `target` should link to the `source` directory."""
+        target = os.path.abspath(target)
+        text = os.path.relpath(source, os.path.dirname(target))
+        log.debug("Desired link: %s -> %s", target, text)
+        self.desired[target] = text
+
+    def apply(self, force=False):
+        """Change only the links that differ from the desired set."""
+        changes = []
+        for target, text in self.desired.items():
+            if os.path.islink(target):
+                if os.readlink(target) == text:
+                    self.unchanged += 1
+                else:
+                    changes.append((target, text, False))
+            elif os.path.exists(target):
+                if not force:
+                    common.show()
+                    msg = "Preexisting link location: {}".format(target)
+                    raise UncommittedChanges(msg)
+                changes.append((target, text, True))
+            else:
+                changes.append((target, text, None))
+
+        for target, text, existing in changes:
+            if existing is None:
+                log.info("Creating link: %s -> %s", target, text)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.symlink(text, target)
+                self.created += 1
+            else:
+                log.info("Updating link: %s -> %s", target, text)
+                if existing and os.path.isdir(target):
+                    shutil.rmtree(target)
+                _replace_link(text, target)
+                self.updated += 1
+
+        if self.record:
+            self._update_record()
+
+        log.info("Links: %s created, %s updated, %s unchanged, %s removed",
+                 self.created, self.updated, self.unchanged, self.removed)
+        return self
+
+    def _update_record(self):
+        """Record the applied links, removing stale ones when pruning."""
+        recorded = _read(self.record)
+        for target, text in recorded.items():
+            if target in self.desired or not self.prune:
+                continue
+            if os.path.islink(target) and os.readlink(target) == text:
+                log.info("Removing stale link: %s -> %s", target, text)
+                common.show(shell.CMD_PREFIX + "rm " + target)
+                os.remove(target)
+                self.removed += 1
+
+        links = {} if self.prune else dict(recorded)
+        links.update(self.desired)
+        if links != recorded and os.path.isdir(os.path.dirname(self.record)):
+            common.write_atomic(self.record, json.dumps(links, indent=2,
+                                                        sort_keys=True))
+
+
+def _replace_link(text, target):
+    """Point a link at a new location without it ever being missing."""
+    temp = os.path.join(os.path.dirname(target),
+                        ".{}.gdm-{}".format(os.path.basename(target),
+                                            os.getpid()))
+    if os.path.lexists(temp):
+        os.remove(temp)
+    os.symlink(text, temp)
+    try:
+        os.replace(temp, target)
+    except OSError:
+        os.remove(temp)
+        raise
+
+
+def _read(path):
+    try:
+        with open(path) as stream:
+            return json.load(stream)
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        log.warning("Ignoring invalid record of links: %s", path)
+        return {}
@@ -0,0 +1,190 @@
+"""Utilities to maintain the cache of mirrored repositories."""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from . import common
+from . import shell
+from . import settings
+from .exceptions import ShellError
+
+MARKER = "gdm-maintained"  # touched inside each mirror after maintenance
+COUNTER = ".gdm-fetches"  # fetches since the last automatic maintenance
+
+# Git commands for tasks `git maintenance run` does not provide
+COMMANDS = {
+    'reflog-expire': ('reflog', 'expire', '--all'),
+}
+# Git command replacing every task when `git maintenance` is not available
+FALLBACK = ('gc', '--quiet')
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()  # guards the fetch counter
+
+
+def get_cache(cache=None):
+    """Get the directory containing the mirrored repositories."""
+    return cache or os.path.expanduser(settings.CACHE)
+
+
+def get_mirror(repo, cache=None):
+    """Get the path of the mirror for a repository URL."""
+    name = repo.rstrip('/').split('/')[-1]
+    if name.endswith(".git"):
+        name = name[:-4]
+    return os.path.join(get_cache(cache), name + ".reference")
+
+
+def get_redirects(repos, cache=None):
+    """Get the environment variables to access repositories through mirrors.
+
+    Git's `url.<base>.insteadOf` is passed through the environment, so the
+    original URLs are still recorded as each working tree's remote.
+
+    """
+    env = {}
+    count = int(os.environ.get('GIT_CONFIG_COUNT') or 0)
+    for index, repo in enumerate(repos, start=count):
+        key = "url.{}.insteadOf".format(get_mirror(repo, cache))
+        env['GIT_CONFIG_KEY_{}'.format(index)] = key
+        env['GIT_CONFIG_VALUE_{}'.format(index)] = repo
+    if env:
+        env['GIT_CONFIG_COUNT'] = str(count + len(repos))
+    return env
+
+
+@contextmanager
+def redirect(repos, cache=None):
+    """Access each repository through its mirror rather than the network."""
+    env = get_redirects(repos, cache)
+    previous = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                del os.environ[key]
+            else:
+                os.environ[key] = value
+
+
+def get_mirrors(cache=None):
+    """Get the path of each mirror, least recently maintained first."""
+    cache = get_cache(cache)
+    if not os.path.isdir(cache):
+        return []
+
+    paths = []
+    for name in os.listdir(cache):
+        path = os.path.join(cache, name)
+        if name.endswith(".reference") and os.path.isdir(path):
+            paths.append(path)
+    return sorted(paths, key=lambda path: (_get_maintained(path), path))
+
+
+def maintain(cache=None, budget=None, jobs=None):
+    """Repack and index each mirror concurrently within a time budget.
+
+    Returns the number of mirrors that completed every task. Mirrors are
+    maintained least recently first, so repeated runs with a small
+    `budget` (in seconds) eventually cover the whole cache.
+
+    With a version of Git lacking `git maintenance` (or one of its tasks),
+    each mirror is garbage collected instead. A mirror with a failing task
+    is reported and not marked as maintained, so it is tried first next
+    time.
+
+    """
+    deadline = None if budget is None else time.monotonic() + budget
+
+    def run(path):
+        with shell.stats.scope(source=path):
+            for task in settings.CACHE_MAINTENANCE_TASKS:
+                if deadline is not None and time.monotonic() >= deadline:
+                    log.info("Maintenance time budget exceeded: %s", path)
+                    return False
+                args = COMMANDS.get(task) or \
+                    ('maintenance', 'run', '--task=' + task)
+                try:
+                    shell.call('git', *args, _show=False, _cwd=path)
+                except ShellError as exc:
+                    if args[0] == 'maintenance' and _is_unknown(exc):
+                        log.info("Falling back to 'git %s': %s",
+                                 ' '.join(FALLBACK), path)
+                        return run_fallback(path)
+                    log.warning("Maintenance task '%s' failed: %s%s",
+                                task, path, exc)
+                    return False
+        return mark(path)
+
+    def run_fallback(path):
+        try:
+            shell.call('git', *FALLBACK, _show=False, _cwd=path)
+        except ShellError as exc:
+            log.warning("Maintenance failed: %s%s", path, exc)
+            return False
+        return mark(path)
+
+    def mark(path):
+        with open(os.path.join(path, MARKER), 'w'):
+            pass
+        common.show(shell.CMD_PREFIX + "git maintenance run: " + path)
+        return True
+
+    paths = get_mirrors(cache)
+    with ThreadPoolExecutor(jobs or settings.MAINTENANCE_JOBS) as pool:
+        return sum(pool.map(run, paths))
+
+
+def record_fetch(cache=None):
+    """Count a fetch toward the next automatic maintenance."""
+    if not settings.CACHE_MAINTENANCE_INTERVAL:
+        return None
+    path = os.path.join(get_cache(cache), COUNTER)
+    with _lock:
+        count = _read_count(path) + 1
+        try:
+            common.write_atomic(path, str(count))
+        except OSError as exc:
+            log.debug("Unable to count fetch: %s", exc)
+    return count
+
+
+def maintain_if_due(cache=None):
+    """Maintain the cache when enough fetches have been recorded."""
+    interval = settings.CACHE_MAINTENANCE_INTERVAL
+    path = os.path.join(get_cache(cache), COUNTER)
+    with _lock:
+        if not interval or _read_count(path) < interval:
+            return None
+        common.write_atomic(path, "0")
+
+    log.info("Maintaining cached repositories after %s fetches...", interval)
+    return maintain(cache, budget=settings.CACHE_MAINTENANCE_BUDGET)
+
+
+def _get_maintained(path):
+    try:
+        return os.path.getmtime(os.path.join(path, MARKER))
+    except OSError:
+        return 0
+
+
+def _is_unknown(exc):
+    """Determine if Git failed because it lacks a maintenance task."""
+    return any(text in str(exc) for text in ("is not a git command",
+                                             "is not a valid task"))
+
+
+def _read_count(path):
+    try:
+        with open(path) as stream:
+            return int(stream.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
@@ -0,0 +1,350 @@
+"""Graphs of the operations needed to install dependencies."""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from . import shell
+from . import settings
+from .journal import get_sha
+from .links import Links
+
+KINDS = ('mirror', 'checkout', 'link', 'load')
+TRANSFERS = ('git clone', 'git fetch')  # steps that download objects
+
+log = logging.getLogger(__name__)
+
+
+class Operation:
+    """A step of a plan, run once the operations it comes `after` are done.
+
+    `network` and `disk` are estimated bytes, or `None` when unknown.
+    `exclusive` operations change the current directory, so only one of
+    them runs at a time. `estimate` is the median seconds of previous runs.
+    Once run, the operation is `changed` if it downloaded objects or changed
+    the revision of the directory at `path`.
+
+    With a `journal`, the operation is recorded as started and completed
+    (along with `info`) so an interrupted install can resume around the
+    directory at `path`.
+
+    """
+
+    def __init__(self, kind, target, action=None, after=(), detail=None,
+                 network=0, disk=0, exclusive=False,
+                 journal=None, path=None, info=None):
+        assert kind in KINDS
+        self.kind = kind
+        self.target = target
+        self.action = action
+        self.after = list(after)
+        self.detail = detail
+        self.network = network
+        self.disk = disk
+        self.exclusive = exclusive
+        self.journal = journal
+        self.path = path
+        self.info = info or {}
+        self.estimate = None
+        self.state = None  # 'running' or 'done'
+        self.seconds = None
+        self.steps = {}  # e.g. 'git fetch' -> seconds
+        self.changed = False
+
+    def __repr__(self):
+        return "<operation {}>".format(self)
+
+    def __str__(self):
+        text = "{} {}".format(self.kind, self.target)
+        if self.detail:
+            text += " ({})".format(self.detail)
+        return text
+
+    @property
+    def key(self):
+        return self.kind, self.target
+
+    def run(self):
+        """Perform the operation and record how long it took."""
+        log.debug("Running operation: %s", self)
+        before = shell.stats.get_steps(self.target)
+        revision = get_sha(self.path) if self.path else None
+        start = time.monotonic()
+        if self.journal:
+            self.journal.start(self)
+        if self.action:
+            self.action()
+        if self.journal:
+            self.journal.finish(self)
+        self.seconds = time.monotonic() - start
+        for step, seconds in shell.stats.get_steps(self.target).items():
+            seconds -= before.get(step, 0)
+            if seconds:
+                self.steps[step] = seconds
+        if self.action:
+            transferred = any(step in TRANSFERS for step in self.steps)
+            moved = bool(self.path) and get_sha(self.path) != revision
+            self.changed = transferred or moved
+        self.state = 'done'
+
+
+class Plan:
+    """Operations to install dependencies, with redundant ones merged.
+
+    Operations are added while planning and, for nested configurations,
+    while executing. Links are collected in `links` (optionally given to
+    record them) and applied together once every operation is done.
+
+    With `timings`, operations on the longest path of estimated durations
+    (then those the most operations depend on) are started first, and
+    each run is added to the history.
+
+    """
+
+    def __init__(self, force=False, timings=None, links=None):
+        self.force = force
+        self.timings = timings
+        self.operations = OrderedDict()  # (kind, target) -> operation
+        self.links = Links() if links is None else links
+        self.missing = []  # names of dependencies not configured
+        self._lock = threading.RLock()
+        self._priorities = None
+
+    def __len__(self):
+        return len(self.operations)
+
+    def __iter__(self):
+        return iter(list(self.operations.values()))
+
+    def add(self, kind, target, action=None, after=(), **kwargs):
+        """Add an operation unless an equivalent one is already planned.
+
+        Returns the key other operations can come `after`.
+
+        """
+        operation = Operation(kind, target, action, after, **kwargs)
+        if self.timings:
+            operation.estimate = self.timings.get_median(operation)
+        with self._lock:
+            self._priorities = None
+            existing = self.operations.get(operation.key)
+            if existing:
+                log.debug("Merged operation: %s", existing)
+                existing.after.extend(key for key in operation.after
+                                      if key not in existing.after)
+            else:
+                self.operations[operation.key] = operation
+        return operation.key
+
+    def get_ready(self):
+        """Get the operations not started whose dependencies are done.
+
+        With `timings`, the operations are sorted by priority, highest first.
+
+        """
+        with self._lock:
+            ready = [operation for operation in self.operations.values()
+                     if operation.state is None and self._is_ready(operation)]
+            if not self.timings:
+                return ready
+            priorities = self.get_priorities()
+        return sorted(ready, key=lambda operation: priorities[operation.key],
+                      reverse=True)
+
+    def _is_ready(self, operation):
+        return all(self.operations[key].state == 'done'
+                   for key in operation.after)
+
+    def get_priorities(self):
+        """Get each operation's priority for scheduling.
+
+        An operation's priority is the estimated seconds along the longest
+        path from its start to the end of the plan, then the number of
+        operations depending on it.
+
+        """
+        with self._lock:
+            if self._priorities is not None:
+                return self._priorities
+            dependents = {key: [] for key in self.operations}
+            for operation in self.operations.values():
+                for key in operation.after:
+                    dependents.setdefault(key, []).append(operation.key)
+
+            priorities = {}
+            for operation in reversed(self.get_order()):
+                after = [priorities[key] for key in dependents[operation.key]
+                         if key in priorities]
+                longest = max((seconds for seconds, _ in after), default=0)
+                priorities[operation.key] = (
+                    (operation.estimate or 0) + longest,
+                    sum(count + 1 for _, count in after))
+            self._priorities = priorities
+            return priorities
+
+    def get_order(self):
+        """Get every operation in an order satisfying dependencies."""
+        with self._lock:
+            operations = list(self.operations.values())
+        waiting = {}
+        dependents = {}
+        for operation in operations:
+            waiting[operation.key] = len(operation.after)
+            for key in operation.after:
+                dependents.setdefault(key, []).append(operation)
+
+        order = [operation for operation in operations
+                 if not waiting[operation.key]]
+        for operation in order:  # grows as dependencies are satisfied
+            for dependent in dependents.get(operation.key, ()):
+                waiting[dependent.key] -= 1
+                if not waiting[dependent.key]:
+                    order.append(dependent)
+
+        if len(order) < len(operations):
+            pending = [operation for operation in operations
+                       if operation not in order]
+            raise RuntimeError("Operations could not be ordered: {}".format(
+                ", ".join(str(operation) for operation in pending)))
+        return order
+
+    def get_cost(self, name):
+        """Get the total estimated bytes and the number of unknown costs."""
+        costs = [getattr(operation, name) for operation in self]
+        return (sum(cost for cost in costs if cost),
+                sum(1 for cost in costs if cost is None))
+
+    def execute(self, executor=None):
+        """Run all operations and apply links, returning the install count."""
+        try:
+            (executor or SerialExecutor()).run(self)
+        finally:
+            if self.timings:
+                self.timings.record(self)
+                self.timings.save()
+
+        pending = [operation for operation in self if operation.state != 'done']
+        if pending:
+            raise RuntimeError("Operations could not be ordered: {}".format(
+                ", ".join(str(operation) for operation in pending)))
+
+        self.links.apply(force=self.force)
+
+        for journal in {operation.journal for operation in self}:
+            if journal:
+                journal.clear()
+
+        return sum(1 for operation in self if operation.kind == 'checkout')
+
+    def show(self):
+        """Print each operation along with the estimated costs."""
+        order = self.get_order()
+        numbers = {operation.key: index
+                   for index, operation in enumerate(order, start=1)}
+
+        summary = "{} operation(s), estimated network: {}, disk: {}".format(
+            len(order), _format_cost(*self.get_cost('network')),
+            _format_cost(*self.get_cost('disk')))
+        if any(operation.estimate for operation in order):
+            seconds = max(seconds for seconds, _
+                          in self.get_priorities().values())
+            summary += ", critical path: {:.1f} s".format(seconds)
+        print(summary)
+        for index, operation in enumerate(order, start=1):
+            line = "{:>3}. {}".format(index, operation)
+            for name in ('network', 'disk'):
+                cost = getattr(operation, name)
+                if cost != 0:
+                    line += " [{}: {}]".format(name, _format_size(cost))
+            if operation.estimate:
+                line += " [time: {:.1f} s]".format(operation.estimate)
+            if operation.after:
+                line += " after {}".format(", ".join(
+                    str(numbers[key]) for key in operation.after))
+            print(line)
+
+
+class SerialExecutor:
+    """Runs one operation at a time, highest priority first."""
+
+    def run(self, plan):
+        while True:
+            ready = plan.get_ready()
+            if not ready:
+                break
+            ready[0].state = 'running'
+            ready[0].run()
+
+
+class PooledExecutor:
+    """Runs independent operations concurrently, highest priority first.
+
+    Operations that change the current directory still run one at a time,
+    but alongside those that do not, e.g. creating mirrors.
+
+    """
+
+    def __init__(self, jobs=None):
+        self.jobs = jobs or settings.DEFAULT_JOBS
+
+    def run(self, plan):
+        with ThreadPoolExecutor(self.jobs) as pool:
+            running = {}
+            while True:
+                exclusive = any(operation.exclusive
+                                for operation in running.values())
+                for operation in plan.get_ready():
+                    if len(running) >= self.jobs:
+                        break
+                    if operation.exclusive:
+                        if exclusive:
+                            continue
+                        exclusive = True
+                    operation.state = 'running'
+                    running[pool.submit(operation.run)] = operation
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del running[future]
+                    future.result()
+
+
+def get_size(path):
+    """Get the total size of the files in a directory."""
+    size = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                size += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+    return size
+
+
+def _format_size(size):
+    """Convert bytes to a short human-readable size.
+
+    >>> _format_size(512), _format_size(1536), _format_size(None)
+    ('512 B', '1.5 KB', '?')
+
+    """
+    if size is None:
+        return '?'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            break
+        size /= 1024
+    if unit == 'B':
+        return "{} B".format(size)
+    return "{:.1f} {}".format(size, unit)
+
+
+def _format_cost(total, unknown):
+    text = _format_size(total)
+    if unknown:
+        text += " + {} unknown".format(unknown)
+    return text
@@ -25,8 +25,8 @@ def main(args=None):
         help="overwrite uncommitted changes in dependencies",
     )
     parser.add_argument(
-        '-c', '--clean', action='store_true',
-        help="keep ignored files when updating dependencies",
+        '-c', '--clean', action='store_const', const=True,
+        help="delete untracked and ignored files in dependencies",
     )
 
     # Options group
@@ -67,6 +67,15 @@ def main(args=None):
     namespace.depth = None
     namespace.allow_dirty = True
     namespace.fetch = True
+    namespace.prune = False
+    namespace.bundle = None
+    namespace.watch = False
+    namespace.plan = False
+    namespace.roots = None
+    namespace.mode = None
+    namespace.staged = False
+    namespace.format = None
+    namespace.jobs = None
 
     # Configure logging
     common.configure_logging()
@@ -1,5 +1,6 @@
 """Program defaults."""
 
+import os
 import logging
 
 # Logging settings
@@ -16,3 +17,75 @@ LOGGING_DATEFMT = "%Y-%m-%d %H:%M"
 # 3rd party settings
 YORM_LOGGING_LEVEL = logging.WARNING
 SH_LOGGING_LEVEL = logging.WARNING
+
+# Installation settings
+MODES = ('clone', 'export')  # a full repository or only the files
+
+# Repository settings
+BACKENDS = ('subprocess', 'dulwich')  # implementations of `gdm.backends`
+BACKEND_ENV = 'GDM_BACKEND'  # selects the backend when set
+BACKEND = os.getenv(BACKEND_ENV) or BACKENDS[0]
+
+# Scheduling settings
+TIMINGS = 'timings.json'  # history of operation durations in the cache
+TIMINGS_SAMPLES = 10  # recent durations kept per operation
+TIMINGS_MIN_SAMPLES = 3  # before comparing against the median
+TIMINGS_REGRESSION = 2.0  # times the median that is reported as slower
+TIMINGS_REGRESSION_SECONDS = 1.0  # and the minimum absolute slowdown
+
+# Display settings
+RECORD_FORMATS = ('json', 'tsv')  # for `gdm list --format`
+RECORD_FIELDS = ('path', 'url', 'sha', 'dirty', 'depth', 'seconds')
+
+# Watch settings
+WATCH_INTERVAL = 0.5  # seconds between checks of configuration files
+WATCH_DEBOUNCE = 0.3  # seconds files must be unchanged before updating
+
+# Cleaning settings
+CLEAN_POLICIES = ('none', 'untracked', 'full')
+
+# Large working tree settings
+LARGE_TREE_INDEX_SIZE = 8 * 1024 * 1024  # bytes, roughly 100k files
+LARGE_TREE_CONFIG = (
+    ('core.untrackedCache', 'true'),
+    ('core.splitIndex', 'true'),
+    ('index.threads', 'true'),
+    ('checkout.workers', '0'),
+    ('core.commitGraph', 'true'),
+    ('fetch.writeCommitGraph', 'true'),
+)
+LARGE_TREE_FSMONITOR_CONFIG = (
+    ('core.fsmonitor', 'true'),
+)
+
+# Network settings
+# attempts per clone or fetch
+NETWORK_ATTEMPTS = int(os.getenv('GDM_NETWORK_ATTEMPTS') or 4)
+NETWORK_RETRY_DELAY = 1.0  # seconds before the first retry (then doubled)
+NETWORK_RETRY_MAX_DELAY = 30.0  # seconds between retries at most
+NETWORK_HOST_JOBS = 4  # clones and fetches run concurrently per host
+# seconds a transfer can stall before it is aborted and retried (0 to disable)
+NETWORK_STALL_SECONDS = int(os.getenv('GDM_STALL_TIMEOUT') or 0)
+NETWORK_STALL_BYTES = 1000  # per second, below which a transfer has stalled
+
+# Concurrency settings
+DEFAULT_JOBS = min(32, (os.cpu_count() or 1) + 4)
+MAINTENANCE_JOBS = max(1, (os.cpu_count() or 1) // 2)
+
+# Cache settings
+CACHE = os.path.join('~', '.gitcache')
+CACHE_MAINTENANCE_TASKS = (
+    'reflog-expire',  # lets repacks drop objects only old reflogs reach
+    'pack-refs',
+    'loose-objects',
+    'incremental-repack',  # writes and expires the multi-pack-index
+    'commit-graph',
+)
+ARCHIVES = 'snapshots'  # directory in the cache for `gdm snapshot`
+# fetches between automatic maintenance of the cache (0 to disable)
+CACHE_MAINTENANCE_INTERVAL = int(os.getenv('GDM_MAINTAIN_AFTER') or 0)
+CACHE_MAINTENANCE_BUDGET = 60  # seconds
+
+# Daemon settings
+DAEMON_SOCKET = os.path.join(CACHE, 'gdm.sock')
+DAEMON_SOCKET_ENV = 'GDM_SOCKET'  # when set, commands are sent to the daemon
@@ -1,8 +1,18 @@
 """Utilities to call shell programs."""
 
 import os
+import sys
+import time
+import ctypes
+import errno
+import shutil
 import logging
 import platform
+import tempfile
+import threading
+import subprocess
+import collections
+from contextlib import contextmanager
 
 if platform.system() == 'Windows':
     import pbs as sh
@@ -14,12 +24,86 @@ from .exceptions import ShellError
 
 CMD_PREFIX = "$ "
 OUT_PREFIX = "> "
+TRASH_PREFIX = ".gdm-trash-"
 
 log = logging.getLogger(__name__)
 
 
-def call(name, *args, _show=True, _capture=False, _ignore=False):
-    """Call a shell program with arguments."""
+class Stats:
+    """Counts of the programs spawned by shell calls."""
+
+    def __init__(self):
+        self.total = 0
+        self.programs = collections.Counter()
+        self.commands = collections.Counter()
+        self.sources = collections.Counter()
+        self.seconds = collections.Counter()  # (source, step) -> duration
+        self._command = None
+        self._local = threading.local()  # sources are checked concurrently
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Clear all counts."""
+        self.__init__()
+
+    def record(self, name):
+        """Count a spawned program in the current scope."""
+        source = getattr(self._local, 'source', None)
+        with self._lock:
+            self.total += 1
+            self.programs[name] += 1
+            if self._command:
+                self.commands[self._command] += 1
+            if source:
+                self.sources[source] += 1
+
+    def record_time(self, step, seconds):
+        """Add the duration of a program to the current source's step."""
+        source = getattr(self._local, 'source', None)
+        with self._lock:
+            self.seconds[source, step] += seconds
+
+    def get_steps(self, source):
+        """Get the seconds spent in each step (e.g. 'git fetch') of a source."""
+        with self._lock:
+            return {step: seconds for (name, step), seconds
+                    in self.seconds.items() if name == source}
+
+    @contextmanager
+    def scope(self, command=None, source=None):
+        """Attribute spawned programs to a command and/or source."""
+        previous = self._command, getattr(self._local, 'source', None)
+        self._command = command or previous[0]
+        self._local.source = source or previous[1]
+        try:
+            yield self
+        finally:
+            self._command, self._local.source = previous
+
+
+stats = Stats()
+_local = threading.local()  # variables for programs called by this thread
+
+
+@contextmanager
+def environment(env):
+    """Add variables to the environment of programs called by this thread."""
+    previous = getattr(_local, 'env', None) or {}
+    _local.env = dict(previous, **env)
+    try:
+        yield
+    finally:
+        _local.env = previous
+
+
+def call(name, *args, _show=True, _capture=False, _ignore=False, _cwd=None,
+         _env=None):
+    """Call a shell program with arguments (optionally in another directory).
+
+    `_env` adds variables to the program's environment (along with those
+    from `environment`).
+
+    """
     msg = CMD_PREFIX + ' '.join([name] + list(args))
     if _show:
         common.show(msg)
@@ -29,21 +113,33 @@ def call(name, *args, _show=True, _capture=False, _ignore=False):
     if name == 'cd' and len(args) == 1:
         return os.chdir(args[0])
 
+    stats.record(name)
+    kwargs = {'_cwd': _cwd} if _cwd else {}
+    env = dict(getattr(_local, 'env', None) or {}, **(_env or {}))
+    if env:
+        kwargs['_env'] = dict(os.environ, **env)
+    step = name
+    if name == 'git':  # e.g. 'git fetch'
+        step = ' '.join([name] + [arg for arg in args
+                                  if not arg.startswith('-')][:1])
+    start = time.monotonic()
     try:
         program = sh.Command(name)
         if _capture:
-            line = program(*args).strip()
+            line = program(*args, **kwargs).strip()
             log.debug(OUT_PREFIX + line)
             return line
         else:
-            line = program(*args)
+            line = program(*args, **kwargs)
             log.debug(OUT_PREFIX + line.strip())
     except sh.ErrorReturnCode as exc:
-        msg = "\n  IN: '{}'{}".format(os.getcwd(), exc)
+        msg = "\n  IN: '{}'{}".format(_cwd or os.getcwd(), exc)
         if _ignore:
             log.debug("Ignored error from call to '%s'", name)
         else:
             raise ShellError(msg)
+    finally:
+        stats.record_time(step, time.monotonic() - start)
 
 
 def mkdir(path):
@@ -63,3 +159,82 @@ def ln(source, target):
 
 def rm(path):
     call('rm', '-rf', path)
+
+
+def trash(*paths, into=None):
+    """Move directories out of the way and delete them in the background."""
+    paths = [os.path.abspath(path) for path in paths if os.path.exists(path)]
+    if not paths:
+        return None
+    tombstone = tempfile.mkdtemp(prefix=TRASH_PREFIX,
+                                 dir=into or os.path.dirname(paths[0]))
+    for index, path in enumerate(paths):
+        common.show(CMD_PREFIX + "mv {} {}".format(path, tombstone))
+        name = "{}-{}".format(index, os.path.basename(path))
+        try:
+            os.rename(path, os.path.join(tombstone, name))
+        except OSError as exc:
+            if exc.errno != errno.EXDEV:
+                raise
+            log.debug("Deleting %s across devices...", path)
+            shutil.rmtree(path)
+
+    log.debug("Deleting %s in the background...", tombstone)
+    stats.record(sys.executable)
+    subprocess.Popen([sys.executable, '-c',
+                      "import shutil, sys; shutil.rmtree(sys.argv[1], True)",
+                      tombstone],
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL, start_new_session=True)
+    return tombstone
+
+
+def swap(source, target):
+    """Move a directory into place, exchanging it with any existing one.
+
+    On Linux, the directories are exchanged atomically, so readers of
+    `target` see either the old or the new contents. Elsewhere, the old
+    directory is briefly renamed aside. Afterwards, `source` contains the
+    old directory (if any) to be deleted.
+
+    """
+    common.show(CMD_PREFIX + "mv --exchange {} {}".format(source, target))
+    if not os.path.exists(target):
+        os.rename(source, target)
+    elif not _exchange(source, target):
+        aside = tempfile.mkdtemp(prefix=TRASH_PREFIX,
+                                 dir=os.path.dirname(os.path.abspath(target)))
+        os.rmdir(aside)
+        os.rename(target, aside)
+        os.rename(source, target)
+        os.rename(aside, source)
+
+
+def _exchange(first, second):
+    """Atomically exchange two paths if the platform supports it."""
+    if platform.system() != 'Linux':
+        return False
+    renameat2 = getattr(ctypes.CDLL(None, use_errno=True), 'renameat2', None)
+    if renameat2 is None:  # C library older than glibc 2.28
+        return False
+    at_fdcwd, rename_exchange = -100, 2
+    if renameat2(at_fdcwd, os.fsencode(first), at_fdcwd, os.fsencode(second),
+                 rename_exchange) == 0:
+        return True
+    code = ctypes.get_errno()
+    if code in (errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+        log.debug("Exchanging paths not supported: %s", os.strerror(code))
+        return False
+    raise OSError(code, os.strerror(code), second)
+
+
+def empty_trash(dirpath):
+    """Delete directories left behind by interrupted background deletes."""
+    count = 0
+    for name in sorted(os.listdir(dirpath)):
+        if name.startswith(TRASH_PREFIX):
+            path = os.path.join(dirpath, name)
+            common.show(CMD_PREFIX + "rm -rf {}".format(path))
+            shutil.rmtree(path, ignore_errors=True)
+            count += 1
+    return count
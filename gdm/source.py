@@ -2,13 +2,18 @@
 
 import os
 import logging
+import tempfile
 
 import yorm
 
 from . import common
 from . import git
 from . import shell
-from .exceptions import InvalidConfig, InvalidRepository, UncommittedChanges
+from . import exports
+from . import settings
+from .links import Links
+from .exceptions import (InvalidConfig, InvalidRepository, ShellError,
+                         UncommittedChanges)
 
 
 log = logging.getLogger(__name__)
@@ -18,22 +23,35 @@ log = logging.getLogger(__name__)
 @yorm.attr(dir=yorm.converters.String)
 @yorm.attr(rev=yorm.converters.String)
 @yorm.attr(link=yorm.converters.String)
+@yorm.attr(clean=yorm.converters.String)
+@yorm.attr(large=yorm.converters.String)
+@yorm.attr(mode=yorm.converters.String)
 class Source(yorm.converters.AttributeDictionary):
     """A dictionary of `git` and `ln` arguments."""
 
+    ATTRIBUTES = ('dir', 'link', 'repo', 'rev', 'clean', 'large', 'mode')
+    OPTIONAL = ('clean', 'large', 'mode')  # only saved when set
     DIRTY = '<dirty>'
     UNKNOWN = '<unknown>'
 
-    def __init__(self, repo, name, rev='master', link=None):
+    def __init__(self, repo, name, rev='master', link=None, clean=None,
+                 large=None, mode=None):
         super().__init__()
         self.repo = repo
         self.dir = name
         self.rev = rev
         self.link = link
+        self.clean = clean
+        self.large = large
+        self.mode = mode
         if not self.repo:
             raise InvalidConfig("'repo' missing on {}".format(repr(self)))
         if not self.dir:
             raise InvalidConfig("'dir' missing on {}".format(repr(self)))
+        if (self.mode or settings.MODES[0]) not in settings.MODES:
+            msg = "'mode' must be one of {} on {}".format(
+                ', '.join(settings.MODES), repr(self))
+            raise InvalidConfig(msg)
 
     def __repr__(self):
         return "<source {}>".format(self)
@@ -53,20 +71,48 @@ class Source(yorm.converters.AttributeDictionary):
     def __lt__(self, other):
         return self.dir < other.dir
 
-    def update_files(self, force=False, fetch=False, clean=True):
-        """Ensure the source matches the specified revision."""
+    def update_files(self, force=False, fetch=False, clean=None, mode=None,
+                     staged=False):
+        """Ensure the source matches the specified revision.
+
+        When `clean` or `mode` is not specified, the source's own is used.
+
+        With `staged`, an existing working tree that needs to change is left
+        untouched while the revision is checked out next to it and the two
+        are then swapped.
+
+        """
         log.info("Updating source files...")
+        if (mode or self.mode) == 'export':
+            log.debug("Exporting files without a repository...")
+            exports.update(self.repo, self.rev, self.dir,
+                           force=force, fetch=fetch)
+            shell.cd(self.dir)
+            return
+
+        clean = common.clean_policy(self.clean if clean is None else clean)
 
         # Enter the working tree
-        if not os.path.exists(self.dir):
+        created = not os.path.exists(self.dir)
+        if created:
             log.debug("Creating a new repository...")
-            git.clone(self.repo, self.dir)
-        shell.cd(self.dir)
+            large = _large_policy(self.large)
+            git.clone(self.repo, self.dir, config=_large_config(large))
+            shell.cd(self.dir)
+            if large is None and \
+                    git.get_index_size() >= settings.LARGE_TREE_INDEX_SIZE:
+                log.info("Configuring a large working tree...")
+                large = True
+                git.configure(_large_config(large))
+            if large:
+                git.write_commit_graph()
+        else:
+            shell.cd(self.dir)
 
         # Check for uncommitted changes
         if not force:
             log.debug("Confirming there are no uncommitted changes...")
-            if git.changes(include_untracked=clean):
+            if git.changes(include_untracked=clean != 'none'):
                 common.show()
                 msg = "Uncommitted changes: {}".format(os.getcwd())
                 raise UncommittedChanges(msg)
@@ -77,29 +123,87 @@ class Source(yorm.converters.AttributeDictionary):
                                      git.get_tag()):
             git.fetch(self.repo, self.rev)
 
+        # Swap in a new working tree if the revision changes
+        if staged and not created and \
+                self._get_commit(fetch) != git.get_hash():
+            self._stage(fetch, clean, force)
+            return
+
         # Update the working tree to the desired revision
         git.update(self.rev, fetch=fetch, clean=clean)
 
-    def create_link(self, root, force=False):
-        """Create a link from the target name to the current directory."""
+    def _get_commit(self, fetch):
+        """Get the hash the current repository would be updated to."""
+        revs = [self.rev]
+        if fetch:  # branches are fast-forwarded to the remote
+            revs.insert(0, 'origin/' + self.rev)
+        for rev in revs:
+            try:
+                return git.get_commit(rev)
+            except ShellError:
+                continue
+        return None
+
+    def _stage(self, fetch, clean, force):
+        """Check out the revision in a new working tree and swap it in.
+
+        Untracked and ignored files that `clean` keeps are moved into the
+        new working tree. If the revision adds a file in their place, the
+        swap is refused unless `force` is set.
+
+        """
+        log.info("Staging a new working tree...")
+        path = os.getcwd()
+        parent = os.path.dirname(path)
+        names = git.get_untracked(clean)
+        temp = tempfile.mkdtemp(prefix=shell.TRASH_PREFIX, dir=parent)
+        os.rmdir(temp)
+        source = Source(self.repo, temp, self.rev,
+                        clean=self.clean, large=self.large)
+        try:
+            source.update_files(force=True, fetch=fetch, clean=clean)
+            _carry(names, path, temp, force)
+            shell.cd(parent)
+            shell.swap(temp, path)
+        finally:
+            shell.cd(parent, _show=False)
+            shell.trash(temp)
+        shell.cd(path)
+
+    def create_link(self, root, force=False, links=None):
+        """Create a link from the target name to the current directory.
+
+        When `links` is provided, the link is only added to it so that all
+        links in the tree can be applied together.
+
+        """
         if self.link:
-            log.info("Creating a symbolic link...")
             target = os.path.join(root, self.link)
-            source = os.path.relpath(os.getcwd(), os.path.dirname(target))
-            if os.path.islink(target):
-                os.remove(target)
-            elif os.path.exists(target):
-                if force:
-                    shell.rm(target)
-                else:
-                    common.show()
-                    msg = "Preexisting link location: {}".format(target)
-                    raise UncommittedChanges(msg)
-            shell.ln(source, target)
+            if links is None:
+                log.info("Creating a symbolic link...")
+                links = Links()
+                links.add(target, os.getcwd())
+                links.apply(force=force)
+            else:
+                links.add(target, os.getcwd())
 
     def identify(self, allow_dirty=True, allow_missing=True):
         """Get the path and current repository URL and hash."""
-        if os.path.isdir(self.dir):
+        info = exports.read(self.dir)
+        if info:
+
+            shell.cd(self.dir)
+
+            path = os.getcwd()
+            revision = info['sha']
+            if not allow_dirty and not exports.verify(path, info):
+                msg = "Uncommitted changes: {}".format(path)
+                raise UncommittedChanges(msg)
+            common.show(revision, log=False)
+
+            return path, info['repo'], revision
+
+        elif os.path.isdir(self.dir):
 
             shell.cd(self.dir)
 
@@ -114,6 +218,10 @@ class Source(yorm.converters.AttributeDictionary):
             else:
                 revision = git.get_hash(_show=True)
             common.show(revision, log=False)
+            if log.isEnabledFor(logging.INFO):
+                options = git.get_large_config()
+                log.info("Large working tree options: %s", ', '.join(
+                    '='.join(option) for option in options) or '<none>')
 
             return path, url, revision
 
@@ -130,5 +238,45 @@ class Source(yorm.converters.AttributeDictionary):
     def lock(self):
         """Return a locked version of the current source."""
         _, _, revision = self.identify(allow_missing=False)
-        source = self.__class__(self.repo, self.dir, revision, self.link)
+        source = self.__class__(self.repo, self.dir, revision, self.link,
+                                self.clean, self.large, self.mode)
         return source
+
+
+def _large_policy(value):
+    """Convert a source's `large` option to True, False, None (detect)."""
+    value = (value or '').lower()
+    if value in ('', 'auto'):
+        return None
+    if value in ('false', 'no', 'off'):
+        return False
+    if value == 'fsmonitor':
+        return value
+    return True
+
+
+def _large_config(large):
+    """Get the repository options for a large working tree policy."""
+    if not large:
+        return ()
+    config = settings.LARGE_TREE_CONFIG
+    if large == 'fsmonitor':
+        config += settings.LARGE_TREE_FSMONITOR_CONFIG
+    return config
+
+
+def _carry(names, source, target, force):
+    """Move untracked paths from one working tree into another."""
+    names = [name.rstrip('/') for name in names]
+    replaced = [name for name in names
+                if os.path.lexists(os.path.join(target, name))]
+    if replaced and not force:
+        msg = "Untracked files would be replaced: {}".format(
+            ", ".join(os.path.join(source, name) for name in replaced))
+        raise UncommittedChanges(msg)
+    for name in names:
+        if name not in replaced:
+            log.debug("Keeping untracked path: %s", name)
+            path = os.path.join(target, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.rename(os.path.join(source, name), path)
@@ -2,10 +2,15 @@
 
 import os
 import logging
+import subprocess
 
 import pytest
 import yorm
 
+from gdm import backends, shell, settings
+
+from .fakes import Repositories
+
 
 ENV = 'TEST_INTEGRATION'  # environment variable to enable integration tests
 REASON = "'{0}' variable not set".format(ENV)
@@ -45,3 +50,104 @@ def pytest_runtest_setup(item):
             yorm.settings.fake = False
     else:
         yorm.settings.fake = True
+
+
+@pytest.fixture
+def git_repo():
+    """Get a function that creates repositories with an initial commit."""
+
+    def create(path, *, origin=None, files=None, force=(), tag=None,
+               bare=None):
+        """Create a repository (optionally cloned to a bare one) at a path.
+
+        Calling this again for an existing repository commits the files.
+
+        - `origin`: URL of the repository's 'origin' remote
+        - `files`: map of filenames to contents to commit
+        - `force`: names of ignored files to commit anyway
+        - `tag`: name of a tag for the commit
+        - `bare`: path of a bare clone to create for use as a remote
+
+        """
+        os.makedirs(path, exist_ok=True)
+        for filename, content in (files or {}).items():
+            with open(os.path.join(path, filename), 'w') as stream:
+                stream.write(content)
+        commands = [['init', '--quiet']]
+        if origin:
+            commands.append(['remote', 'add', 'origin', origin])
+        commands.append(['add', '--all'])
+        if force:
+            commands.append(['add', '--force'] + list(force))
+        commands.append(['-c', 'user.name=gdm', '-c',
+                         'user.email=gdm@localhost', 'commit', '--quiet',
+                         '--allow-empty', '-m', 'Initial'])
+        if tag:
+            commands.append(['tag', tag])
+        if bare:
+            commands.append(['clone', '--quiet', '--bare', '.', bare])
+        for args in commands:
+            subprocess.check_call(['git'] + args, cwd=path)
+        return path
+
+    return create
+
+
+@pytest.fixture
+def local_project(tmpdir, monkeypatch,
+                  git_repo):  # pylint: disable=redefined-outer-name
+    """Get a function that creates projects depending on a local remote.
+
+    The remote is a bare clone of 'source' (tagged 'v1') at 'remote/demo.git'
+    and its URL is available as the function's `url` attribute. A separate
+    cache is used for every test.
+
+    """
+    monkeypatch.setattr(settings, 'CACHE', str(tmpdir.join('cache')))
+    path = str(tmpdir.join('remote', 'demo.git'))
+    git_repo(str(tmpdir.join('source')), tag='v1', bare=path)
+
+    def create(sources, name='project'):
+        """Create a project and change to its root.
+
+        - `sources`: configuration of sources with `{0}` for the remote's URL
+        - `name`: directory of the project
+
+        """
+        root = tmpdir.ensure(name, dir=True)
+        root.join('.git').write("")
+        text = "location: deps\nsources:\n" + sources.format(create.url)
+        root.join('gdm.yml').write(text)
+        root.chdir()
+        return root
+
+    create.url = 'file://' + path
+    return create
+
+
+@pytest.fixture
+def processes():
+    """Count the shell programs spawned after this fixture is requested."""
+    shell.stats.reset()
+    return shell.stats
+
+
+@pytest.fixture
+def remote(tmpdir, monkeypatch):
+    """Serve local repositories through a simulated network connection."""
+    if os.name != 'posix':
+        pytest.skip("simulated remotes require a POSIX platform")
+    from .remote import Remote
+    monkeypatch.setattr(settings, 'CACHE', str(tmpdir.join('cache')))
+    monkeypatch.chdir(tmpdir)
+    server = Remote(str(tmpdir.join('remote')))
+    for name, value in server.env.items():
+        monkeypatch.setenv(name, value)
+    return server
+
+
+@pytest.fixture
+def fake_git():
+    """Perform repository operations in memory instead of running Git."""
+    with backends.use(Repositories()) as backend:
+        yield backend
@@ -0,0 +1,107 @@
+"""Repositories kept in memory for tests that do not need Git."""
+
+# pylint: disable=unused-argument  # methods match the signatures in `gdm.git`
+
+import os
+
+from gdm.backends import Backend
+from gdm.exceptions import ShellError
+
+
+class Repositories(Backend):
+    """A backend performing every operation in memory.
+
+    Remotes are added with `add()`. Clones are created as empty directories
+    (so they can be entered) and their state is kept in `trees` by path.
+
+    """
+
+    name = 'memory'
+
+    def __init__(self):
+        self.remotes = {}  # repo -> branches, tags, and files
+        self.trees = {}  # path -> repo, sha, branch, fetched branches, dirty
+
+    def add(self, repo, branches=None, tags=None, files=None):
+        """Add or replace a remote repository.
+
+        - `branches` and `tags`: map of names to commit hashes
+        - `files`: map of commit hashes to maps of paths to contents
+
+        """
+        self.remotes[repo] = dict(branches=dict(branches or {}),
+                                  tags=dict(tags or {}),
+                                  files=dict(files or {}))
+
+    def clone(self, repo, path, *, cache=None, config=()):
+        remote = self._get_remote(repo)
+        os.makedirs(path)
+        self.trees[os.path.abspath(path)] = dict(
+            repo=repo, sha=remote['branches']['master'], branch='master',
+            fetched=dict(remote['branches']), dirty=False)
+
+    def fetch(self, repo, rev=None):
+        tree = self._get_tree(None)
+        tree['repo'] = repo
+        tree['fetched'] = dict(self._get_remote(repo)['branches'])
+
+    def update(self, rev, *, clean=True, fetch=False):
+        tree = self._get_tree(None)
+        tree['sha'] = self.get_commit(rev)
+        tree['branch'] = rev if rev in tree['fetched'] else 'HEAD'
+        tree['dirty'] = False
+
+    def changes(self, include_untracked=False, display_status=True,
+                _show=False, _cwd=None):
+        return self._get_tree(_cwd)['dirty']
+
+    def get_url(self, _cwd=None):
+        return self._get_tree(_cwd)['repo']
+
+    def get_hash(self, _show=False, _cwd=None):
+        return self._get_tree(_cwd)['sha']
+
+    def get_tag(self, _cwd=None):
+        tree = self._get_tree(_cwd)
+        tags = self.remotes[tree['repo']]['tags']
+        for name, sha in sorted(tags.items()):
+            if sha == tree['sha']:
+                return name
+        return None
+
+    def get_branch(self, _cwd=None):
+        return self._get_tree(_cwd)['branch']
+
+    def get_commit(self, rev, *, _cwd=None):
+        tree = self._get_tree(_cwd)
+        tags = self.remotes[tree['repo']]['tags']
+        name = rev[len('origin/'):] if rev.startswith('origin/') else rev
+        for refs in (tree['fetched'], tags):
+            if name in refs:
+                return refs[name]
+        if rev in self.remotes[tree['repo']]['files']:
+            return rev
+        raise ShellError("fatal: Needed a single revision: {}".format(rev))
+
+    def show_file(self, rev, path, *, _cwd=None):
+        tree = self._get_tree(_cwd)
+        files = self.remotes[tree['repo']]['files']
+        try:
+            return files[self.get_commit(rev, _cwd=_cwd)][path]
+        except KeyError:
+            msg = "fatal: path '{}' does not exist in '{}'".format(path, rev)
+            raise ShellError(msg) from None
+
+    def _get_remote(self, repo):
+        try:
+            return self.remotes[repo]
+        except KeyError:
+            msg = "fatal: repository '{}' not found".format(repo)
+            raise ShellError(msg) from None
+
+    def _get_tree(self, _cwd):
+        try:
+            return self.trees[os.path.abspath(_cwd or '.')]
+        except KeyError:
+            msg = "fatal: not a git repository: {}".format(_cwd or '.')
+            raise ShellError(msg) from None
@@ -0,0 +1,209 @@
+"""Local repositories served through a simulated network connection.
+
+Git is pointed at this file as its SSH command, so repository URLs on
+`HOST` run `git-upload-pack` locally behind a connection that adds
+latency, limits bandwidth, and fails on demand. Every connection is logged
+so tests can count and time them.
+
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import threading
+import subprocess
+
+HOST = 'gdm-remote'  # in repository URLs, e.g. ssh://gdm-remote/path/repo.git
+SETTINGS = 'settings.json'
+LOG = 'connections.log'
+COUNT = 'connections.count'
+CHUNK = 4096  # bytes sent between bandwidth delays
+
+# what SSH and Git show when the connection fails
+RESET = "kex_exchange_identification: read: Connection reset by peer\n"
+DROP = "client_loop: send disconnect: Broken pipe\n"
+
+
+class Remote:
+    """Bare repositories behind a configurable, simulated network.
+
+    - `latency`: seconds added to connect and to each request from Git
+    - `bandwidth`: bytes per second sent to Git (unlimited by default)
+    - `failures`: number of connections to fail before any succeed
+    - `failure_rate`: chance that each later connection fails
+    - `failure`: 'reset' to fail connecting or 'drop' to fail mid-transfer
+
+    Settings are saved with `save()` and read by each new connection.
+
+    """
+
+    def __init__(self, root, *, latency=0, bandwidth=None, failures=0,
+                 failure_rate=0, failure='reset', seed=None):
+        self.root = root
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.failures = failures
+        self.failure_rate = failure_rate
+        self.failure = failure
+        self.seed = seed
+        os.makedirs(root, exist_ok=True)
+        self.save()
+
+    @property
+    def env(self):
+        """Get the environment variables that route Git through the remote."""
+        command = '"{}" "{}" "{}"'.format(sys.executable,
+                                          os.path.abspath(__file__), self.root)
+        return {'GIT_SSH_COMMAND': command, 'GIT_SSH_VARIANT': 'simple'}
+
+    @property
+    def connections(self):
+        """Get a record of each finished connection."""
+        try:
+            with open(os.path.join(self.root, LOG)) as stream:
+                return [json.loads(line) for line in stream if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def save(self):
+        """Apply the current settings to new connections."""
+        settings = dict(latency=self.latency, bandwidth=self.bandwidth,
+                        failures=self.failures,
+                        failure_rate=self.failure_rate,
+                        failure=self.failure, seed=self.seed)
+        with open(os.path.join(self.root, SETTINGS), 'w') as stream:
+            json.dump(settings, stream)
+
+    def reset(self):
+        """Forget previous connections (and count failures from zero)."""
+        for name in (LOG, COUNT):
+            path = os.path.join(self.root, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def create(self, name, files=None):
+        """Create a repository with an initial commit and get its URL."""
+        work = os.path.join(self.root, 'work', name)
+        _git('init', '--quiet', work)
+        self.commit(name, "Initial", files)
+        _git('clone', '--quiet', '--bare', work, self.get_path(name))
+        return self.get_url(name)
+
+    def commit(self, name, message, files=None):
+        """Add a commit to a repository, optionally changing files."""
+        work = os.path.join(self.root, 'work', name)
+        for filename, content in (files or {}).items():
+            mode = 'wb' if isinstance(content, bytes) else 'w'
+            with open(os.path.join(work, filename), mode) as stream:
+                stream.write(content)
+        _git('add', '--all', _cwd=work)
+        _git('-c', 'user.name=gdm', '-c', 'user.email=gdm@localhost',
+             'commit', '--quiet', '--allow-empty', '-m', message, _cwd=work)
+        if os.path.isdir(self.get_path(name)):
+            _git('push', '--quiet', self.get_path(name), 'HEAD:master',
+                 _cwd=work)
+
+    def get_path(self, name):
+        return os.path.join(self.root, name + '.git')
+
+    def get_url(self, name):
+        return 'ssh://{}{}'.format(HOST, self.get_path(name))
+
+
+def _git(*args, _cwd=None):
+    subprocess.check_call(['git'] + list(args), cwd=_cwd)
+
+
+def serve(root, host, command):
+    """Run a Git command for a connection with the simulated conditions."""
+    with open(os.path.join(root, SETTINGS)) as stream:
+        settings = json.load(stream)
+    index = _count(root)
+    rng = random.Random(None if settings['seed'] is None
+                        else settings['seed'] + index)
+    fail = index < settings['failures'] or \
+        rng.random() < settings['failure_rate']
+
+    start = time.time()
+    record = dict(index=index, host=host, command=command, start=start,
+                  failed=fail and settings['failure'], bytes=0)
+    try:
+        time.sleep(settings['latency'])
+        if fail and settings['failure'] == 'reset':
+            sys.stderr.write(RESET)
+            return 255
+        record['bytes'], code = _proxy(command, settings, drop=fail)
+        if fail:
+            sys.stderr.write(DROP)
+            return 255
+        return code
+    finally:
+        record['seconds'] = time.time() - start
+        _log(root, record)
+
+
+def _proxy(command, settings, drop=False):
+    """Relay a command's input and output, delaying it like a network."""
+    process = subprocess.Popen(command, shell=True,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def send():
+        try:
+            while True:
+                data = os.read(0, CHUNK)
+                if not data:
+                    break
+                time.sleep(settings['latency'])
+                process.stdin.write(data)
+                process.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    threading.Thread(target=send, daemon=True).start()
+
+    sent = 0
+    while True:
+        data = os.read(process.stdout.fileno(), CHUNK)
+        if not data:
+            break
+        if drop and sent:
+            process.kill()
+            break
+        if settings['bandwidth']:
+            time.sleep(len(data) / settings['bandwidth'])
+        os.write(1, data)
+        sent += len(data)
+    return sent, process.wait()
+
+
+def _count(root):
+    """Get the index of a new connection, counting it as started."""
+    with open(os.path.join(root, COUNT), 'a+') as stream:
+        _lock(stream)
+        stream.seek(0)
+        index = len(stream.read())
+        stream.write('.')
+    return index
+
+
+def _log(root, record):
+    with open(os.path.join(root, LOG), 'a') as stream:
+        _lock(stream)
+        stream.write(json.dumps(record) + '\n')
+
+
+def _lock(stream):
+    """Lock a file until it is closed (connections run concurrently)."""
+    import fcntl  # only available on POSIX, where Git uses this SSH command
+    fcntl.flock(stream, fcntl.LOCK_EX)
+
+
+if __name__ == '__main__':  # called by Git as: <root> <host> <command>
+    sys.exit(serve(*sys.argv[1:4]))
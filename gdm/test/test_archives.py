@@ -0,0 +1,103 @@
+# pylint: disable=no-self-use,redefined-outer-name
+
+import os
+import subprocess
+
+import pytest
+
+from gdm import archives
+from gdm.config import load
+
+
+@pytest.fixture
+def project(tmpdir, git_repo):
+    """Create a project with two dependencies installed at their locks."""
+    locks = []
+    for name in ('dep_1', 'dep_2'):
+        path = git_repo(str(tmpdir.join('deps', name)))
+        rev = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=path)
+        locks.append("- repo: file:///mock/{0}\n  dir: {0}\n  rev: {1}\n"
+                     .format(name, rev.decode().strip()))
+    text = "location: deps\nsources_locked:\n" + "".join(locks)
+    tmpdir.join('gdm.yml').write(text)
+    return load(str(tmpdir), writable=False)
+
+
+class TestArchives:
+
+    def test_get_key(self, project):
+        """Verify keys only depend on the locked sources."""
+        key = archives.get_key(project)
+
+        assert 32 == len(key)
+        assert key == archives.get_key(load(project.root, writable=False))
+
+    def test_get_key_changes_with_locks(self, project):
+        text = open(os.path.join(project.root, 'gdm.yml')).read()
+        with open(os.path.join(project.root, 'gdm.yml'), 'w') as stream:
+            stream.write(text.replace('dep_2', 'dep_3'))
+
+        assert archives.get_key(project) != \
+            archives.get_key(load(project.root, writable=False))
+
+    def test_get_key_without_locks(self, tmpdir):
+        tmpdir.join('gdm.yml').write("sources: []\n")
+
+        assert None is archives.get_key(load(str(tmpdir), writable=False))
+
+    def test_save_and_restore(self, project, tmpdir):
+        """Verify dependencies are restored from a saved archive."""
+        directory = str(tmpdir.join('archives'))
+        path = archives.save(project, directory)
+        assert path.startswith(os.path.join(directory,
+                                            archives.get_key(project)))
+        subprocess.check_call(['rm', '-rf', project.location_path])
+
+        assert path == archives.restore(project, directory)
+
+        assert ['dep_1', 'dep_2'] == sorted(os.listdir(project.location_path))
+        assert [] == list(archives._verify(  # pylint: disable=protected-access
+            project, project.location_path))
+
+    def test_restore_missing(self, project, tmpdir):
+        """Verify nothing is restored without a matching archive."""
+        assert None is archives.restore(project, str(tmpdir.join('archives')))
+
+    def test_save_mismatch(self, project, tmpdir):
+        """Verify dependencies not at their locked versions are not saved."""
+        subprocess.check_call(
+            ['git', '-c', 'user.name=gdm', '-c', 'user.email=gdm@localhost',
+             'commit', '--quiet', '--allow-empty', '-m', 'Changed'],
+            cwd=os.path.join(project.location_path, 'dep_2'))
+
+        assert None is archives.save(project, str(tmpdir.join('archives')))
+
+    def test_restore_without_cache(self, project, tmpdir):
+        """Verify dependencies borrowing objects from the cache are saved."""
+        path = os.path.join(project.location_path, 'dep_1')
+        cache = str(tmpdir.join('cache', 'dep_1.reference'))
+        subprocess.check_call(['git', 'clone', '--quiet', '--mirror', path,
+                               cache])
+        subprocess.check_call(['rm', '-rf', path])
+        subprocess.check_call(['git', 'clone', '--quiet', '--reference',
+                               cache, cache, path])
+        directory = str(tmpdir.join('archives'))
+        assert archives.save(project, directory)
+        subprocess.check_call(['rm', '-rf', project.location_path, cache])
+
+        assert archives.restore(project, directory)
+
+        assert not os.path.exists(os.path.join(
+            path, '.git', 'objects', 'info', 'alternates'))
+        subprocess.check_call(['git', 'log', '--quiet'], cwd=path)
+
+    def test_verify_missing_objects(self, project, tmpdir):
+        """Verify dependencies missing their checked out tree are reported."""
+        path = os.path.join(project.location_path, 'dep_1')
+        subprocess.check_call(['rm', '-rf', os.path.join(
+            path, '.git', 'objects')])
+        os.makedirs(os.path.join(path, '.git', 'objects'))
+
+        assert [path] == list(archives._verify(  # pylint: disable=protected-access
+            project, project.location_path))
+        assert None is archives.save(project, str(tmpdir.join('archives')))
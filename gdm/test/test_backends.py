@@ -0,0 +1,106 @@
+# pylint: disable=no-self-use,redefined-outer-name
+
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from gdm import backends, git, settings
+from gdm.backends import Backend
+
+
+class Partial(Backend):
+    """A backend answering some queries and deferring others."""
+
+    name = 'partial'
+
+    def get_hash(self, _show=False, _cwd=None):
+        return 'abc123'
+
+    def get_branch(self, _cwd=None):
+        return NotImplemented
+
+
+class TestOperation:
+
+    @patch('gdm.git.call')
+    def test_default(self, mock_call):
+        """Verify Git's CLI is run by default."""
+        with backends.use(settings.BACKENDS[0]):
+            git.get_hash()
+
+        assert mock_call.called
+
+    @patch('gdm.git.call')
+    def test_backend(self, mock_call):
+        """Verify operations a backend defines are run by it."""
+        with backends.use(Partial()):
+            assert 'abc123' == git.get_hash()
+
+        assert not mock_call.called
+
+    @patch('gdm.git.call')
+    def test_not_implemented(self, mock_call):
+        """Verify operations are run with Git's CLI when a backend defers."""
+        with backends.use(Partial()):
+            git.get_branch()
+            git.get_tag()
+
+        assert 2 == mock_call.call_count
+
+    def test_operations(self):
+        assert {'clone', 'fetch', 'update', 'changes', 'get_url', 'get_hash',
+                'get_tag', 'get_branch', 'get_commit', 'show_file'} == \
+            set(backends.OPERATIONS)
+
+
+class TestSelect:
+
+    def test_select(self):
+        with backends.use('subprocess') as backend:
+            assert backend is backends.get()
+            assert 'subprocess' == backend.name
+
+    def test_select_unknown(self):
+        with pytest.raises(ValueError):
+            backends.select('foobar')
+
+    def test_missing_dependency(self, monkeypatch):
+        """Verify a backend missing its dependency falls back to Git's CLI."""
+        monkeypatch.setattr(settings, 'BACKEND', 'dulwich')
+        monkeypatch.setattr(backends, '_backend', None)
+
+        with patch.dict(sys.modules, {'dulwich': None}):
+            assert 'subprocess' == backends.get().name
+
+
+class TestDulwich:
+
+    @pytest.fixture
+    def repo(self, tmpdir, git_repo):
+        pytest.importorskip('dulwich')
+        return git_repo(str(tmpdir.join('repo')), origin='mock.git',
+                        files={'gdm.yml': "location: deps\n"}, tag='v1')
+
+    def test_queries_match_git(self, repo):
+        """Verify answers match Git's CLI."""
+        queries = [
+            lambda: git.get_url(_cwd=repo),
+            lambda: git.get_hash(_cwd=repo),
+            lambda: git.get_tag(_cwd=repo),
+            lambda: git.get_branch(_cwd=repo),
+            lambda: git.get_commit('v1', _cwd=repo),
+            lambda: git.show_file('HEAD', 'gdm.yml', _cwd=repo),
+            lambda: git.changes(display_status=False, _cwd=repo),
+        ]
+        expected = [query() for query in queries]
+
+        with backends.use('dulwich'), \
+                patch('gdm.git.call', side_effect=AssertionError):
+            assert expected == [query() for query in queries]
+
+    def test_changes(self, repo, tmpdir):
+        tmpdir.join('repo', 'gdm.yml').write("location: other\n")
+
+        with backends.use('dulwich'):
+            assert git.changes(display_status=False, _cwd=repo)
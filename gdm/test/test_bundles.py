@@ -0,0 +1,23 @@
+# pylint: disable=no-self-use
+
+import pytest
+
+from gdm import bundles
+from gdm.exceptions import InvalidConfig
+
+
+class TestBundles:
+
+    @pytest.mark.parametrize("path,mode", [
+        ('bundles', None),
+        ('bundles.tar', 'w'),
+        ('bundles.tar.gz', 'w:gz'),
+        ('bundles.tar.xz', 'w:xz'),
+    ])
+    def test_get_archive_mode(self, path, mode):
+        assert mode == bundles._get_archive_mode(path)  # pylint: disable=protected-access
+
+    def test_load_invalid(self, tmpdir):
+        """Verify a directory without a manifest is rejected."""
+        with pytest.raises(InvalidConfig):
+            bundles.load(str(tmpdir))
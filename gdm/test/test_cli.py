@@ -57,7 +57,9 @@ class TestInstall:
         cli.main(['install'])
 
         mock_install.assert_called_once_with(
-            root=None, depth=None, force=False, fetch=False, clean=False)
+            root=None, depth=None, force=False, fetch=False, clean=None,
+            mode=None, staged=False, prune=False, bundle=None, watch=False,
+            plan=False, jobs=None, roots=None)
 
     @patch('gdm.commands.install')
     def test_install_root(self, mock_install):
@@ -66,7 +68,9 @@ class TestInstall:
 
         mock_install.assert_called_once_with(
             root='mock/path/to/root', depth=None,
-            force=False, fetch=False, clean=False)
+            force=False, fetch=False, clean=None,
+            mode=None, staged=False, prune=False, bundle=None, watch=False,
+            plan=False, jobs=None, roots=None)
 
     @patch('gdm.commands.install')
     def test_install_force(self, mock_install):
@@ -74,7 +78,9 @@ class TestInstall:
         cli.main(['install', '--force'])
 
         mock_install.assert_called_once_with(
-            root=None, depth=None, force=True, fetch=False, clean=False)
+            root=None, depth=None, force=True, fetch=False, clean=None,
+            mode=None, staged=False, prune=False, bundle=None, watch=False,
+            plan=False, jobs=None, roots=None)
 
     @patch('gdm.commands.install')
     def test_install_fetch(self, mock_install):
@@ -82,7 +88,9 @@ class TestInstall:
         cli.main(['install', '--fetch'])
 
         mock_install.assert_called_once_with(
-            root=None, depth=None, force=False, fetch=True, clean=False)
+            root=None, depth=None, force=False, fetch=True, clean=None,
+            mode=None, staged=False, prune=False, bundle=None, watch=False,
+            plan=False, jobs=None, roots=None)
 
     @patch('gdm.commands.install')
     def test_install_clean(self, mock_install):
@@ -90,7 +98,69 @@ class TestInstall:
         cli.main(['install', '--clean'])
 
         mock_install.assert_called_once_with(
-            root=None, depth=None, force=False, fetch=False, clean=True)
+            root=None, depth=None, force=False, fetch=False, clean=True,
+            mode=None, staged=False, prune=False, bundle=None, watch=False,
+            plan=False, jobs=None, roots=None)
+
+    @patch('gdm.commands.install')
+    def test_install_export(self, mock_install):
+        """Verify dependencies can be installed without repositories."""
+        cli.main(['install', '--export'])
+
+        mock_install.assert_called_once_with(
+            root=None, depth=None, force=False, fetch=False, clean=None,
+            mode='export', staged=False, prune=False, bundle=None, watch=False,
+            plan=False, jobs=None, roots=None)
+
+    @patch('gdm.commands.install')
+    def test_install_staged(self, mock_install):
+        """Verify dependencies can be swapped in once checked out."""
+        cli.main(['install', '--staged'])
+
+        mock_install.assert_called_once_with(
+            root=None, depth=None, force=False, fetch=False, clean=None,
+            mode=None, staged=True, prune=False, bundle=None, watch=False,
+            plan=False, jobs=None, roots=None)
+
+    @patch('gdm.commands.install')
+    def test_install_watch(self, mock_install):
+        """Verify configuration changes can be watched."""
+        cli.main(['install', '--watch'])
+
+        mock_install.assert_called_once_with(
+            root=None, depth=None, force=False, fetch=False, clean=None,
+            mode=None, staged=False, prune=False, bundle=None, watch=True,
+            plan=False, jobs=None, roots=None)
+
+    @patch('gdm.commands.install')
+    def test_install_plan(self, mock_install):
+        """Verify operations can be previewed and run concurrently."""
+        cli.main(['install', '--plan', '--jobs', '4'])
+
+        mock_install.assert_called_once_with(
+            root=None, depth=None, force=False, fetch=False, clean=None,
+            mode=None, staged=False, prune=False, bundle=None, watch=False,
+            plan=True, jobs=4, roots=None)
+
+    @patch('gdm.commands.install')
+    def test_install_roots(self, mock_install):
+        """Verify several projects can be installed together."""
+        cli.main(['install', '--roots', 'mock/a', 'mock/b'])
+
+        mock_install.assert_called_once_with(
+            root=None, depth=None, force=False, fetch=False, clean=None,
+            mode=None, staged=False, prune=False, bundle=None, watch=False,
+            plan=False, jobs=None, roots=['mock/a', 'mock/b'])
+
+    @patch('gdm.commands.install')
+    def test_install_prune(self, mock_install):
+        """Verify unconfigured dependencies can be deleted."""
+        cli.main(['install', '--prune'])
+
+        mock_install.assert_called_once_with(
+            root=None, depth=None, force=False, fetch=False, clean=None,
+            mode=None, staged=False, prune=True, bundle=None, watch=False,
+            plan=False, jobs=None, roots=None)
 
     @patch('gdm.commands.install')
     def test_install_specific_sources(self, mock_install):
@@ -99,7 +169,9 @@ class TestInstall:
 
         mock_install.assert_called_once_with(
             'foo', 'bar', root=None, depth=None,
-            force=False, fetch=False, clean=False)
+            force=False, fetch=False, clean=None,
+            mode=None, staged=False, prune=False, bundle=None, watch=False,
+            plan=False, jobs=None, roots=None)
 
     @patch('gdm.commands.install')
     def test_install_with_depth(self, mock_update):
@@ -107,7 +179,9 @@ class TestInstall:
         cli.main(['install', '--depth', '5'])
 
         mock_update.assert_called_once_with(
-            root=None, depth=5, force=False, fetch=False, clean=False)
+            root=None, depth=5, force=False, fetch=False, clean=None,
+            mode=None, staged=False, prune=False, bundle=None, watch=False,
+            plan=False, jobs=None, roots=None)
 
     @patch('gdm.commands.install', Mock())
     def test_install_with_depth_invalid(self):
@@ -129,7 +203,8 @@ class TestUpdate:
 
         mock_update.assert_called_once_with(
             root=None, depth=None,
-            force=False, clean=False, recurse=False, lock=None)
+            force=False, clean=None, mode=None, staged=False,
+            recurse=False, lock=None)
 
     @patch('gdm.commands.update')
     def test_update_recursive(self, mock_update):
@@ -138,7 +213,8 @@ class TestUpdate:
 
         mock_update.assert_called_once_with(
             root=None, depth=None,
-            force=False, clean=False, recurse=True, lock=None)
+            force=False, clean=None, mode=None, staged=False,
+            recurse=True, lock=None)
 
     @patch('gdm.commands.update')
     def test_update_no_lock(self, mock_update):
@@ -147,7 +223,8 @@ class TestUpdate:
 
         mock_update.assert_called_once_with(
             root=None, depth=None,
-            force=False, clean=False, recurse=False, lock=False)
+            force=False, clean=None, mode=None, staged=False,
+            recurse=False, lock=False)
 
     @patch('gdm.commands.update')
     def test_update_lock(self, mock_update):
@@ -156,7 +233,8 @@ class TestUpdate:
 
         mock_update.assert_called_once_with(
             root=None, depth=None,
-            force=False, clean=False, recurse=False, lock=True)
+            force=False, clean=None, mode=None, staged=False,
+            recurse=False, lock=True)
 
     def test_update_lock_conflict(self):
         """Verify the 'update' command cannot specify both locking options."""
@@ -170,7 +248,8 @@ class TestUpdate:
 
         mock_install.assert_called_once_with(
             'foo', 'bar', root=None, depth=None,
-            force=False, clean=False, recurse=False, lock=None)
+            force=False, clean=None, mode=None, staged=False,
+            recurse=False, lock=None)
 
     @patch('gdm.commands.update')
     def test_update_with_depth(self, mock_update):
@@ -179,7 +258,8 @@ class TestUpdate:
 
         mock_update.assert_called_once_with(
             root=None, depth=5,
-            force=False, clean=False, recurse=False, lock=None)
+            force=False, clean=None, mode=None, staged=False,
+            recurse=False, lock=None)
 
 
 class TestList:
@@ -192,7 +272,8 @@ class TestList:
         cli.main(['list'])
 
         mock_display.assert_called_once_with(
-            root=None, depth=None, allow_dirty=True)
+            root=None, depth=None, allow_dirty=True,
+            format=None, jobs=None)
 
     @patch('gdm.commands.display')
     def test_list_root(self, mock_display):
@@ -200,7 +281,8 @@ class TestList:
         cli.main(['list', '--root', 'mock/path/to/root'])
 
         mock_display.assert_called_once_with(
-            root='mock/path/to/root', depth=None, allow_dirty=True)
+            root='mock/path/to/root', depth=None, allow_dirty=True,
+            format=None, jobs=None)
 
     @patch('gdm.commands.display')
     def test_list_no_dirty(self, mock_display):
@@ -208,7 +290,8 @@ class TestList:
         cli.main(['list', '--no-dirty'])
 
         mock_display.assert_called_once_with(
-            root=None, depth=None, allow_dirty=False)
+            root=None, depth=None, allow_dirty=False,
+            format=None, jobs=None)
 
     @patch('gdm.commands.display')
     def test_update_with_depth(self, mock_update):
@@ -216,7 +299,25 @@ class TestList:
         cli.main(['list', '--depth', '5'])
 
         mock_update.assert_called_once_with(
-            root=None, depth=5, allow_dirty=True)
+            root=None, depth=5, allow_dirty=True,
+            format=None, jobs=None)
+
+    @patch('gdm.commands.display')
+    def test_list_format(self, mock_display):
+        """Verify records can be printed for other programs."""
+        cli.main(['list', '--format', 'json', '--jobs', '4'])
+
+        mock_display.assert_called_once_with(
+            root=None, depth=None, allow_dirty=True,
+            format='json', jobs=4)
+
+    @patch('gdm.commands.display')
+    def test_list_jobs_without_format(self, mock_display):
+        """Verify dependencies shown in order cannot be run concurrently."""
+        with pytest.raises(SystemExit):
+            cli.main(['list', '--jobs', '4'])
+
+        assert not mock_display.called
 
 
 def describe_lock():
@@ -262,6 +363,149 @@ class TestUninstall:
             root=None, force=True)
 
 
+class TestPrune:
+
+    """Unit tests for the `prune` command."""
+
+    @patch('gdm.commands.prune')
+    def test_prune(self, mock_prune):
+        """Verify the 'prune' command can be run."""
+        cli.main(['prune'])
+
+        mock_prune.assert_called_once_with(root=None, force=False)
+
+    @patch('gdm.commands.prune')
+    def test_prune_force(self, mock_prune):
+        """Verify the 'prune' command can be forced."""
+        cli.main(['prune', '--force'])
+
+        mock_prune.assert_called_once_with(root=None, force=True)
+
+
+class TestBundle:
+
+    """Unit tests for the `bundle` commands."""
+
+    @patch('gdm.commands.install')
+    def test_install_from_bundle(self, mock_install):
+        """Verify dependencies can be installed from bundles."""
+        cli.main(['install', '--from-bundle', 'mock/bundles'])
+
+        mock_install.assert_called_once_with(
+            root=None, depth=None, force=False, fetch=False, clean=None,
+            mode=None, staged=False, prune=False, bundle='mock/bundles',
+            watch=False, plan=False, jobs=None, roots=None)
+
+    @patch('gdm.commands.bundle')
+    def test_export(self, mock_bundle):
+        """Verify the 'bundle export' command can be run."""
+        cli.main(['bundle', 'export', 'mock/bundles.tar'])
+
+        mock_bundle.assert_called_once_with('mock/bundles.tar', root=None)
+
+
+class TestSnapshot:
+
+    """Unit tests for the `snapshot` commands."""
+
+    @patch('gdm.commands.snapshot')
+    def test_save(self, mock_snapshot):
+        """Verify the 'snapshot save' command can be run."""
+        cli.main(['snapshot', 'save'])
+
+        mock_snapshot.assert_called_once_with(root=None, directory=None)
+
+    @patch('gdm.commands.restore')
+    def test_restore(self, mock_restore):
+        """Verify the 'snapshot restore' command can be run."""
+        cli.main(['snapshot', 'restore', '--dir', 'mock/archives', '--force'])
+
+        mock_restore.assert_called_once_with(
+            root=None, directory='mock/archives', force=True)
+
+
+class TestCache:
+
+    """Unit tests for the `cache` commands."""
+
+    @patch('gdm.commands.gc')
+    def test_gc(self, mock_gc):
+        """Verify the 'cache gc' command can be run."""
+        cli.main(['cache', 'gc'])
+
+        mock_gc.assert_called_once_with(root=None)
+
+    @patch('gdm.commands.gc')
+    def test_gc_root(self, mock_gc):
+        """Verify the project's root can be specified."""
+        cli.main(['cache', 'gc', '--root', 'mock/path/to/root'])
+
+        mock_gc.assert_called_once_with(root='mock/path/to/root')
+
+    @patch('gdm.commands.maintain')
+    def test_maintain(self, mock_maintain):
+        """Verify the 'cache maintain' command can be run."""
+        cli.main(['cache', 'maintain'])
+
+        mock_maintain.assert_called_once_with(budget=None, jobs=None)
+
+    @patch('gdm.commands.maintain')
+    def test_maintain_budget(self, mock_maintain):
+        """Verify maintenance can be limited and parallelized."""
+        cli.main(['cache', 'maintain', '--budget', '60', '--jobs', '4'])
+
+        mock_maintain.assert_called_once_with(budget=60, jobs=4)
+
+    def test_missing(self):
+        """Verify a cache command is required."""
+        with pytest.raises(SystemExit):
+            cli.main(['cache'])
+
+
+class TestDaemon:
+
+    """Unit tests for the `daemon` command and client."""
+
+    @patch('gdm.daemon.serve')
+    def test_daemon(self, mock_serve):
+        """Verify the 'daemon' command can be run."""
+        cli.main(['daemon', '--socket', 'mock.sock'])
+
+        mock_serve.assert_called_once_with(path='mock.sock')
+
+    @patch('gdm.daemon.Client.call', Mock(return_value=True))
+    @patch('gdm.commands.display')
+    def test_client(self, mock_display, monkeypatch):
+        """Verify commands are sent to the daemon when its socket is set."""
+        monkeypatch.setenv('GDM_SOCKET', 'mock.sock')
+
+        cli.main(['list'])
+
+        assert not mock_display.called
+
+    @pytest.mark.parametrize('option', ['--watch', '--plan'])
+    @patch('gdm.daemon.Client.call')
+    @patch('gdm.commands.install')
+    def test_client_local(self, mock_install, mock_call, monkeypatch,
+                          option):
+        """Verify watching and planning run in this process."""
+        monkeypatch.setenv('GDM_SOCKET', 'mock.sock')
+
+        cli.main(['install', option])
+
+        assert mock_install.called
+        assert not mock_call.called
+
+    def test_client_not_running(self, tmpdir, monkeypatch):
+        """Verify a socket without a daemon is reported as an error."""
+        monkeypatch.setenv('GDM_SOCKET', str(tmpdir.join('missing.sock')))
+
+        with pytest.raises(SystemExit) as exc:
+            cli.main(['list'])
+
+        assert "No daemon listening on" in str(exc.value)
+
+
 class TestLogging:
 
     """Unit tests for logging."""
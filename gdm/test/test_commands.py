@@ -1,10 +1,16 @@
-# pylint: disable=no-self-use
+# pylint: disable=no-self-use,redefined-outer-name
 
 import os
+import subprocess
+from unittest.mock import patch
+
+import pytest
 
 from .conftest import ROOT, FILES
 
-from gdm.commands import _find_root, install, update, display, delete
+from gdm import git
+from gdm.commands import (_find_root, _find_roots, install, update, display,
+                          delete, gc)
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(ROOT))
 PROJECT_PARENT = os.path.dirname(PROJECT_ROOT)
@@ -19,6 +25,74 @@ class TestCommands:
         assert not update()
         assert not display()
         assert not delete()
+        assert not gc()
+        assert [] == list(display(format='records'))
+
+
+@pytest.fixture
+def projects(local_project, tmpdir):
+    """Create two projects depending on the same local remote."""
+    roots = [str(local_project("- dir: demo\n  repo: {0}\n", name=name))
+             for name in ('project_1', 'project_2')]
+    tmpdir.chdir()
+    return roots, str(tmpdir.join('source'))
+
+
+class TestInstallRoots:
+
+    def test_projects_share_fetches(self, projects):
+        """Verify each repository is fetched once for all projects."""
+        roots, source = projects
+        assert install(roots=roots)
+        subprocess.check_call(['git', '-c', 'user.name=gdm',
+                               '-c', 'user.email=gdm@localhost', 'commit',
+                               '--quiet', '--allow-empty', '-m', 'Change'],
+                              cwd=source)
+        subprocess.check_call(['git', 'push', '--quiet', '../remote/demo.git',
+                               'HEAD:master'], cwd=source)
+
+        with patch('gdm.git.mirror', wraps=git.mirror) as mirror:
+            assert install(roots=roots, fetch=True)
+
+        assert 1 == mirror.call_count
+        for root in roots:
+            assert git.read_head(source) == git.read_head(
+                os.path.join(root, 'deps', 'demo'))
+
+    def test_watch_requires_one_root(self, projects):
+        roots, _ = projects
+        with pytest.raises(ValueError):
+            install(roots=roots, watch=True)
+
+
+class TestDisplay:
+
+    def test_jobs_require_format(self, projects):
+        roots, _ = projects
+        with pytest.raises(ValueError):
+            display(root=roots[0], jobs=4)
+
+
+class TestGc:
+
+    def test_nested_directories(self, projects):
+        """Verify directories left inside the location are deleted."""
+        roots, _ = projects
+        assert install(root=roots[0])
+        location = os.path.join(roots[0], 'deps')
+        for path in (roots[0], location, os.path.join(location, 'demo')):
+            os.makedirs(os.path.join(path, '.gdm-trash-abc', 'deps'))
+
+        assert gc(root=roots[0])
+
+        for path in (roots[0], location, os.path.join(location, 'demo')):
+            assert '.gdm-trash-abc' not in os.listdir(path)
+
+
+class TestFindRoots:
+
+    def test_relative(self):
+        assert [FILES, ROOT] == _find_roots(['files', '.', 'files'], cwd=ROOT)
 
 
 class TestFindRoot:
@@ -1,6 +1,10 @@
 # pylint: disable=attribute-defined-outside-init
 
-from unittest.mock import Mock, call
+import os
+import stat
+from unittest.mock import Mock, call, patch
+
+import pytest
 
 from gdm import common
 from gdm.common import _Config
@@ -88,3 +92,60 @@ class TestShowQuiet:
 
         assert [] == self.file.mock_calls
         assert [] == self.log.mock_calls
+
+
+class TestWriteAtomic:
+
+    def test_write_new(self, tmpdir):
+        path = str(tmpdir.join('new.yml'))
+
+        common.write_atomic(path, "text\n")
+
+        assert "text\n" == open(path).read()
+        assert ['new.yml'] == os.listdir(str(tmpdir))
+
+    def test_replace_keeps_mode(self, tmpdir):
+        path = str(tmpdir.join('old.yml'))
+        open(path, 'w').write("old\n")
+        os.chmod(path, 0o640)
+
+        common.write_atomic(path, "new\n")
+
+        assert "new\n" == open(path).read()
+        assert 0o640 == stat.S_IMODE(os.stat(path).st_mode)
+
+    def test_failure_keeps_original(self, tmpdir):
+        path = str(tmpdir.join('old.yml'))
+        open(path, 'w').write("old\n")
+
+        with patch('os.replace', Mock(side_effect=OSError)):
+            with pytest.raises(OSError):
+                common.write_atomic(path, "new\n")
+
+        assert "old\n" == open(path).read()
+        assert ['old.yml'] == os.listdir(str(tmpdir))
+
+
+class TestCleanPolicy:
+
+    @pytest.mark.parametrize("value,policy", [
+        (None, 'none'),
+        (False, 'none'),
+        (True, 'full'),
+        ("UNTRACKED", 'untracked'),
+        ("build/ *.so", ['build/', '*.so']),
+        (['build/'], ['build/']),
+    ])
+    def test_clean_policy(self, value, policy):
+        assert policy == common.clean_policy(value)
+
+
+class TestFormatRecord:
+
+    def test_tsv(self):
+        """Verify records are written as tab-separated fields."""
+        record = dict(path='deps/a', url=None, sha='abc123', dirty=True,
+                      depth=2, seconds=0.25)
+
+        assert "deps/a\t\tabc123\ttrue\t2\t0.25" == \
+            common.format_record(record, 'tsv')
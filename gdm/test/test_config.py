@@ -1,12 +1,32 @@
 # pylint: disable=no-self-use,redefined-outer-name
 
+import os
+import time
+import logging
+import subprocess
+from unittest.mock import patch, Mock, MagicMock
+
 import pytest
+import yorm
 
-from gdm.config import Config, load
+from gdm.config import Config, Snapshot, Source, Sources, load
+from gdm.exceptions import InvalidConfig, UncommittedChanges
 
 from .conftest import FILES
 
 
+@pytest.fixture
+def installed(tmpdir, git_repo):
+    """Create a configuration with three clean, installed dependencies."""
+    config = Config(str(tmpdir))
+    config.sources = []
+    for name in ('dep_1', 'dep_2', 'dep_3'):
+        git_repo(os.path.join(config.location_path, name),
+                 origin='file:///mock/' + name)
+        config.sources.append(Source('file:///mock/' + name, name))
+    return config
+
+
 class TestConfig:
 
     def test_init_defaults(self):
@@ -69,6 +89,85 @@ class TestConfig:
 
         assert 0 == len(list(config.get_deps(depth=0)))
 
+    def test_get_deps_process_budget(self, installed, processes, caplog):
+        """Verify listing dependencies spawns a bounded number of programs."""
+        caplog.set_level(logging.WARNING, logger='gdm')
+
+        deps = list(installed.get_deps())
+
+        assert 3 == len(deps)
+        assert processes.total <= 3 * 5
+        for path in processes.sources:
+            assert processes.sources[path] <= 5
+
+    def test_get_deps_verbose(self, installed, processes, caplog):
+        """Verify large working tree options are reported when verbose."""
+        caplog.set_level(logging.INFO, logger='gdm')
+
+        list(installed.get_deps())
+
+        assert 3 * 6 == processes.total
+        assert "Large working tree options: <none>" in caplog.text
+
+    def test_check_deps(self, installed, processes):
+        """Verify dependencies are checked for changes without entering them."""
+        cwd = os.getcwd()
+
+        assert 3 == installed.check_deps()
+        assert cwd == os.getcwd()
+        assert 3 == len(processes.sources)
+
+    def test_check_deps_with_changes(self, installed):
+        """Verify uncommitted changes are reported."""
+        path = os.path.join(installed.location_path, 'dep_2')
+        with open(os.path.join(path, 'changed.txt'), 'w') as stream:
+            stream.write("changed")
+        subprocess.check_call(['git', 'add', 'changed.txt'], cwd=path)
+
+        with pytest.raises(UncommittedChanges):
+            installed.check_deps()
+
+    def test_check_deps_allow_dirty(self, installed, processes):
+        """Verify dependencies are only counted when changes are allowed."""
+        assert 3 == installed.check_deps(allow_dirty=True)
+        assert 0 == processes.total
+
+    def test_prune_deps(self, installed):
+        """Verify unconfigured directories and links are deleted."""
+        location = installed.location_path
+        for name in ('dep_4', 'dep_5'):
+            subprocess.check_call(['git', 'clone', '--quiet', 'dep_1', name],
+                                  cwd=location)
+        os.symlink('dep_1', os.path.join(location, 'old_link'))
+        os.mkdir(os.path.join(location, 'empty'))
+        with open(os.path.join(location, 'notes.txt'), 'w') as stream:
+            stream.write("notes")
+
+        assert 4 == installed.prune_deps()
+
+        assert ['dep_1', 'dep_2', 'dep_3', 'notes.txt'] == \
+            sorted(os.listdir(location))
+
+    def test_prune_deps_with_changes(self, installed):
+        """Verify unconfigured directories with changes are kept."""
+        path = os.path.join(installed.location_path, 'dep_4')
+        os.makedirs(path)
+        with open(os.path.join(path, 'changed.txt'), 'w') as stream:
+            stream.write("changed")
+
+        with pytest.raises(UncommittedChanges):
+            installed.prune_deps()
+        assert os.path.isdir(path)
+
+        assert 1 == installed.prune_deps(force=True)
+        assert not os.path.exists(path)
+
+    def test_uninstall_deps(self, installed):
+        """Verify the location is moved aside immediately."""
+        installed.uninstall_deps()
+
+        assert not os.path.exists(installed.location_path)
+
     @pytest.mark.integration
     def test_install_with_dirs(self):
         """Verify the dependency list can be filtered."""
@@ -108,6 +207,146 @@ class TestConfig:
         assert 5 == count
 
 
+class TestSources:
+
+    @pytest.fixture
+    def sources(self):
+        sources = Sources()
+        sources.extend([Source('repo', 'b'), Source('repo', 'a'),
+                        Source('repo', 'b', 'v2')])
+        return sources
+
+    def test_index(self, sources):
+        assert 0 == sources.index(Source('other', 'b'))
+        assert 1 == sources.index(Source('other', 'a'))
+        with pytest.raises(ValueError):
+            sources.index(Source('other', 'c'))
+
+    def test_contains(self, sources):
+        assert Source('other', 'a') in sources
+        assert Source('other', 'c') not in sources
+
+    def test_index_after_append(self, sources):
+        sources.index(Source('repo', 'a'))
+        sources.append(Source('repo', 'c'))
+        sources.append(Source('repo', 'a'))
+
+        assert 3 == sources.index(Source('repo', 'c'))
+        assert 1 == sources.index(Source('repo', 'a'))
+
+    def test_index_after_replace(self, sources):
+        sources.index(Source('repo', 'a'))
+        sources[1] = Source('repo', 'a', 'v3')
+        sources[0] = Source('repo', 'c')
+
+        assert 'v3' == sources[sources.index(Source('repo', 'a'))].rev
+        assert 0 == sources.index(Source('repo', 'c'))
+        assert 2 == sources.index(Source('repo', 'b'))
+
+    def test_index_after_reorder(self, sources):
+        sources.index(Source('repo', 'a'))
+        sources.sort()
+        sources.insert(0, Source('repo', 'c'))
+        sources.remove(Source('repo', 'a'))
+
+        assert 0 == sources.index(Source('repo', 'c'))
+        assert 1 == sources.index(Source('repo', 'b'))
+        assert Source('repo', 'a') not in sources
+
+
+class TestScaling:
+
+    COUNT = 5000
+
+    @pytest.fixture
+    def config(self, tmpdir):
+        config = Config(str(tmpdir))
+        with config.transaction():
+            config.sources = Sources(
+                Source('repo', 'dep_{:04}'.format(index))
+                for index in range(self.COUNT)
+            )
+            config.sources_locked = Sources(
+                Source('repo', 'dep_{:04}'.format(index), 'old')
+                for index in reversed(range(self.COUNT))
+            )
+        return config
+
+    @patch('gdm.config.shell', MagicMock())
+    @patch('gdm.config.common', Mock())
+    def test_lock_deps(self, config):
+        with patch.object(Source, 'lock',
+                          lambda self: Source(self.repo, self.dir, 'new')):
+            start = time.perf_counter()
+            count = config.lock_deps(obey_existing=False)
+            duration = time.perf_counter() - start
+
+        assert self.COUNT == count
+        assert self.COUNT == len(config.sources_locked)
+        assert {'new'} == {source.rev for source in config.sources_locked}
+        assert duration < 5
+
+    @patch('gdm.config.shell', MagicMock())
+    @patch('gdm.config.common', Mock())
+    @patch('gdm.config.load', Mock(return_value=None))
+    @patch('os.path.isdir', Mock(return_value=True))
+    def test_install_deps_with_names(self, tmpdir):
+        sources = tuple(Source('repo', 'dep_{:04}'.format(index))
+                        for index in range(self.COUNT))
+        config = Snapshot(str(tmpdir), 'gdm.yml', 'deps', sources, ())
+        names = ['dep_{:04}'.format(index) for index in range(0, self.COUNT, 2)]
+        with patch.object(Source, 'update_files'), \
+                patch.object(Source, 'create_link'):
+            start = time.perf_counter()
+            count = config.install_deps(*names, update=True)
+            duration = time.perf_counter() - start
+
+        assert len(names) == count
+        assert duration < 5
+
+
+class TestTransaction:
+
+    @pytest.fixture
+    def config(self, tmpdir, monkeypatch):
+        monkeypatch.setattr(yorm.settings, 'fake', False)
+        tmpdir.join('gdm.yml').write("location: deps\n")
+        return load(str(tmpdir))
+
+    def test_changes_are_saved_once(self, config):
+        with patch('gdm.common.write_atomic') as mock_write:
+            with config.transaction():
+                for name in ('c', 'a', 'b'):
+                    config.sources_locked.append(Source('repo', name))
+                    config.sources.append(Source('repo', name))
+
+        assert 1 == mock_write.call_count
+        path, text = mock_write.call_args[0]
+        assert config.path == path
+        assert text.index('dir: a') < text.index('dir: b')
+
+    def test_unchanged_file_is_not_written(self, config):
+        with config.transaction():
+            config.sources.append(Source('repo', 'a'))
+        stamp = os.stat(config.path).st_mtime_ns, os.stat(config.path).st_ino
+
+        with patch('gdm.common.write_atomic') as mock_write:
+            with config.transaction():
+                config.location = 'deps'
+
+        assert 0 == mock_write.call_count
+        assert stamp == (os.stat(config.path).st_mtime_ns,
+                         os.stat(config.path).st_ino)
+
+    def test_changes_are_not_saved_on_error(self, config):
+        with pytest.raises(RuntimeError):
+            with config.transaction():
+                config.sources.append(Source('repo', 'a'))
+                raise RuntimeError
+
+        assert "location: deps\n" == open(config.path).read()
+
+
 class TestLoad:
 
     def test_load_from_directory_with_config_file(self):
@@ -121,3 +360,73 @@ class TestLoad:
         config = load()
 
         assert None is config
+
+    def test_load_read_only(self):
+        config = load(FILES, writable=False)
+
+        assert isinstance(config, Snapshot)
+        assert '/tmp/gdm-test-dependencies' == config.location
+        assert ['gdm_1', 'gdm_2', 'gdm_3'] == [s.dir for s in config.sources]
+        assert 'example-tag' == config.sources[1].rev
+        assert '' == config.sources[1].link
+        assert 3 == len(config.sources_locked)
+        with pytest.raises(AttributeError):
+            config.location = 'other'
+
+    def test_load_read_only_is_cached_until_modified(self, tmpdir):
+        tmpdir.join('gdm.yml').write("sources:\n- repo: r\n  dir: a\n")
+
+        config = load(str(tmpdir), writable=False)
+        assert config is load(str(tmpdir), writable=False)
+        assert 'gdm_sources' == config.location
+        assert 'master' == config.sources[0].rev
+
+        tmpdir.join('gdm.yml').write("sources:\n- repo: r\n  dir: bb\n")
+
+        config2 = load(str(tmpdir), writable=False)
+        assert config2 is not config
+        assert 'bb' == config2.sources[0].dir
+
+    def test_load_read_only_invalid(self, tmpdir):
+        tmpdir.join('gdm.yml').write("- not a mapping\n")
+
+        with pytest.raises(ValueError):
+            load(str(tmpdir), writable=False)
+
+    @pytest.mark.parametrize('text', [
+        "sources: [unclosed\n",
+        "sources:\n- not a mapping\n",
+        "sources_locked: not a list\n",
+    ])
+    def test_load_read_only_invalid_sources(self, tmpdir, text):
+        tmpdir.join('gdm.yml').write(text)
+
+        with pytest.raises(InvalidConfig):
+            load(str(tmpdir), writable=False)
+
+    def test_load_read_only_finds_the_file_once(self, tmpdir):
+        tmpdir.join('gdm.yml').write("sources:\n- repo: r\n  dir: a\n")
+        config = load(str(tmpdir), writable=False)
+
+        with patch('os.listdir') as mock_listdir:
+            assert config is load(str(tmpdir), writable=False)
+
+        assert 0 == mock_listdir.call_count
+
+    def test_load_read_only_finds_an_added_file(self, tmpdir):
+        assert None is load(str(tmpdir), writable=False)
+
+        tmpdir.join('.gdm.yml').write("location: deps\n")
+
+        assert 'deps' == load(str(tmpdir), writable=False).location
+
+    def test_load_read_only_sources_cannot_be_changed(self, tmpdir):
+        tmpdir.join('gdm.yml').write("sources:\n- repo: r\n  dir: a\n")
+        source = load(str(tmpdir), writable=False).sources[0]
+
+        with pytest.raises(TypeError):
+            source.rev = 'other'
+        with pytest.raises(TypeError):
+            source['rev'] = 'other'
+
+        assert 'master' == load(str(tmpdir), writable=False).sources[0].rev
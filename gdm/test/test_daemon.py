@@ -0,0 +1,124 @@
+# pylint: disable=no-self-use,redefined-outer-name
+
+import threading
+import subprocess
+from unittest.mock import patch
+
+import pytest
+
+from gdm import daemon
+
+
+@pytest.fixture
+def project(tmpdir, git_repo):
+    """Create a project with an installed dependency."""
+    git_repo(str(tmpdir.join('deps', 'dep_1')), origin='file:///mock/dep_1')
+    tmpdir.join('.git').write("")
+    tmpdir.join('gdm.yml').write("location: deps\nsources:\n"
+                                 "- repo: file:///mock/dep_1\n  dir: dep_1\n")
+    return tmpdir
+
+
+@pytest.fixture
+def server(tmpdir):
+    """Run a daemon in the background."""
+    server = daemon.Server(str(tmpdir.join('gdm.sock')))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def commit(path):
+    subprocess.check_call(['git', '-c', 'user.name=gdm',
+                           '-c', 'user.email=gdm@localhost', 'commit',
+                           '--quiet', '--allow-empty', '-m', 'Change'],
+                          cwd=path)
+
+
+class TestDaemon:
+
+    def test_list(self, project, server, processes, capsys):
+        """Verify records are only identified again after changes."""
+        client = daemon.Client(server.server_address)
+
+        assert client.display(root=str(project), format='json')
+        cold = processes.total
+        processes.reset()
+
+        assert client.display(root=str(project), format='json')
+        assert processes.total < cold  # only checked for changes
+
+        commit(str(project.join('deps', 'dep_1')))
+        assert client.display(root=str(project), format='json')
+        assert 0 < processes.total
+
+        lines = capsys.readouterr().out.splitlines()
+        assert 3 == len(lines)
+        assert lines[0] != lines[2]
+
+    def test_list_changed_file(self, project, server, capsys):
+        """Verify edits to tracked files are reported by a warm daemon."""
+        client = daemon.Client(server.server_address)
+        path = project.join('deps', 'dep_1', 'README')
+        path.write("Initial\n")
+        subprocess.check_call(['git', 'add', 'README'], cwd=path.dirname)
+        commit(path.dirname)
+        assert client.display(root=str(project))
+        assert " <dirty>" not in capsys.readouterr().out
+
+        path.write("Changed\n")
+        assert client.display(root=str(project))
+
+        assert capsys.readouterr().out.endswith(" <dirty>\n")
+
+    def test_list_text(self, project, server, capsys):
+        client = daemon.Client(server.server_address)
+
+        assert client.display(root=str(project))
+
+        path = str(project.join('deps', 'dep_1'))
+        assert capsys.readouterr().out.startswith(path + ": ")
+
+    def test_error(self, server):
+        """Verify errors in the daemon are raised by the client."""
+        client = daemon.Client(server.server_address)
+
+        with pytest.raises(RuntimeError):
+            client.call('delete')
+
+    def test_not_running(self, tmpdir):
+        """Verify a missing daemon is reported without a traceback."""
+        client = daemon.Client(str(tmpdir.join('missing.sock')))
+
+        with pytest.raises(RuntimeError):
+            client.display(root=str(tmpdir))
+
+    def test_paths_are_relative_to_client(self, project, server,
+                                          monkeypatch):
+        """Verify paths in requests are resolved where the client runs."""
+        monkeypatch.chdir(project)
+        client = daemon.Client(server.server_address)
+
+        with patch('gdm.commands.install', return_value=True) as install:
+            assert client.install(bundle='deps.tar')
+
+        assert str(project.join('deps.tar')) == install.call_args[1]['bundle']
+
+    @pytest.mark.parametrize('option', ['watch', 'plan'])
+    def test_local_options(self, project, server, option):
+        """Verify the daemon refuses options it cannot answer."""
+        client = daemon.Client(server.server_address)
+
+        with pytest.raises(RuntimeError):
+            client.install(root=str(project), **{option: True})
+
+    def test_already_running(self, server):
+        with pytest.raises(RuntimeError):
+            daemon.Server(server.server_address)
+
+    def test_client_commands(self):
+        with pytest.raises(AttributeError):
+            daemon.Client('mock.sock').delete  # pylint: disable=expression-not-assigned
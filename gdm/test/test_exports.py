@@ -0,0 +1,117 @@
+# pylint: disable=no-self-use,redefined-outer-name
+
+import os
+
+import pytest
+
+from gdm import exports, git
+from gdm.exceptions import InvalidRepository, UncommittedChanges
+
+
+@pytest.fixture
+def repo(git_repo, tmpdir):
+    """Create a repository with an ignored file that is still tracked."""
+    files = {'.gitignore': "*.o\n", 'main.c': "int main;\n",
+             'vendor.o': "binary\n"}
+    path = git_repo(str(tmpdir.join('repo')), files=files, force=['vendor.o'])
+    return 'file://' + path
+
+
+@pytest.fixture
+def export(repo, tmpdir):
+    """Export the repository and return the exported directory."""
+    path = str(tmpdir.join('deps', 'demo'))
+    os.makedirs(os.path.dirname(path))
+    exports.update(repo, 'master', path, cache=str(tmpdir.join('cache')))
+    return path
+
+
+class TestExports:
+
+    def test_update(self, repo, export):
+        """Verify only the files and metadata are written."""
+        assert [exports.METADATA, '.gitignore', 'main.c', 'vendor.o'] == \
+            sorted(os.listdir(export))
+
+        info = exports.read(export)
+        assert repo == info['repo']
+        assert git.read_head(repo[7:]) == info['sha']
+        assert git.git('rev-parse', 'HEAD^{tree}', _show=False,
+                       _capture=True, _cwd=repo[7:]) == info['tree']
+
+    def test_update_unchanged(self, repo, export, tmpdir):
+        """Verify matching files are left in place."""
+        inode = os.stat(export).st_ino
+
+        exports.update(repo, 'master', export,
+                       cache=str(tmpdir.join('cache')))
+
+        assert inode == os.stat(export).st_ino
+
+    def test_update_new_revision(self, git_repo, repo, export, tmpdir):
+        """Verify files are replaced when the revision changes."""
+        git_repo(repo[7:], files={'main.c': "int main2;\n"})
+
+        info = exports.update(repo, 'master', export, fetch=True,
+                              cache=str(tmpdir.join('cache')))
+
+        assert git.read_head(repo[7:]) == info['sha']
+        assert "int main2;\n" == open(os.path.join(export, 'main.c')).read()
+
+    def test_update_unknown_revision(self, repo, export, tmpdir):
+        with pytest.raises(InvalidRepository):
+            exports.update(repo, 'unknown', export,
+                           cache=str(tmpdir.join('cache')))
+
+    def test_update_modified(self, repo, export, tmpdir):
+        """Verify modified files are only replaced when forced."""
+        with open(os.path.join(export, 'main.c'), 'w') as stream:
+            stream.write("changed\n")
+        cache = str(tmpdir.join('cache'))
+
+        with pytest.raises(UncommittedChanges):
+            exports.update(repo, 'master', export, cache=cache)
+
+        exports.update(repo, 'master', export, force=True, cache=cache)
+
+        assert "int main;\n" == open(os.path.join(export, 'main.c')).read()
+
+    def test_verify(self, export, tmpdir):
+        """Verify ignored files are allowed but other changes are not."""
+        cache = str(tmpdir.join('cache'))
+        with open(os.path.join(export, 'build.o'), 'w'):
+            pass
+        assert exports.verify(export, cache=cache)
+
+        with open(os.path.join(export, 'new.c'), 'w'):
+            pass
+        assert not exports.verify(export, cache=cache)
+
+        os.remove(os.path.join(export, 'new.c'))
+        os.remove(os.path.join(export, 'vendor.o'))
+        assert not exports.verify(export, cache=cache)
+
+    def test_verify_offline(self, export, tmpdir, processes):
+        """Verify a missing mirror is not cloned to check the files."""
+        cache = str(tmpdir.join('other'))
+
+        assert None is exports.verify(export, cache=cache, offline=True)
+
+        assert not os.path.exists(cache)
+        assert 0 == processes.total
+
+    def test_verify_cached(self, export, tmpdir, processes):
+        """Verify unchanged files are only hashed once."""
+        cache = str(tmpdir.join('cache'))
+        assert exports.verify(export, cache=cache, offline=True)
+        processes.reset()
+
+        assert exports.verify(export, cache=cache, offline=True)
+        assert 0 == processes.total
+
+        with open(os.path.join(export, 'main.c'), 'a') as stream:
+            stream.write("int other;\n")
+        assert False is exports.verify(export, cache=cache, offline=True)
+
+    def test_read_missing(self, tmpdir):
+        assert None is exports.read(str(tmpdir))
@@ -1,8 +1,11 @@
 # pylint: disable=no-self-use
 
+import threading
 from unittest.mock import patch, Mock
 
-from gdm import git
+import pytest
+
+from gdm import git, settings
 from gdm.exceptions import ShellError
 
 from . import assert_calls
@@ -28,6 +31,33 @@ class TestGit:
         assert_calls(mock_call, [
             "git clone --reference cache/mock.reference mock.git mock/path"])
 
+    @patch('os.path.isdir', Mock(return_value=True))
+    def test_clone_with_config(self, mock_call):
+        """Verify options can be set for the initial checkout."""
+        git.clone('mock.git', 'mock/path', cache='cache',
+                  config=[('core.splitIndex', 'true')])
+        assert_calls(mock_call, [
+            "git clone -c core.splitIndex=true "
+            "--reference cache/mock.reference mock.git mock/path"])
+
+    def test_configure(self, mock_call):
+        """Verify the commands to set repository options."""
+        git.configure([('core.untrackedCache', 'true'),
+                       ('checkout.workers', '0')])
+        assert_calls(mock_call, [
+            "git config core.untrackedCache true",
+            "git config checkout.workers 0",
+        ])
+
+    def test_get_large_config(self, mock_call):
+        """Verify large working tree options are parsed."""
+        mock_call.return_value = "core.untrackedcache true\nindex.threads 0"
+
+        options = git.get_large_config()
+
+        assert [('core.untrackedcache', 'true'),
+                ('index.threads', '0')] == options
+
     def test_fetch(self, mock_call):
         """Verify the commands to fetch from a Git repository."""
         git.fetch('mock.git')
@@ -124,6 +154,26 @@ class TestGit:
             "git branch --set-upstream-to origin/mock_rev",
         ])
 
+    def test_update_clean_untracked(self, mock_call):
+        """Verify ignored files can be kept when cleaning."""
+        git.update('mock_rev', clean='untracked')
+        assert_calls(mock_call, [
+            "git stash",
+            "git clean --force -d",
+            "git checkout --force mock_rev",
+            "git branch --set-upstream-to origin/mock_rev",
+        ])
+
+    def test_update_clean_excluding_patterns(self, mock_call):
+        """Verify matching files can be kept when cleaning."""
+        git.update('mock_rev', clean=['build/', '*.so'])
+        assert_calls(mock_call, [
+            "git stash",
+            "git clean --force -d -x --exclude build/ --exclude *.so",
+            "git checkout --force mock_rev",
+            "git branch --set-upstream-to origin/mock_rev",
+        ])
+
     def test_update_revparse(self, mock_call):
         """Verify the commands to update a working tree to a rev-parse."""
         mock_call.return_value = "abc123"
@@ -156,3 +206,146 @@ class TestGit:
         """Verify the commands to get the working tree's branch."""
         git.get_branch()
         assert_calls(mock_call, ["git rev-parse --abbrev-ref HEAD"])
+
+    def test_show_file(self, mock_call):
+        """Verify the commands to read a file at a revision."""
+        git.show_file('mock_rev', 'gdm.yml')
+        assert_calls(mock_call, ["git cat-file -p mock_rev:gdm.yml"])
+
+
+class TestReadHead:
+
+    """Tests for reading the checked out hash."""
+
+    def test_detached(self, tmpdir):
+        """Verify a checked out hash is read from the repository's files."""
+        gitdir = tmpdir.mkdir('.git')
+        gitdir.join('HEAD').write("abc123\n")
+
+        assert 'abc123' == git.read_head(str(tmpdir))
+
+    def test_refs(self, tmpdir):
+        """Verify branches are resolved from loose and packed references."""
+        gitdir = tmpdir.mkdir('.git')
+        gitdir.join('HEAD').write("ref: refs/heads/master\n")
+        gitdir.join('packed-refs').write("# pack-refs\n"
+                                         "def456 refs/heads/master\n")
+
+        assert 'def456' == git.read_head(str(tmpdir))
+
+        gitdir.mkdir('refs').mkdir('heads').join('master').write("abc123\n")
+
+        assert 'abc123' == git.read_head(str(tmpdir))
+
+    def test_missing(self, tmpdir):
+        assert None is git.read_head(str(tmpdir))
+
+
+TRANSIENT = ShellError("\n  STDERR:\nerror: RPC failed; curl 56 "
+                       "Recv failure: Connection reset by peer\n"
+                       "fatal: early EOF")
+PERMANENT = ShellError("\n  STDERR:\nremote: Repository not found.\n"
+                       "fatal: the remote end hung up unexpectedly")
+
+
+class TestTransfer:
+
+    """Tests for retrying calls to remote repositories."""
+
+    @pytest.fixture(autouse=True)
+    def no_delay(self, monkeypatch):
+        monkeypatch.setattr(settings, 'NETWORK_RETRY_DELAY', 0)
+
+    @pytest.mark.parametrize('message', [
+        "fatal: unable to access 'https://host/repo/': "
+        "Could not resolve host: host",
+        "fatal: unable to access 'https://host/repo/': "
+        "The requested URL returned error: 503",
+        "ssh: connect to host host port 22: Connection timed out",
+        "kex_exchange_identification: read: Connection reset by peer",
+        str(TRANSIENT),
+    ])
+    def test_transient(self, message):
+        assert git.is_transient(ShellError(message))
+
+    @pytest.mark.parametrize('message', [
+        "fatal: Authentication failed for 'https://host/repo/'",
+        "fatal: couldn't find remote ref feature",
+        "fatal: 'repo' does not appear to be a git repository",
+        "error: pathspec 'master' did not match any file(s) known to git",
+        str(PERMANENT),
+    ])
+    def test_permanent(self, message):
+        assert not git.is_transient(ShellError(message))
+
+    @pytest.mark.parametrize('repo,host', [
+        ('https://github.com/owner/repo', 'github.com'),
+        ('ssh://git@host:2222/repo.git', 'host'),
+        ('git@github.com:owner/repo.git', 'github.com'),
+        ('file:///tmp/repo.git', None),
+        ('/tmp/repo.git', None),
+        ('C:/repo.git', None),
+    ])
+    def test_get_host(self, repo, host):
+        assert host == git.get_host(repo)
+
+    def test_retry_transient(self):
+        """Verify transient errors are retried."""
+        with patch('gdm.git.call', Mock(side_effect=[TRANSIENT, None])) \
+                as mock_call:
+            git.transfer('mock.git', 'clone', 'mock.git', 'mock/path')
+
+        assert 2 == mock_call.call_count
+
+    def test_permanent_errors_are_raised(self):
+        """Verify permanent errors are not retried."""
+        with patch('gdm.git.call', Mock(side_effect=PERMANENT)) as mock_call:
+            with pytest.raises(ShellError):
+                git.transfer('mock.git', 'clone', 'mock.git', 'mock/path')
+
+        assert 1 == mock_call.call_count
+
+    def test_attempts(self, monkeypatch):
+        """Verify the last transient error is raised."""
+        monkeypatch.setattr(settings, 'NETWORK_ATTEMPTS', 3)
+        with patch('gdm.git.call', Mock(side_effect=TRANSIENT)) as mock_call:
+            with pytest.raises(ShellError):
+                git.transfer('mock.git', 'clone', 'mock.git', 'mock/path')
+
+        assert 3 == mock_call.call_count
+
+    def test_stall(self, monkeypatch):
+        """Verify stalled transfers are aborted to be retried."""
+        monkeypatch.setattr(settings, 'NETWORK_STALL_SECONDS', 60)
+        with patch('gdm.git.call') as mock_call:
+            git.transfer('mock.git', 'clone', 'mock.git', 'mock/path')
+
+        env = mock_call.call_args[1]['_env']
+        assert '60' == env['GIT_HTTP_LOW_SPEED_TIME']
+
+    def test_host_jobs(self, monkeypatch):
+        """Verify concurrent calls to the same host are limited."""
+        monkeypatch.setattr(settings, 'NETWORK_HOST_JOBS', 2)
+        monkeypatch.setattr(git, '_hosts', {})
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def call(*_, **__):
+            with lock:
+                running.append(True)
+                peak.append(len(running))
+            threading.Event().wait(0.02)
+            with lock:
+                running.pop()
+
+        with patch('gdm.git.call', call):
+            threads = [threading.Thread(target=git.transfer, args=(
+                'https://host/repo_{}'.format(index), 'clone'))
+                for index in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert 2 == max(peak)
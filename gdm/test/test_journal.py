@@ -0,0 +1,101 @@
+# pylint: disable=no-self-use,redefined-outer-name,unused-import
+
+import os
+from unittest.mock import patch
+
+import pytest
+
+from gdm import journal
+from gdm.config import load
+from gdm.plans import Operation
+from gdm.source import Source
+
+from .test_plans import project
+
+
+@pytest.fixture
+def entries(tmpdir):
+    return journal.Journal(str(tmpdir.join('deps')))
+
+
+def checkout(path, **info):
+    return Operation('checkout', path, path=path, info=info)
+
+
+class TestJournal:
+
+    def test_partial(self, entries, tmpdir):
+        path = str(tmpdir.join('deps', 'dep_1'))
+        entries.start(checkout(path))
+
+        assert journal.Journal(str(tmpdir.join('deps'))).is_partial(
+            'checkout', path)
+
+    def test_existing_directories_are_not_partial(self, entries, tmpdir):
+        path = str(tmpdir.mkdir('dep_1'))
+        entries.start(checkout(path))
+
+        assert not entries.is_partial('checkout', path)
+
+    def test_done(self, entries, tmpdir):
+        path = str(tmpdir.mkdir('dep_1'))
+        tmpdir.join('dep_1').mkdir('.git').join('HEAD').write("abc123\n")
+        entries.start(checkout(path))
+        entries.finish(checkout(path, rev='master'))
+
+        assert entries.is_done('checkout', path, path, rev='master')
+        assert not entries.is_done('checkout', path, path, rev='develop')
+
+        tmpdir.join('dep_1', '.git', 'HEAD').write("def456\n")
+        assert not entries.is_done('checkout', path, path, rev='master')
+
+    def test_interrupted_line(self, entries, tmpdir):
+        path = str(tmpdir.join('dep_1'))
+        entries.start(checkout(path))
+        with open(entries.path, 'a') as stream:
+            stream.write('{"key": "checkout')
+
+        assert 1 == len(journal.Journal(str(tmpdir.join('deps'))).entries)
+
+    def test_clear(self, entries, tmpdir):
+        entries.start(checkout(str(tmpdir.join('dep_1'))))
+        entries.clear()
+
+        assert not os.path.exists(entries.path)
+        assert {} == entries.entries
+
+
+class TestResume:
+
+    def test_interrupted_install(self, project, processes):
+        """Verify completed work is kept and partial clones are replaced."""
+        config = load(str(project), writable=False)
+        location = config.location_path
+        update_files = Source.update_files
+
+        def interrupt(self, **options):
+            if self.dir == 'demo_2':
+                os.makedirs(os.path.join(location, 'demo_2', '.git'))
+                raise KeyboardInterrupt
+            update_files(self, **options)
+
+        with patch.object(Source, 'update_files', interrupt):
+            with pytest.raises(KeyboardInterrupt):
+                config.plan_deps(journal=journal.Journal(location)).execute()
+        assert os.path.isfile(os.path.join(location, journal.FILENAME))
+
+        plan = config.plan_deps(journal=journal.Journal(location))
+        details = {operation.target: operation.detail for operation in plan
+                   if operation.kind == 'checkout'}
+        assert "completed before interruption" == \
+            details[os.path.join(location, 'demo_1')]
+        assert details[os.path.join(location, 'demo_2')].startswith(
+            "delete partial, clone")
+
+        processes.reset()
+        assert 2 == plan.execute()
+
+        assert 0 == processes.sources[os.path.join(location, 'demo_1')]
+        assert os.path.isfile(os.path.join(location, 'demo_2', '.git',
+                                           'HEAD'))
+        assert not os.path.exists(os.path.join(location, journal.FILENAME))
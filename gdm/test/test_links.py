@@ -0,0 +1,108 @@
+# pylint: disable=no-self-use,redefined-outer-name,unused-argument
+
+import os
+import json
+
+import pytest
+
+from gdm.links import FILENAME, Links
+from gdm.exceptions import UncommittedChanges
+
+
+@pytest.fixture
+def tree(tmpdir):
+    """Create a directory with two installed dependencies."""
+    tmpdir.mkdir('deps').mkdir('dep_1')
+    tmpdir.join('deps').mkdir('dep_2')
+    tmpdir.chdir()
+    return tmpdir
+
+
+def reconcile(force=False, location=None):
+    links = Links(location)
+    links.add('link_1', 'deps/dep_1')
+    links.add('nested/link_2', 'deps/dep_2')
+    return links.apply(force=force)
+
+
+class TestLinks:
+
+    def test_create(self, tree):
+        links = reconcile()
+
+        assert (2, 0, 0) == (links.created, links.updated, links.unchanged)
+        assert os.path.join('deps', 'dep_1') == os.readlink('link_1')
+        assert os.path.join('..', 'deps', 'dep_2') == \
+            os.readlink(os.path.join('nested', 'link_2'))
+
+    def test_unchanged(self, tree):
+        reconcile()
+        inode = os.lstat('link_1').st_ino
+
+        links = reconcile()
+
+        assert (0, 0, 2) == (links.created, links.updated, links.unchanged)
+        assert inode == os.lstat('link_1').st_ino
+
+    def test_update(self, tree):
+        os.symlink(os.path.join('deps', 'dep_2'), 'link_1')
+
+        links = reconcile()
+
+        assert (1, 1, 0) == (links.created, links.updated, links.unchanged)
+        assert os.path.join('deps', 'dep_1') == os.readlink('link_1')
+        assert ['deps', 'link_1', 'nested'] == sorted(os.listdir(str(tree)))
+
+    def test_preexisting(self, tree):
+        tree.join('link_1').write("")
+
+        with pytest.raises(UncommittedChanges):
+            reconcile()
+
+        assert not os.path.exists(os.path.join('nested', 'link_2'))
+
+    def test_preexisting_with_force(self, tree):
+        tree.join('link_1').write("")
+        tree.mkdir('nested').mkdir('link_2')
+
+        links = reconcile(force=True)
+
+        assert (0, 2, 0) == (links.created, links.updated, links.unchanged)
+        assert os.path.islink('link_1')
+        assert os.path.islink(os.path.join('nested', 'link_2'))
+
+
+class TestRecord:
+
+    def test_applied_links_are_recorded(self, tree):
+        links = Links(str(tree.join('deps')))
+        links.add('link_1', 'deps/dep_1')
+        links.apply()
+
+        assert {str(tree.join('link_1')): os.path.join('deps', 'dep_1')} == \
+            json.loads(tree.join('deps', FILENAME).read())
+
+    def test_stale_links_are_removed_when_pruning(self, tree):
+        reconcile(location=str(tree.join('deps')))
+        tree.join('nested', 'link_2').remove()
+        os.symlink(os.path.join('..', 'deps', 'dep_1'),
+                   str(tree.join('nested', 'link_2')))  # changed by the user
+
+        links = Links(str(tree.join('deps')), prune=True)
+        links.apply()
+
+        assert 1 == links.removed
+        assert not os.path.lexists('link_1')
+        assert os.path.islink(os.path.join('nested', 'link_2'))
+        assert {} == json.loads(tree.join('deps', FILENAME).read())
+
+    def test_stale_links_are_kept_without_pruning(self, tree):
+        reconcile(location=str(tree.join('deps')))
+
+        links = Links(str(tree.join('deps')))
+        links.add('link_3', 'deps/dep_1')
+        links.apply()
+
+        assert 0 == links.removed
+        assert os.path.islink('link_1')
+        assert 3 == len(json.loads(tree.join('deps', FILENAME).read()))
@@ -0,0 +1,130 @@
+# pylint: disable=no-self-use,redefined-outer-name
+
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from gdm import mirrors, settings, shell
+from gdm.exceptions import ShellError
+
+
+@pytest.fixture
+def cache(tmpdir, git_repo):
+    """Create a cache with two mirrored repositories."""
+    source = git_repo(str(tmpdir.join('source')))
+    path = str(tmpdir.mkdir('cache'))
+    for name in ('dep_1', 'dep_2'):
+        subprocess.check_call(['git', 'clone', '--quiet', '--mirror', source,
+                               name + '.reference'], cwd=path)
+    return path
+
+
+class TestMirrors:
+
+    def test_get_mirror(self):
+        """Verify mirrors are named after their repository."""
+        assert 'cache/demo.reference' == \
+            mirrors.get_mirror('https://mock.com/demo.git', 'cache')
+
+    def test_redirect(self, monkeypatch):
+        """Verify URL rewrites are only set within the context."""
+        monkeypatch.delenv('GIT_CONFIG_COUNT', raising=False)
+
+        with mirrors.redirect(['https://mock.com/demo.git'], 'cache'):
+            assert '1' == os.environ['GIT_CONFIG_COUNT']
+            assert 'url.cache/demo.reference.insteadOf' == \
+                os.environ['GIT_CONFIG_KEY_0']
+            assert 'https://mock.com/demo.git' == \
+                os.environ['GIT_CONFIG_VALUE_0']
+
+        assert 'GIT_CONFIG_COUNT' not in os.environ
+        assert 'GIT_CONFIG_KEY_0' not in os.environ
+
+    def test_get_mirrors(self, cache):
+        """Verify mirrors are ordered by when they were last maintained."""
+        os.mkdir(os.path.join(cache, 'other'))
+        with open(os.path.join(cache, 'dep_1.reference', mirrors.MARKER), 'w'):
+            pass
+
+        paths = mirrors.get_mirrors(cache)
+
+        assert ['dep_2.reference', 'dep_1.reference'] == \
+            [os.path.basename(path) for path in paths]
+
+    def test_get_mirrors_missing(self, tmpdir):
+        """Verify a missing cache has no mirrors."""
+        assert [] == mirrors.get_mirrors(str(tmpdir.join('missing')))
+
+    def test_maintain(self, cache, processes):
+        """Verify every maintenance task is run on each mirror."""
+        assert 2 == mirrors.maintain(cache)
+
+        tasks = len(settings.CACHE_MAINTENANCE_TASKS)
+        assert {path: tasks for path in mirrors.get_mirrors(cache)} == \
+            processes.sources
+        for path in mirrors.get_mirrors(cache):
+            assert os.path.exists(os.path.join(path, mirrors.MARKER))
+            assert os.path.exists(os.path.join(path, 'objects', 'info',
+                                               'commit-graphs'))
+
+    def test_maintain_budget(self, cache, processes):
+        """Verify no new work is started once the budget is spent."""
+        assert 0 == mirrors.maintain(cache, budget=0)
+
+        assert 0 == processes.total
+
+    def test_record_fetch_disabled(self, cache):
+        """Verify fetches are not counted by default."""
+        assert None is mirrors.record_fetch(cache)
+
+        assert not os.path.exists(os.path.join(cache, mirrors.COUNTER))
+
+    def test_maintain_if_due(self, cache, monkeypatch):
+        """Verify the cache is maintained after enough fetches."""
+        monkeypatch.setattr(settings, 'CACHE_MAINTENANCE_INTERVAL', 2)
+
+        assert 1 == mirrors.record_fetch(cache)
+        assert None is mirrors.maintain_if_due(cache)
+        assert 2 == mirrors.record_fetch(cache)
+        assert 2 == mirrors.maintain_if_due(cache)
+
+        assert 1 == mirrors.record_fetch(cache)
+
+    def test_maintain_fallback(self, cache, processes, monkeypatch):
+        """Verify mirrors are garbage collected without 'git maintenance'."""
+        call = shell.call
+
+        def fake_call(name, *args, **kwargs):
+            if args[0] == 'maintenance':
+                raise ShellError("git: 'maintenance' is not a git command.")
+            return call(name, *args, **kwargs)
+
+        monkeypatch.setattr(shell, 'call', fake_call)
+
+        assert 2 == mirrors.maintain(cache)
+
+        for path in mirrors.get_mirrors(cache):
+            assert 'git gc' in processes.get_steps(path)
+            assert os.path.exists(os.path.join(path, mirrors.MARKER))
+
+    def test_maintain_failure(self, cache, monkeypatch):
+        """Verify mirrors with a failing task are not marked as maintained."""
+        monkeypatch.setattr(settings, 'CACHE_MAINTENANCE_TASKS', ['broken'])
+        monkeypatch.setitem(mirrors.COMMANDS, 'broken',
+                            ('rev-parse', '--verify', 'missing'))
+
+        assert 0 == mirrors.maintain(cache)
+
+        for path in mirrors.get_mirrors(cache):
+            assert not os.path.exists(os.path.join(path, mirrors.MARKER))
+
+    def test_record_fetch_concurrently(self, cache, monkeypatch):
+        """Verify fetches recorded at the same time are all counted."""
+        monkeypatch.setattr(settings, 'CACHE_MAINTENANCE_INTERVAL', 1000)
+
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda _: mirrors.record_fetch(cache), range(50)))
+
+        assert 51 == mirrors.record_fetch(cache)
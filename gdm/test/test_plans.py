@@ -0,0 +1,197 @@
+# pylint: disable=no-self-use,redefined-outer-name
+
+import os
+import threading
+
+import pytest
+
+from gdm import plans, timings
+from gdm.commands import install
+from gdm.config import load
+
+
+@pytest.fixture
+def project(local_project):
+    """Create a project with two dependencies on a local remote."""
+    return local_project("- dir: demo_1\n  repo: {0}\n  rev: master\n"
+                         "  link: demo\n"
+                         "- dir: demo_2\n  repo: {0}\n  rev: master\n")
+
+
+class TestPlan:
+
+    def test_redundant_operations_are_merged(self):
+        plan = plans.Plan()
+
+        first = plan.add('mirror', 'repo', after=[('load', 'a')])
+        second = plan.add('mirror', 'repo', after=[('load', 'b')])
+
+        assert first == second
+        assert 1 == len(plan)
+        assert [('load', 'a'), ('load', 'b')] == list(plan)[0].after
+
+    def test_order(self):
+        plan = plans.Plan()
+        plan.add('checkout', 'a', after=[('mirror', 'repo')])
+        plan.add('mirror', 'repo')
+
+        assert ['mirror', 'checkout'] == [
+            operation.kind for operation in plan.get_order()]
+
+    def test_order_missing_dependency(self):
+        plan = plans.Plan()
+        plan.add('checkout', 'a', after=[('mirror', 'repo')])
+        plan.add('mirror', 'repo', after=[('checkout', 'a')])
+
+        with pytest.raises(RuntimeError):
+            plan.get_order()
+
+    def test_cost(self):
+        plan = plans.Plan()
+        plan.add('mirror', 'repo', network=None)
+        plan.add('checkout', 'a', network=100, disk=2048)
+
+        assert (100, 1) == plan.get_cost('network')
+        assert (2048, 0) == plan.get_cost('disk')
+
+
+class TestScheduling:
+
+    @pytest.fixture
+    def history(self, tmpdir):
+        history = timings.Timings(str(tmpdir))
+        history.samples.update({
+            'mirror small': [dict(seconds=1)],
+            'mirror large': [dict(seconds=60)],
+            'checkout b': [dict(seconds=30)],
+        })
+        return history
+
+    def test_longest_path_first(self, history):
+        plan = plans.Plan(timings=history)
+        plan.add('mirror', 'small')
+        plan.add('mirror', 'large')
+        plan.add('mirror', 'medium')
+        plan.add('checkout', 'b', after=[('mirror', 'medium')])
+
+        assert ['large', 'medium', 'small'] == [
+            operation.target for operation in plan.get_ready()]
+
+    def test_most_depended_on_first(self):
+        plan = plans.Plan(timings=timings.Timings('mock/cache'))
+        plan.add('mirror', 'a')
+        plan.add('mirror', 'b')
+        plan.add('checkout', 'b', after=[('mirror', 'b')])
+
+        assert ['b', 'a'] == [
+            operation.target for operation in plan.get_ready()]
+
+    def test_planned_order_without_timings(self):
+        plan = plans.Plan()
+        plan.add('mirror', 'a')
+        plan.add('mirror', 'b')
+        plan.add('checkout', 'b', after=[('mirror', 'b')])
+
+        assert ['a', 'b'] == [
+            operation.target for operation in plan.get_ready()]
+
+    def test_pooled_exclusive_operations(self):
+        """Verify only one operation changing directories runs at a time."""
+        lock = threading.Lock()
+        overlaps = []
+
+        def action():
+            if not lock.acquire(blocking=False):
+                overlaps.append(True)
+                return
+            threading.Event().wait(0.01)
+            lock.release()
+
+        plan = plans.Plan()
+        for name in 'abcd':
+            plan.add('checkout', name, action, exclusive=True)
+        plans.PooledExecutor(jobs=4).run(plan)
+
+        assert not overlaps
+        assert all(operation.state == 'done' for operation in plan)
+
+
+class TestPlanDeps:
+
+    def test_preview(self, project, processes, capsys):
+        """Verify a plan is shown without running anything."""
+        plan = load(str(project), writable=False).plan_deps(preview=True)
+        plan.show()
+
+        assert 0 == processes.total
+        assert not project.join('deps').check()
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[0].startswith("6 operation(s), estimated network: ")
+        assert lines[1].endswith("(create) [network: ?] [disk: ?]")
+        assert "checkout {} (clone, @ master)".format(
+            project.join('deps', 'demo_1')) in lines[2]
+        assert 1 == sum(1 for line in lines if ' mirror ' in line)
+
+    def test_existing_dependencies_are_not_mirrored(self, project):
+        config = load(str(project), writable=False)
+        config.plan_deps().execute()
+
+        plan = config.plan_deps(fetch=True)
+
+        assert ['checkout', 'link', 'load', 'checkout', 'load'] == [
+            operation.kind for operation in plan]
+        assert None is list(plan)[0].network
+
+    @pytest.mark.parametrize('executor', [plans.SerialExecutor(),
+                                          plans.PooledExecutor(jobs=2)])
+    def test_execute(self, project, executor):
+        plan = load(str(project), writable=False).plan_deps()
+
+        assert 2 == plan.execute(executor)
+
+        assert os.path.isdir(str(project.join('deps', 'demo_1', '.git')))
+        assert os.path.isdir(str(project.join('deps', 'demo_2', '.git')))
+        assert os.path.islink(str(project.join('demo')))
+        assert all(operation.state == 'done' for operation in plan)
+
+    def test_execute_records_timings(self, project, tmpdir):
+        history = timings.Timings(str(tmpdir.join('cache')))
+        plan = load(str(project), writable=False).plan_deps(
+            plan=plans.Plan(timings=history))
+
+        plan.execute()
+
+        samples = timings.Timings(str(tmpdir.join('cache'))).samples
+        path = str(project.join('deps', 'demo_1'))
+        assert 'git clone' in samples['checkout ' + path][0]['steps']
+        mirror = samples['mirror ' + list(plan)[0].target]
+        assert 'git clone' in mirror[0]['steps']
+
+    def test_unchanged_are_not_timed(self, project, tmpdir):
+        """Verify checkouts already at their revision are not recorded."""
+        config = load(str(project), writable=False)
+        config.plan_deps().execute()
+        history = timings.Timings(str(tmpdir.join('cache')))
+        plan = config.plan_deps(plan=plans.Plan(timings=history))
+
+        plan.execute()
+
+        assert not any(operation.changed for operation in plan)
+        assert {} == timings.Timings(str(tmpdir.join('cache'))).samples
+
+    def test_missing_names(self, project):
+        plan = load(str(project), writable=False).plan_deps('foobar')
+
+        assert ['foobar'] == plan.missing
+        assert 0 == len(plan)
+
+    def test_removed_links_are_deleted(self, project):
+        """Verify links removed from the configuration are deleted."""
+        assert install()
+        assert project.join('demo').islink()
+        text = project.join('gdm.yml').read()
+        project.join('gdm.yml').write(text.replace("  link: demo\n", ""))
+
+        assert install()
+
+        assert not os.path.lexists(str(project.join('demo')))
@@ -18,7 +18,9 @@ class TestMain:
 
         assert [
             call.install(root=None, depth=None,
-                         clean=False, fetch=True, force=False),
+                         clean=None, mode=None, staged=False, fetch=True,
+                         force=False, prune=False, bundle=None, watch=False,
+                         plan=False, jobs=None, roots=None),
             call.install().__bool__(),  # command status check
         ] == mock_commands.mock_calls
 
@@ -31,7 +33,8 @@ class TestMain:
 
         assert [
             call.update(root=None, depth=None,
-                        clean=True, force=False, recurse=False, lock=True),
+                        clean=True, mode=None, staged=False, force=False,
+                        recurse=False, lock=True),
             call.update().__bool__(),  # command status check
         ] == mock_commands.mock_calls
 
@@ -44,7 +47,8 @@ class TestMain:
 
         assert [
             call.update(root=None, depth=None,
-                        clean=False, force=False, recurse=True, lock=True),
+                        clean=None, mode=None, staged=False, force=False,
+                        recurse=True, lock=True),
             call.update().__bool__(),  # command status check
         ] == mock_commands.mock_calls
 
@@ -57,7 +61,8 @@ class TestMain:
 
         assert [
             call.update(root=None, depth=None,
-                        clean=False, force=False, recurse=False, lock=False),
+                        clean=None, mode=None, staged=False, force=False,
+                        recurse=False, lock=False),
             call.update().__bool__(),  # command status check
         ] == mock_commands.mock_calls
 
@@ -70,7 +75,7 @@ class TestMain:
 
         assert [
             call.display(root=None, depth=None,
-                         allow_dirty=True),
+                         allow_dirty=True, format=None, jobs=None),
             call.display().__bool__(),  # command status check
         ] == mock_commands.mock_calls
 
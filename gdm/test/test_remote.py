@@ -0,0 +1,175 @@
+# pylint: disable=no-self-use,redefined-outer-name
+
+import os
+import subprocess
+
+import pytest
+
+from gdm import git, settings
+from gdm.commands import install
+from gdm.exceptions import ShellError
+
+from .remote import HOST
+
+
+@pytest.fixture
+def no_delay(monkeypatch):
+    monkeypatch.setattr(settings, 'NETWORK_RETRY_DELAY', 0)
+
+
+def write_project(root, *repos):
+    """Create a project depending on each repository."""
+    root.join('.git').write("")
+    root.join('gdm.yml').write("location: deps\nsources:\n" + ''.join(
+        "- dir: dep_{}\n  repo: {}\n".format(index, repo)
+        for index, repo in enumerate(repos, start=1)))
+    return str(root)
+
+
+def overlaps(connections):
+    """Count connections that started before the previous one finished."""
+    connections = sorted(connections, key=lambda record: record['start'])
+    return sum(1 for first, second in zip(connections, connections[1:])
+               if second['start'] < first['start'] + first['seconds'])
+
+
+class TestRemote:
+
+    def test_clone(self, remote, tmpdir):
+        """Verify repositories are served through the simulated network."""
+        url = remote.create('demo')
+
+        subprocess.check_call(['git', 'clone', '--quiet', url,
+                               str(tmpdir.join('demo'))])
+
+        assert url.startswith('ssh://' + HOST + '/')
+        assert [False] == [record['failed'] for record in remote.connections]
+
+    def test_latency_and_bandwidth(self, remote, tmpdir):
+        """Verify transfers are delayed and throttled."""
+        url = remote.create('demo', files={'data': os.urandom(50000)})
+        remote.latency = 0.1
+        remote.bandwidth = 250000
+        remote.save()
+
+        subprocess.check_call(['git', 'clone', '--quiet', url,
+                               str(tmpdir.join('demo'))])
+
+        record = remote.connections[0]
+        assert 50000 < record['bytes']
+        assert 0.1 + record['bytes'] / 250000 < record['seconds']
+
+    @pytest.mark.parametrize('failure', ['reset', 'drop'])
+    def test_failures(self, remote, tmpdir, failure):
+        """Verify connections can be made to fail."""
+        url = remote.create('demo', files={'data': os.urandom(50000)})
+        remote.failures = 1
+        remote.failure = failure
+        remote.save()
+
+        with pytest.raises(subprocess.CalledProcessError):
+            subprocess.check_call(['git', 'clone', '--quiet', url,
+                                   str(tmpdir.join('demo'))])
+        subprocess.check_call(['git', 'clone', '--quiet', url,
+                               str(tmpdir.join('demo'))])
+
+        assert [failure, False] == [
+            record['failed'] for record in remote.connections]
+
+    def test_failure_rate(self, remote):
+        """Verify random failures can be repeated with a seed."""
+        url = remote.create('demo')
+        remote.failure_rate = 0.5
+        remote.seed = 42
+        remote.save()
+
+        results = []
+        for _ in range(2):
+            remote.reset()
+            for _ in range(10):
+                subprocess.call(['git', 'ls-remote', url],
+                                stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL)
+            results.append([record['failed'] for record in
+                            remote.connections])
+
+        assert results[0] == results[1]
+        assert 0 < results[0].count('reset') < 10
+
+
+@pytest.mark.usefixtures('no_delay')
+class TestRetries:
+
+    @pytest.mark.parametrize('failure', ['reset', 'drop'])
+    def test_transient_failures(self, remote, tmpdir, failure):
+        """Verify clones succeed after transient failures."""
+        url = remote.create('demo', files={'data': os.urandom(50000)})
+        remote.failures = 2
+        remote.failure = failure
+        remote.save()
+
+        git.clone(url, str(tmpdir.join('demo')))
+
+        assert [failure, failure, False, False] == [
+            record['failed'] for record in remote.connections]
+        assert tmpdir.join('demo', 'data').check()
+
+    def test_missing_repository(self, remote, tmpdir):
+        """Verify missing repositories are not retried."""
+        remote.create('demo')
+
+        with pytest.raises(ShellError):
+            git.clone(remote.get_url('missing'), str(tmpdir.join('demo')))
+
+        assert 1 == len(remote.connections)
+
+    def test_attempts(self, remote, tmpdir, monkeypatch):
+        """Verify failures are raised once the attempts are used up."""
+        monkeypatch.setattr(settings, 'NETWORK_ATTEMPTS', 2)
+        url = remote.create('demo')
+        remote.failures = 2
+        remote.save()
+
+        with pytest.raises(ShellError):
+            git.clone(url, str(tmpdir.join('demo')))
+
+        assert 2 == len(remote.connections)
+
+
+class TestConcurrency:
+
+    @pytest.mark.parametrize('host_jobs,expected', [(1, 0), (3, 2)])
+    def test_host_jobs(self, remote, tmpdir, monkeypatch, host_jobs,
+                       expected):
+        """Verify concurrent transfers from a host are limited."""
+        monkeypatch.setattr(settings, 'NETWORK_HOST_JOBS', host_jobs)
+        monkeypatch.setattr(git, '_hosts', {})
+        root = write_project(tmpdir.mkdir('project'), *(
+            remote.create('demo_{}'.format(index)) for index in range(3)))
+        remote.latency = 0.2
+        remote.save()
+
+        assert install(root=root, jobs=3)
+
+        mirrors = [record for record in remote.connections
+                   if record['index'] < 3]
+        assert expected == overlaps(mirrors)
+
+    def test_projects_share_fetches(self, remote, tmpdir):
+        """Verify each repository is fetched once for several projects."""
+        url = remote.create('demo')
+        roots = [write_project(tmpdir.mkdir(name), url)
+                 for name in ('project_1', 'project_2')]
+        assert install(roots=roots)
+        remote.commit('demo', "Change")
+        remote.reset()
+
+        assert install(roots=roots, fetch=True)
+
+        assert 1 == len(remote.connections)
+        latest = subprocess.check_output(
+            ['git', 'rev-parse', 'master'], cwd=remote.get_path('demo'),
+            universal_newlines=True).strip()
+        for root in roots:
+            assert latest == git.read_head(os.path.join(root, 'deps',
+                                                        'dep_1'))
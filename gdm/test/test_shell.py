@@ -73,3 +73,112 @@ class TestPrograms:
         """Verify the commands to delete files/folders."""
         shell.rm('mock/dir/path')
         assert_calls(mock_call, ["rm -rf mock/dir/path"])
+
+
+class TestStats:
+
+    """Tests for counting spawned programs."""
+
+    def test_record(self, processes):
+        """Verify spawned programs are counted."""
+        shell.call('echo', 'Hello, world!', _capture=True)
+        shell.call('cd', '.')
+
+        assert 1 == processes.total
+        assert 1 == processes.programs['echo']
+
+    def test_scope(self, processes):
+        """Verify spawned programs are attributed to commands and sources."""
+        with processes.scope(command='install'):
+            processes.record('git')
+            with processes.scope(source='dep_1'):
+                processes.record('git')
+                processes.record('git')
+            processes.record('ln')
+
+        assert 4 == processes.total
+        assert 4 == processes.commands['install']
+        assert 2 == processes.sources['dep_1']
+        assert {'git': 3, 'ln': 1} == processes.programs
+
+    def test_steps(self, processes):
+        """Verify the time spent in each step is attributed to sources."""
+        with processes.scope(source='dep_1'):
+            shell.call('git', '--version', _capture=True)
+            shell.call('git', '--no-pager', 'version', _capture=True)
+        shell.call('echo', 'Hello, world!', _capture=True)
+
+        steps = processes.get_steps('dep_1')
+        assert ['git', 'git version'] == sorted(steps)
+        assert 0 < processes.seconds[None, 'echo']
+
+    def test_reset(self, processes):
+        """Verify counts can be cleared."""
+        processes.record('git')
+        processes.reset()
+
+        assert 0 == processes.total
+        assert {} == processes.sources
+
+
+class TestTrash:
+
+    """Tests for deleting directories in the background."""
+
+    def test_trash(self, tmpdir):
+        """Verify a directory is moved aside before being deleted."""
+        tmpdir.mkdir('deps').mkdir('dep_1')
+
+        tombstone = shell.trash(str(tmpdir.join('deps')))
+
+        assert not tmpdir.join('deps').exists()
+        assert tombstone.startswith(str(tmpdir.join(shell.TRASH_PREFIX)))
+
+    def test_trash_missing(self, tmpdir):
+        """Verify a missing directory is ignored."""
+        assert None is shell.trash(str(tmpdir.join('deps')))
+
+    def test_empty_trash(self, tmpdir):
+        """Verify leftover directories are deleted."""
+        tmpdir.mkdir(shell.TRASH_PREFIX + 'abc').mkdir('deps')
+        tmpdir.mkdir('deps')
+
+        assert 1 == shell.empty_trash(str(tmpdir))
+
+        assert ['deps'] == [path.basename for path in tmpdir.listdir()]
+
+
+class TestSwap:
+
+    """Tests for moving directories into place."""
+
+    def test_swap(self, tmpdir):
+        """Verify an existing directory is exchanged with a new one."""
+        tmpdir.mkdir('new').join('file').write("new")
+        tmpdir.mkdir('deps').join('file').write("old")
+
+        shell.swap(str(tmpdir.join('new')), str(tmpdir.join('deps')))
+
+        assert "new" == tmpdir.join('deps', 'file').read()
+        assert "old" == tmpdir.join('new', 'file').read()
+
+    @patch('gdm.shell._exchange', Mock(return_value=False))
+    def test_swap_without_exchange(self, tmpdir):
+        """Verify directories are swapped by renames when not supported."""
+        tmpdir.mkdir('new').join('file').write("new")
+        tmpdir.mkdir('deps').join('file').write("old")
+
+        shell.swap(str(tmpdir.join('new')), str(tmpdir.join('deps')))
+
+        assert "new" == tmpdir.join('deps', 'file').read()
+        assert "old" == tmpdir.join('new', 'file').read()
+        assert ['deps', 'new'] == sorted(
+            path.basename for path in tmpdir.listdir())
+
+    def test_swap_missing(self, tmpdir):
+        """Verify a directory is moved into place if nothing is there."""
+        tmpdir.mkdir('new')
+
+        shell.swap(str(tmpdir.join('new')), str(tmpdir.join('deps')))
+
+        assert ['deps'] == [path.basename for path in tmpdir.listdir()]
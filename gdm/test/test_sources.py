@@ -1,11 +1,15 @@
 # pylint: disable=no-self-use,redefined-outer-name
 
+import os
+import subprocess
 from unittest.mock import patch, Mock
 from copy import copy
 
 import pytest
 
+from gdm import settings, exports, shell, git as _git
 from gdm.config import Source
+from gdm.exceptions import ShellError, UncommittedChanges
 
 
 @pytest.fixture
@@ -36,6 +40,12 @@ class TestSource:
 
         assert 'mock/link' == source.link
 
+    def test_init_clean(self):
+        """Verify the clean policy can be set."""
+        source = Source('http://mock.git', 'mock_dir', clean='untracked')
+
+        assert 'untracked' == source.clean
+
     def test_init_error(self):
         """Verify the repository and directory are required."""
         with pytest.raises(ValueError):
@@ -43,6 +53,11 @@ class TestSource:
         with pytest.raises(ValueError):
             Source('http://mock.git', '')
 
+    def test_init_mode_error(self):
+        """Verify only known installation modes are accepted."""
+        with pytest.raises(ValueError):
+            Source('http://mock.git', 'mock_dir', mode='copy')
+
     def test_repr(self, source):
         """Verify sources can be represented."""
         assert "<source 'repo' @ 'rev' in 'name' <- 'link'>" == repr(source)
@@ -77,6 +92,18 @@ class TestSource:
         with patch('os.path.isdir', Mock(return_value=False)):
             assert (str(tmpdir), '<missing>', '<unknown>') == source.identify()
 
+    def test_identify_export(self, source, tmpdir):
+        """Verify an exported source is identified by its metadata."""
+        tmpdir.chdir()
+        tmpdir.mkdir('name').join(exports.METADATA).write(
+            "repo: http://mock.git\nsha: abc123\ntree: def456\n")
+
+        with patch('gdm.source.git') as git:
+            assert (str(tmpdir.join('name')), 'http://mock.git', 'abc123') == \
+                source.identify()
+
+        assert not git.mock_calls
+
     def test_lock_uses_the_identity_rev(self, source):
         source.identify = Mock(return_value=('path2', 'dir2', 'abc123'))
 
@@ -84,3 +111,258 @@ class TestSource:
 
         assert 'abc123' == source2.rev
         assert 'name' == source2.dir
+
+    def test_lock_keeps_the_clean_policy(self, source):
+        source.clean = 'build/'
+        source.identify = Mock(return_value=('path2', 'dir2', 'abc123'))
+
+        source2 = source.lock()
+
+        assert 'build/' == source2.clean
+
+
+class TestUpdateFiles:
+
+    @pytest.fixture
+    def git(self):
+        with patch('gdm.source.shell'), patch('gdm.source.os.path.exists',
+                                              Mock(return_value=True)):
+            with patch('gdm.source.git') as git:
+                git.changes.return_value = False
+                git.get_branch.return_value = 'rev'
+                yield git
+
+    @pytest.fixture
+    def new_git(self, git):
+        with patch('gdm.source.os.path.exists', Mock(return_value=False)):
+            git.get_index_size.return_value = 0
+            yield git
+
+    def test_default_policy(self, source, git):
+        """Verify sources are not cleaned by default."""
+        source.update_files()
+
+        git.changes.assert_called_once_with(include_untracked=False)
+        git.update.assert_called_once_with('rev', fetch=False, clean='none')
+
+    def test_source_policy(self, source, git):
+        """Verify a source's own policy is used."""
+        source.clean = 'build/, *.so'
+
+        source.update_files()
+
+        git.changes.assert_called_once_with(include_untracked=True)
+        git.update.assert_called_once_with('rev', fetch=False,
+                                           clean=['build/', '*.so'])
+
+    def test_run_policy(self, source, git):
+        """Verify a policy for the run overrides the source's policy."""
+        source.clean = 'untracked'
+
+        source.update_files(clean=True)
+
+        git.update.assert_called_once_with('rev', fetch=False, clean='full')
+
+    def test_large_detected(self, source, new_git):
+        """Verify large working trees are configured after cloning."""
+        new_git.get_index_size.return_value = settings.LARGE_TREE_INDEX_SIZE
+
+        source.update_files()
+
+        new_git.clone.assert_called_once_with('repo', 'name', config=())
+        new_git.configure.assert_called_once_with(settings.LARGE_TREE_CONFIG)
+        assert new_git.write_commit_graph.called
+
+    def test_large_small(self, source, new_git):
+        """Verify small working trees keep the default configuration."""
+        source.update_files()
+
+        assert not new_git.configure.called
+        assert not new_git.write_commit_graph.called
+
+    def test_large_enabled(self, source, new_git):
+        """Verify a source can be configured as large when cloned."""
+        source.large = 'fsmonitor'
+
+        source.update_files()
+
+        config = settings.LARGE_TREE_CONFIG + \
+            settings.LARGE_TREE_FSMONITOR_CONFIG
+        new_git.clone.assert_called_once_with('repo', 'name', config=config)
+        assert not new_git.get_index_size.called
+        assert new_git.write_commit_graph.called
+
+    def test_large_disabled(self, source, new_git):
+        """Verify detection can be disabled."""
+        source.large = 'no'
+        new_git.get_index_size.return_value = settings.LARGE_TREE_INDEX_SIZE
+
+        source.update_files()
+
+        assert not new_git.configure.called
+        assert not new_git.write_commit_graph.called
+
+    def test_export_mode(self, source, git):
+        """Verify an exported source is not cloned."""
+        source.mode = 'export'
+
+        with patch('gdm.source.exports') as mock_exports:
+            source.update_files(force=True)
+
+        mock_exports.update.assert_called_once_with('repo', 'rev', 'name',
+                                                    force=True, fetch=False)
+        assert not git.mock_calls
+
+    @pytest.mark.usefixtures('git')
+    def test_run_mode(self, source):
+        """Verify a mode for the run overrides the source's mode."""
+        with patch('gdm.source.exports') as mock_exports:
+            source.update_files(mode='export')
+
+        assert mock_exports.update.called
+
+
+class TestStaged:
+
+    @pytest.fixture
+    def project(self, local_project):
+        return local_project("")
+
+    @pytest.fixture
+    def installed(self, project, tmpdir):
+        """Clone a dependency and add a commit to its remote."""
+        source = Source('file://' + str(tmpdir.join('remote', 'demo.git')),
+                        'demo')
+        project.mkdir('deps').chdir()
+        source.update_files()
+        project.join('deps').chdir()
+        subprocess.check_call(
+            ['git', '-c', 'user.name=gdm', '-c', 'user.email=gdm@localhost',
+             'commit', '--quiet', '--allow-empty', '-m', 'Second'],
+            cwd=str(tmpdir.join('source')))
+        subprocess.check_call(['git', 'push', '--quiet', '../remote/demo.git',
+                               'master'], cwd=str(tmpdir.join('source')))
+        return source
+
+    def test_swap(self, installed, project):
+        """Verify a changed dependency is replaced by a new working tree."""
+        path = str(project.join('deps', 'demo'))
+        before = os.stat(path).st_ino
+        with open(os.path.join(path, '.git', 'HEAD')) as stream:
+            installed.update_files(fetch=True, staged=True)
+            assert stream.read().startswith("ref: ")
+
+        assert path == os.getcwd()
+        assert before != os.stat(path).st_ino
+        assert _git.read_head(path) == _git.get_commit('origin/master')
+        assert ['demo'] == [name for name in os.listdir(str(project.join(
+            'deps'))) if not name.startswith(shell.TRASH_PREFIX)]
+
+    def test_unchanged(self, installed, project):
+        """Verify a dependency already at its revision is updated in place."""
+        path = str(project.join('deps', 'demo'))
+        before = os.stat(path).st_ino
+
+        installed.update_files(staged=True)
+
+        assert before == os.stat(path).st_ino
+
+    def test_uncommitted_changes(self, installed, project):
+        """Verify modified dependencies are not replaced."""
+        project.join('deps', 'demo', 'file').write("changes")
+
+        with pytest.raises(UncommittedChanges):
+            installed.update_files(fetch=True, clean='untracked',
+                                   staged=True)
+
+        assert project.join('deps', 'demo', 'file').check()
+
+    def test_untracked_files_are_kept(self, installed, project):
+        """Verify untracked and ignored files are moved to the new tree."""
+        path = project.join('deps', 'demo')
+        path.join('.git', 'info', 'exclude').write("*.o\n", ensure=True)
+        path.join('notes.txt').write("notes")
+        path.join('build', 'main.o').write("binary", ensure=True)
+
+        installed.update_files(fetch=True, staged=True)
+
+        assert _git.read_head(str(path)) == _git.get_commit('origin/master')
+        assert "notes" == path.join('notes.txt').read()
+        assert "binary" == path.join('build', 'main.o').read()
+
+    def test_untracked_files_are_not_replaced(self, installed, project,
+                                              tmpdir):
+        """Verify a swap that would replace untracked files is refused."""
+        source = tmpdir.join('source')
+        source.join('notes.txt').write("added")
+        subprocess.check_call(['git', 'add', 'notes.txt'], cwd=str(source))
+        subprocess.check_call(
+            ['git', '-c', 'user.name=gdm', '-c', 'user.email=gdm@localhost',
+             'commit', '--quiet', '-m', 'Third'], cwd=str(source))
+        subprocess.check_call(['git', 'push', '--quiet', '../remote/demo.git',
+                               'master'], cwd=str(source))
+        path = project.join('deps', 'demo')
+        path.join('notes.txt').write("notes")
+
+        with pytest.raises(UncommittedChanges):
+            installed.update_files(fetch=True, staged=True)
+
+        assert "notes" == path.join('notes.txt').read()
+
+    def test_untracked_files_are_cleaned(self, installed, project):
+        """Verify only ignored files are kept when cleaning untracked."""
+        path = project.join('deps', 'demo')
+        path.join('.git', 'info', 'exclude').write("*.o\n", ensure=True)
+        path.join('notes.txt').write("notes")
+        path.join('main.o').write("binary")
+
+        installed.update_files(fetch=True, clean='untracked', force=True,
+                               staged=True)
+
+        assert not path.join('notes.txt').check()
+        assert path.join('main.o').check()
+
+
+class TestUpdateFilesInMemory:
+
+    """Tests for updating sources without running Git."""
+
+    SHA_1 = 'a' * 40
+    SHA_2 = 'b' * 40
+
+    @pytest.fixture
+    def remote(self, fake_git, tmpdir):
+        fake_git.add('mock.git', branches={'master': self.SHA_1},
+                     tags={'v1': self.SHA_1})
+        tmpdir.chdir()
+        return fake_git
+
+    def test_clone_and_update(self, remote, tmpdir, processes):
+        """Verify a source is cloned and later updated to a branch."""
+        source = Source('mock.git', 'name', rev='v1')
+        source.update_files()
+
+        assert (self.SHA_1, 'v1') == (_git.get_hash(), _git.get_tag())
+
+        remote.add('mock.git', branches={'master': self.SHA_2})
+        source.rev = 'master'
+        tmpdir.chdir()
+        source.update_files(fetch=True)
+
+        assert (self.SHA_2, 'master') == (_git.get_hash(),
+                                          _git.get_branch())
+        assert 0 == processes.total
+
+    def test_uncommitted_changes(self, remote, tmpdir):
+        source = Source('mock.git', 'name')
+        source.update_files()
+        remote.trees[str(tmpdir.join('name'))]['dirty'] = True
+        tmpdir.chdir()
+
+        with pytest.raises(UncommittedChanges):
+            source.update_files()
+
+    @pytest.mark.usefixtures('remote')
+    def test_missing_repository(self):
+        with pytest.raises(ShellError):
+            Source('other.git', 'name').update_files()
@@ -0,0 +1,70 @@
+# pylint: disable=no-self-use,redefined-outer-name
+
+import pytest
+
+from gdm import timings, settings
+from gdm.plans import Operation
+
+
+@pytest.fixture
+def history(tmpdir):
+    return timings.Timings(str(tmpdir))
+
+
+def run(kind, target, seconds, changed=True, **kwargs):
+    operation = Operation(kind, target, **kwargs)
+    operation.seconds = seconds
+    operation.changed = changed
+    return operation
+
+
+class TestTimings:
+
+    def test_median(self, history):
+        history.record([run('checkout', 'a', seconds) for seconds in (3, 1, 2)])
+
+        assert 2 == history.get_median(Operation('checkout', 'a'))
+        assert None is history.get_median(Operation('checkout', 'b'))
+
+    def test_only_recent_samples_are_kept(self, history):
+        for seconds in range(settings.TIMINGS_SAMPLES + 5):
+            history.record([run('mirror', 'repo', seconds)])
+
+        assert settings.TIMINGS_SAMPLES == len(history.samples['mirror repo'])
+
+    def test_links_are_not_timed(self, history):
+        history.record([run('link', 'a -> b', 0.1)])
+
+        assert {} == history.samples
+
+    def test_unchanged_are_not_timed(self, history):
+        """Verify operations that did no work do not lower the median."""
+        history.record([run('checkout', 'a', 2)])
+
+        history.record([run('checkout', 'a', 0.1, changed=False)])
+
+        assert [dict(seconds=2)] == history.samples['checkout a']
+
+    def test_save(self, history, tmpdir):
+        operation = run('checkout', 'a', 1.5, disk=1024)
+        operation.steps = {'git clone': 1.25}
+        history.record([operation])
+        history.save()
+
+        samples = timings.Timings(str(tmpdir)).samples
+
+        assert [dict(seconds=1.5, bytes=1024,
+                     steps={'git clone': 1.25})] == samples['checkout a']
+
+    def test_invalid_file(self, history, tmpdir):
+        tmpdir.join(settings.TIMINGS).write("{")
+
+        assert {} == history.samples
+
+    def test_regressions(self, history):
+        history.record([run('checkout', 'a', 1) for _ in range(3)])
+
+        slower = run('checkout', 'a', 5)
+        similar = run('checkout', 'a', 1.5)
+
+        assert [slower] == history.record([slower, similar])
@@ -0,0 +1,140 @@
+# pylint: disable=no-self-use,redefined-outer-name
+
+import os
+import subprocess
+from unittest.mock import patch
+
+import pytest
+
+from gdm import watcher
+from gdm.config import Source
+
+
+@pytest.fixture
+def project(local_project):
+    """Create a project with one dependency installed from a local remote."""
+    root = local_project("- dir: demo_1\n  repo: {0}\n  link: demo\n")
+    subprocess.check_call(['git', 'clone', '--quiet', local_project.url,
+                           str(root.join('deps', 'demo_1'))])
+    os.symlink(os.path.join('deps', 'demo_1'), str(root.join('demo')))
+    return root, local_project.url
+
+
+def write(root, repo, sources):
+    text = "location: deps\nsources:\n" + sources.format(repo)
+    path = str(root.join('gdm.yml'))
+    with open(path, 'w') as stream:
+        stream.write(text)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+
+class TestDiff:
+
+    def test_changes(self):
+        """Verify sources are compared by directory."""
+        old = [Source('repo', 'a'), Source('repo', 'b'),
+               Source('repo', 'c', link='c'), Source('repo', 'd')]
+        new = [Source('repo', 'b', rev='develop'), Source('repo', 'c'),
+               Source('repo', 'd'), Source('repo', 'e')]
+
+        changes = watcher.diff(old, new)
+
+        assert (['e'], ['a'], ['b'], ['c']) == changes
+
+    def test_no_changes(self):
+        assert not any(watcher.diff([Source('repo', 'a')],
+                                    [Source('repo', 'a')]))
+
+
+class TestApply:
+
+    def test_unchanged(self, project, processes):
+        root, _ = project
+        state = watcher.scan(str(root))
+
+        assert 0 == watcher.apply(str(root), state)[1]
+
+        assert 0 == processes.total
+
+    def test_added(self, project):
+        """Verify only the added source is installed."""
+        root, repo = project
+        state = watcher.scan(str(root))
+        inode = os.stat(str(root.join('deps', 'demo_1'))).st_ino
+        write(root, repo, "- dir: demo_1\n  repo: {0}\n  link: demo\n"
+                          "- dir: demo_2\n  repo: {0}\n")
+
+        state, count = watcher.apply(str(root), state)
+
+        assert 1 == count
+        assert ['demo_1', 'demo_2'] == sorted(
+            path.basename for path in root.join('deps').listdir())
+        assert inode == os.stat(str(root.join('deps', 'demo_1'))).st_ino
+        assert 2 == len(state[str(root)][1])
+
+    def test_removed(self, project):
+        """Verify a removed source is deleted along with its link."""
+        root, repo = project
+        state = watcher.scan(str(root))
+        write(root, repo, "")
+
+        assert 1 == watcher.apply(str(root), state)[1]
+
+        assert not os.path.exists(str(root.join('deps', 'demo_1')))
+        assert not os.path.lexists(str(root.join('demo')))
+
+    def test_relinked(self, project, processes):
+        """Verify only the link is changed."""
+        root, repo = project
+        state = watcher.scan(str(root))
+        write(root, repo, "- dir: demo_1\n  repo: {0}\n  link: lib/demo\n")
+
+        assert 1 == watcher.apply(str(root), state)[1]
+
+        assert not os.path.lexists(str(root.join('demo')))
+        assert os.path.islink(str(root.join('lib', 'demo')))
+        assert 0 == processes.total
+
+
+class TestRun:
+
+    def test_changes_are_applied_once_settled(self, project):
+        root, repo = project
+        changes = [
+            lambda: write(root, repo,
+                          "- dir: demo_1\n  repo: {0}\n  link: lib/demo\n"),
+            lambda: None,  # debounce
+        ]
+
+        def sleep(_):
+            if not changes:
+                raise KeyboardInterrupt
+            changes.pop(0)()
+
+        with patch('gdm.watcher.time.sleep', sleep):
+            assert 1 == watcher.run(str(root))
+
+        assert os.path.islink(str(root.join('lib', 'demo')))
+
+    def test_invalid_configuration_is_retried(self, project):
+        """Verify a partially saved file is skipped until it can be parsed."""
+        root, repo = project
+        changes = [
+            lambda: write(root, repo, "- dir: demo_1\n  repo: [\n"),
+            lambda: None,  # debounce
+            lambda: None,  # still invalid
+            lambda: write(root, repo,
+                          "- dir: demo_1\n  repo: {0}\n  link: lib/demo\n"),
+            lambda: None,  # debounce
+        ]
+
+        def sleep(_):
+            if not changes:
+                raise KeyboardInterrupt
+            changes.pop(0)()
+
+        with patch('gdm.watcher.time.sleep', sleep):
+            assert 1 == watcher.run(str(root))
+
+        assert os.path.islink(str(root.join('lib', 'demo')))
@@ -0,0 +1,101 @@
+"""Local history of how long each operation takes to install dependencies."""
+
+import os
+import json
+import logging
+import statistics
+
+from . import common
+from . import mirrors
+from . import settings
+
+KINDS = ('mirror', 'checkout')  # operations worth timing
+
+log = logging.getLogger(__name__)
+
+
+class Timings:
+    """Recent durations of each operation, stored in the cache.
+
+    Each sample has the operation's `seconds`, its estimated `bytes` (when
+    known), and the seconds spent in each `steps` (e.g. 'git fetch').
+
+    """
+
+    def __init__(self, cache=None):
+        self.path = os.path.join(mirrors.get_cache(cache), settings.TIMINGS)
+        self._samples = None
+
+    @property
+    def samples(self):
+        """Get the samples of each operation, reading the file once."""
+        if self._samples is None:
+            self._samples = _read(self.path)
+        return self._samples
+
+    def get_median(self, operation):
+        """Get the median seconds of an operation's previous runs or None."""
+        samples = self.samples.get(_get_key(operation))
+        if not samples:
+            return None
+        return statistics.median(sample['seconds'] for sample in samples)
+
+    def record(self, operations):
+        """Add samples for the timed operations and report regressions.
+
+        Only operations that `changed` something are timed, so those
+        skipped or already up to date do not lower the medians. Returns the
+        operations that took much longer than their median.
+
+        """
+        regressions = []
+        for operation in operations:
+            if operation.kind not in KINDS or operation.seconds is None or \
+                    not operation.changed:
+                continue
+            key = _get_key(operation)
+            samples = self.samples.setdefault(key, [])
+            if len(samples) >= settings.TIMINGS_MIN_SAMPLES:
+                median = self.get_median(operation)
+                if operation.seconds > median * settings.TIMINGS_REGRESSION \
+                        and operation.seconds - median >= \
+                        settings.TIMINGS_REGRESSION_SECONDS:
+                    log.warning("Slower than usual: %s took %.1f s "
+                                "(median %.1f s)",
+                                operation, operation.seconds, median)
+                    regressions.append(operation)
+
+            sample = dict(seconds=round(operation.seconds, 3))
+            if operation.disk:
+                sample['bytes'] = operation.disk
+            if operation.steps:
+                sample['steps'] = {step: round(seconds, 3) for step, seconds
+                                   in operation.steps.items()}
+            samples.append(sample)
+            del samples[:-settings.TIMINGS_SAMPLES]
+        return regressions
+
+    def save(self):
+        """Write the history if it was read or changed."""
+        if self._samples is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        text = json.dumps(self._samples, indent=1, sort_keys=True)
+        common.write_atomic(self.path, text + '\n')
+        log.debug("Saved timings: %s", self.path)
+
+
+def _get_key(operation):
+    return "{} {}".format(operation.kind, operation.target)
+
+
+def _read(path):
+    try:
+        with open(path) as stream:
+            data = json.load(stream)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as exc:
+        log.warning("Ignored invalid timings: %s: %s", path, exc)
+        return {}
+    return data if isinstance(data, dict) else {}
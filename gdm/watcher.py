@@ -0,0 +1,208 @@
+"""Utilities to reinstall only what changes in configuration files."""
+
+import os
+import time
+import logging
+from collections import namedtuple
+
+import yaml
+
+from . import common
+from . import shell
+from . import settings
+from .links import Links
+from .config import load
+from .exceptions import InvalidConfig
+
+Changes = namedtuple('Changes', ['added', 'removed', 'updated', 'relinked'])
+INVALID = 'invalid'  # stamp of a configuration file that cannot be parsed
+ERRORS = (RuntimeError, InvalidConfig, yaml.YAMLError)  # retried on change
+
+log = logging.getLogger(__name__)
+
+
+def diff(old, new):
+    """Compare two sequences of sources by their directory names.
+
+    A source is `updated` when anything but its link differs, and
+    `relinked` when only its link differs.
+
+    """
+    old = {source.dir: source for source in old}
+    new = {source.dir: source for source in new}
+    added = [name for name in new if name not in old]
+    removed = [name for name in old if name not in new]
+    updated = []
+    relinked = []
+    for name in new:
+        if name not in old:
+            continue
+        if _get_key(old[name]) != _get_key(new[name]):
+            updated.append(name)
+        elif (old[name].link or '') != (new[name].link or ''):
+            relinked.append(name)
+    return Changes(added, removed, updated, relinked)
+
+
+def scan(root):
+    """Get the sources of the project's and installed dependencies' configs.
+
+    Returns a dictionary of each configuration's root directory to its
+    file's modification stamp and the sources `install` would use.
+
+    """
+    state = {}
+    pending = [root]
+    while pending:
+        path = pending.pop()
+        config = load(path, writable=False)
+        if not config:
+            continue
+        sources = _get_sources(config)
+        state[path] = _get_stamp(config.path), sources
+        for source in sources:
+            nested = os.path.join(config.location_path, source.dir)
+            if os.path.isdir(nested):
+                pending.append(nested)
+    return state
+
+
+def apply(root, state, force=False, **options):
+    """Reconcile dependencies with configuration changes since `state`.
+
+    Only added or updated sources are installed (with `options` passed to
+    `install_deps`), only removed sources are deleted, and only changed
+    links are created. Returns the new state and the number of changes.
+
+    """
+    count = 0
+    new = scan(root)
+    for path in sorted(new):
+        previous = state.get(path)
+        if previous and previous[0] == new[path][0]:
+            continue
+        changes = diff(previous[1] if previous else (), new[path][1])
+        if not any(changes):
+            continue
+
+        config = load(path, writable=False)
+        old = {source.dir: source for source in previous[1]} \
+            if previous else {}
+        sources = {source.dir: source for source in new[path][1]}
+        log.info("Configuration changed: %s", config.path)
+
+        for name in changes.removed + changes.relinked:
+            _unlink(config, old[name])
+        if changes.removed:
+            count += config.remove_deps(*changes.removed, force=force)
+
+        names = changes.added + changes.updated
+        if names:
+            count += config.install_deps(*names, update=False, force=force,
+                                         **options)
+
+        if changes.relinked:
+            links = Links(load(root, writable=False).location_path)
+            for name in changes.relinked:
+                source = sources[name]
+                if source.link:
+                    links.add(os.path.join(config.root, source.link),
+                              os.path.join(config.location_path, name))
+            links.apply(force=force)
+            count += len(changes.relinked)
+
+    # nested configurations may have appeared or been replaced
+    return (scan(root) if count else new), count
+
+
+def run(root, force=False, interval=None, debounce=None, **options):
+    """Reconcile dependencies each time configuration files change.
+
+    Changes are applied once the files have stopped changing for
+    `debounce` seconds, so several saves are coalesced into one update.
+    Runs until interrupted, returning the total number of changes.
+
+    """
+    interval = settings.WATCH_INTERVAL if interval is None else interval
+    debounce = settings.WATCH_DEBOUNCE if debounce is None else debounce
+    common.show("Watching for configuration changes...", log=False)
+    common.show()
+
+    total = 0
+    state = scan(root)
+    try:
+        while True:
+            time.sleep(interval)
+            stamps = _get_stamps(state)
+            if stamps == [entry[0] for entry in state.values()]:
+                continue
+            while True:
+                time.sleep(debounce)
+                latest = _get_stamps(state)
+                if latest == stamps:
+                    break
+                stamps = latest
+            try:
+                state, count = apply(root, state, force=force, **options)
+            except ERRORS as exc:
+                log.error("%s", exc)
+                state = _rescan(root, state)  # wait for the next change
+                continue
+            total += count
+            common.show("Applied {} change(s)".format(count), log=False)
+            common.show()
+    except KeyboardInterrupt:
+        log.info("Stopped watching")
+    return total
+
+
+def _get_key(source):
+    return tuple((getattr(source, name) or '')
+                 for name in source.ATTRIBUTES if name not in ('dir', 'link'))
+
+
+def _get_sources(config):
+    return tuple(config.sources_locked or config.sources)
+
+
+def _get_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def _get_stamps(state):
+    stamps = []
+    for path in state:
+        try:
+            config = load(path, writable=False)
+        except OSError:  # the dependency was deleted
+            config = None
+        except (InvalidConfig, yaml.YAMLError):  # e.g. while being saved
+            stamps.append(INVALID)
+            continue
+        stamps.append(_get_stamp(config.path) if config else None)
+    return stamps
+
+
+def _rescan(root, state):
+    """Scan again, keeping the sources of configurations that are invalid."""
+    try:
+        return scan(root)
+    except (InvalidConfig, yaml.YAMLError):
+        return {path: (stamp, entry[1]) for (path, entry), stamp
+                in zip(state.items(), _get_stamps(state))}
+
+
+def _unlink(config, source):
+    """Delete a source's previous link if it still points to the source."""
+    if not source.link:
+        return
+    path = os.path.join(config.root, source.link)
+    target = os.path.join(config.location_path, source.dir)
+    if os.path.islink(path) and \
+            os.path.realpath(path) == os.path.realpath(target):
+        common.show(shell.CMD_PREFIX + "rm " + path)
+        os.remove(path)
@@ -58,4 +58,5 @@ setuptools.setup(
     ],
 
     install_requires=open('requirements.txt').readlines() + [ sh ],
+    extras_require={'dulwich': ['dulwich']},  # for `--backend=dulwich`
 )
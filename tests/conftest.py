@@ -6,6 +6,9 @@ import os
 import yorm
 
 from gdm.test.conftest import pytest_configure  # pylint: disable=unused-import
+from gdm.test.conftest import processes  # pylint: disable=unused-import
+from gdm.test.conftest import git_repo  # pylint: disable=unused-import
+from gdm.test.conftest import local_project  # pylint: disable=unused-import
 
 
 # TODO: delete if unused (and files)
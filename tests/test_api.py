@@ -1,7 +1,9 @@
 # pylint: disable=no-self-use,redefined-outer-name,unused-variable,unused-argument
 
 import os
+import json
 import shutil
+import subprocess
 from contextlib import suppress
 import logging
 
@@ -51,6 +53,29 @@ def config(root="/tmp/gdm-shared"):
     return config
 
 
+@pytest.fixture
+def local_config(tmpdir, git_repo):
+    """Create a project with three clean dependencies on local remotes."""
+    root = str(tmpdir)
+    os.chdir(root)
+    os.system("touch .git")
+    config = Config(root=root)
+    config.__mapper__.text = CONFIG.replace(
+        "https://github.com/jacebrowning/gdm-demo", "file:///mock/gdm-demo")
+    for name in ('gdm_1', 'gdm_2', 'gdm_3'):
+        git_repo(os.path.join(root, 'deps', name),
+                 origin='file:///mock/gdm-demo')
+    return config
+
+
+@pytest.fixture
+def remote_config(local_project):
+    """Create a project with dependencies on a local bare repository."""
+    root = local_project("- dir: demo_1\n  repo: {0}\n  rev: master\n"
+                         "- dir: demo_2\n  repo: {0}\n  rev: v1\n")
+    return Config(root=str(root))
+
+
 def describe_install():
 
     def it_should_create_missing_directories(config):
@@ -131,6 +156,144 @@ def describe_uninstall():
 
         assert gdm.uninstall()
 
+    def it_should_check_dependencies_without_entering_them(
+            local_config, processes):
+        assert gdm.uninstall()
+
+        assert not os.path.exists(local_config.location)
+        assert processes.commands['delete'] <= 3 * 3 + 1
+
+    def it_should_fail_on_uncommitted_changes(local_config):
+        os.system("cd deps/gdm_2 && touch changed.txt && git add changed.txt")
+
+        with pytest.raises(RuntimeError):
+            gdm.uninstall()
+
+        assert os.path.isdir(local_config.location)
+
+
+def describe_prune():
+
+    def it_should_delete_unconfigured_dependencies(local_config):
+        os.system("git clone --quiet deps/gdm_1 deps/gdm_old")
+
+        assert gdm.prune()
+
+        assert ['gdm_1', 'gdm_2', 'gdm_3'] == sorted(os.listdir("deps"))
+
+    def it_should_fail_on_uncommitted_changes(local_config):
+        os.system("git clone --quiet deps/gdm_1 deps/gdm_old")
+        os.system("cd deps/gdm_old && touch changed.txt && git add changed.txt")
+
+        with pytest.raises(RuntimeError):
+            gdm.prune()
+
+        assert os.path.isdir("deps/gdm_old")
+
+
+def describe_bundle():
+
+    def it_should_install_without_network(remote_config, tmpdir):
+        assert gdm.bundle("../bundles.tar.gz")
+        shutil.rmtree(str(tmpdir.join('remote')))
+        shutil.rmtree(str(tmpdir.join('cache')))
+
+        assert gdm.install(bundle="../bundles.tar.gz")
+
+        assert ['demo_1', 'demo_2'] == sorted(os.listdir("deps"))
+        url = subprocess.check_output(
+            ['git', 'config', 'remote.origin.url'], cwd="deps/demo_2")
+        assert 'remote/demo.git' in url.decode()
+
+    def it_should_write_a_directory_of_bundles(remote_config):
+        assert gdm.bundle("bundles")
+
+        assert ['demo.bundle', 'gdm-bundle.yml'] == \
+            sorted(os.listdir("bundles"))
+
+
+def describe_snapshot():
+
+    def it_should_restore_installed_dependencies(remote_config, tmpdir):
+        archives = str(tmpdir.join('archives'))
+        assert gdm.install()
+        assert gdm.lock()
+        assert gdm.snapshot(directory=archives)
+        assert gdm.uninstall()
+
+        assert gdm.restore(directory=archives)
+
+        assert ['demo_1', 'demo_2'] == sorted(os.listdir("deps"))
+        assert gdm.list(allow_dirty=False)
+
+    def it_should_fail_without_a_matching_archive(remote_config, tmpdir):
+        assert gdm.install()
+        assert gdm.lock()
+
+        assert not gdm.restore(directory=str(tmpdir.join('archives')))
+
+
+def describe_export():
+
+    def it_should_install_files_without_repositories(remote_config):
+        assert gdm.install(mode='export')
+
+        assert not os.path.exists(os.path.join("deps", "demo_1", ".git"))
+        assert gdm.install(mode='export')
+        assert gdm.lock()
+        assert gdm.list(allow_dirty=False)
+
+    def it_should_replace_cloned_dependencies(remote_config):
+        assert gdm.install()
+
+        assert gdm.install(mode='export')
+
+        assert not os.path.exists(os.path.join("deps", "demo_2", ".git"))
+
+
+def describe_gc():
+
+    def it_should_delete_interrupted_uninstalls(local_config):
+        os.makedirs(".gdm-trash-abc/deps")
+
+        assert gdm.gc()
+
+        assert not os.path.exists(".gdm-trash-abc")
+
+
+def describe_list():
+
+    def it_should_stay_within_the_process_budget(local_config, processes,
+                                                 caplog):
+        caplog.set_level(logging.WARNING, logger='gdm')
+
+        assert gdm.list()
+
+        assert processes.commands['display'] <= 3 * 5
+
+    def it_should_return_records_as_a_generator(local_config, processes):
+        records = gdm.list(format='records')
+
+        assert ['gdm_1', 'gdm_2', 'gdm_3'] == sorted(
+            os.path.basename(record['path']) for record in records)
+        assert processes.commands['display'] <= 3 * 5
+
+    def it_should_print_a_record_per_line(local_config, capsys):
+        os.system("touch deps/gdm_2/README")
+        subprocess.check_call(['git', 'add', 'README'],
+                              cwd=os.path.join("deps", "gdm_2"))
+
+        assert gdm.list(format='json', jobs=2)
+
+        lines = capsys.readouterr().out.splitlines()
+        records = {os.path.basename(record['path']): record
+                   for record in map(json.loads, lines)}
+        assert ['gdm_1', 'gdm_2', 'gdm_3'] == sorted(records)
+        assert "file:///mock/gdm-demo" == records['gdm_1']['url']
+        assert 1 == records['gdm_1']['depth']
+        assert not records['gdm_1']['dirty']
+        assert records['gdm_2']['dirty']
+
 
 def describe_update():
 
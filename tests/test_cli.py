@@ -0,0 +1,73 @@
+"""Startup time benchmarks for the command-line interfaces."""
+# pylint: disable=no-self-use,redefined-outer-name,unused-variable
+
+import os
+import sys
+import time
+import subprocess
+import logging
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+HEAVY_MODULES = {'sh', 'yorm', 'yaml', 'gdm.commands', 'gdm.config'}
+
+log = logging.getLogger(__name__)
+
+
+def run(module, *args, cwd=None):
+    """Run a command-line interface and return its imports and duration."""
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(ROOT))
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-m', module] + list(args),
+        cwd=cwd, env=env, universal_newlines=True,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    duration = time.perf_counter() - start
+    log.info("%s %s: %.3f seconds", module, ' '.join(args), duration)
+    modules = set()
+    for line in process.stderr.splitlines():
+        if line.startswith("import time:"):
+            modules.add(line.split('|')[-1].strip())
+    return modules, duration
+
+
+@pytest.fixture
+def empty_project(tmpdir):
+    tmpdir.join('.git').write("")
+    tmpdir.join('gdm.yml').write("")
+    return str(tmpdir)
+
+
+def describe_gdm():
+
+    def it_should_skip_heavy_imports_for_version():
+        modules, _ = run('gdm.cli', '--version')
+
+        assert not HEAVY_MODULES & modules
+
+    def it_should_skip_heavy_imports_for_help():
+        modules, _ = run('gdm.cli', '--help')
+
+        assert not HEAVY_MODULES & modules
+
+    def it_should_skip_heavy_imports_for_command_help():
+        modules, _ = run('gdm.cli', 'install', '--help')
+
+        assert not HEAVY_MODULES & modules
+
+    def it_should_list_an_empty_config_quickly(empty_project):
+        _, baseline = run('gdm.cli', '--version')
+        modules, duration = run('gdm.cli', 'list', cwd=empty_project)
+
+        assert 'gdm.config' in modules
+        assert duration < baseline + 1.0
+
+
+def describe_git_deps():
+
+    def it_should_skip_heavy_imports_for_help():
+        modules, _ = run('gdm.plugin', '--help')
+
+        assert not HEAVY_MODULES & modules